@@ -4,6 +4,7 @@ import click
 import os
 import subprocess
 from click_default_group import DefaultGroup
+from utilities_common.util_base import UtilHelper
 
 try:
     # noinspection PyPep8Naming
@@ -80,25 +81,10 @@ class AliasedGroup(DefaultGroup):
         ctx.fail('Too many matches: %s' % ', '.join(sorted(matches)))
 
 
-# To be enhanced. Routing-stack information should be collected from a global
-# location (configdb?), so that we prevent the continous execution of this
-# bash oneliner. To be revisited once routing-stack info is tracked somewhere.
+# Routing-stack information is cached on disk by the metadata cache of
+# util_base, so that we prevent the continous execution of 'docker ps'.
 def get_routing_stack():
-    command = "sudo docker ps | grep bgp | awk '{print$2}' | cut -d'-' -f3 | cut -d':' -f1"
-
-    try:
-        proc = subprocess.Popen(command,
-                                stdout=subprocess.PIPE,
-                                shell=True,
-                                stderr=subprocess.STDOUT)
-        stdout = proc.communicate()[0]
-        proc.wait()
-        result = stdout.rstrip('\n')
-
-    except OSError, e:
-        raise OSError("Cannot detect routing-stack")
-
-    return (result)
+    return UtilHelper().get_routing_stack()
 
 
 # Global Routing-Stack variable
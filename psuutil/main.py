@@ -15,6 +15,7 @@ try:
     import types
     import traceback
     from tabulate import tabulate
+    from utilities_common.util_base import UtilHelper
 except ImportError as e:
     raise ImportError("%s - required module not found" % str(e))
 
@@ -26,9 +27,6 @@ PLATFORM_SPECIFIC_CLASS_NAME = "PsuUtil"
 
 PLATFORM_ROOT_PATH = '/usr/share/sonic/device'
 PLATFORM_ROOT_PATH_DOCKER = '/usr/share/sonic/platform'
-SONIC_CFGGEN_PATH = '/usr/local/bin/sonic-cfggen'
-HWSKU_KEY = 'DEVICE_METADATA.localhost.hwsku'
-PLATFORM_KEY = 'DEVICE_METADATA.localhost.platform'
 
 # Global platform-specific psuutil class instance
 platform_psuutil = None
@@ -68,26 +66,7 @@ def log_error(msg, also_print_to_console=False):
 
 # Returns platform and HW SKU
 def get_platform_and_hwsku():
-    try:
-        proc = subprocess.Popen([SONIC_CFGGEN_PATH, '-H', '-v', PLATFORM_KEY],
-                                stdout=subprocess.PIPE,
-                                shell=False,
-                                stderr=subprocess.STDOUT)
-        stdout = proc.communicate()[0]
-        proc.wait()
-        platform = stdout.rstrip('\n')
-
-        proc = subprocess.Popen([SONIC_CFGGEN_PATH, '-d', '-v', HWSKU_KEY],
-                                stdout=subprocess.PIPE,
-                                shell=False,
-                                stderr=subprocess.STDOUT)
-        stdout = proc.communicate()[0]
-        proc.wait()
-        hwsku = stdout.rstrip('\n')
-    except OSError, e:
-        raise OSError("Cannot detect platform")
-
-    return (platform, hwsku)
+    return UtilHelper().get_platform_and_hwsku()
 
 
 # Loads platform specific psuutil module from source
@@ -10,39 +10,112 @@ from fcntl import ioctl
 import binascii
 import argparse
 import syslog
+import time
 import traceback
+from array import array
+from collections import OrderedDict
+
+from utilities_common.counters import bulk_hgetall
 
 
 ARP_CHUNK = binascii.unhexlify('08060001080006040001') # defines a part of the packet for ARP Request
 ARP_PAD = binascii.unhexlify('00' * 18)
 
-def generate_arp_entries(filename, all_available_macs):
+# ARP request frame: the fixed part shared by all the frames, and the
+# addresses patched in for each neighbor at their offsets
+ARP_FRAME_SIZE = 60
+ARP_TEMPLATE = '\0' * 12 + ARP_CHUNK + '\0' * 20 + ARP_PAD
+ARP_ETHER_ADDRS = struct.Struct('6s6s')     # destination and source MAC
+ARP_SENDER_OFFSET = 22
+ARP_SENDER = struct.Struct('6s4s')          # sender MAC and IP
+ARP_TARGET_OFFSET = 32
+ARP_TARGET = struct.Struct('6s4s')          # target MAC and IP
+
+# Gratuitous ARP frames sent per second, 0 for as fast as possible, and
+# frames sent back to back in a burst
+DEFAULT_GARP_RATE = 0
+DEFAULT_GARP_BURST = 64
+
+ASIC_STATE_PREFIX = 'ASIC_STATE:'
+FDB_ENTRY_PREFIX = 'ASIC_STATE:SAI_OBJECT_TYPE_FDB_ENTRY:'
+
+def log_timing(what, start, count, unit='entries'):
+    """
+        Log the time taken since start to produce count entries of what.
+        Returns the time taken in milliseconds.
+    """
+    elapsed_ms = (time.time() - start) * 1000
+    syslog.syslog(syslog.LOG_INFO, "%s: %d %s in %.1f ms" % (what, count, unit, elapsed_ms))
+    return elapsed_ms
+
+class JsonArrayWriter(object):
+    """
+        Writer of a JSON array to a file, one element at a time, compact or
+        indented as json.dump(..., indent=2) when pretty. The time taken to
+        write the file is logged when it is closed.
+    """
+
+    def __init__(self, filename, pretty=False):
+        self.filename = filename
+        self.pretty = pretty
+        self.count = 0
+        if pretty:
+            self.encoder = json.JSONEncoder(indent=2, separators=(',', ': '))
+        else:
+            self.encoder = json.JSONEncoder(separators=(',', ':'))
+        self.start = time.time()
+        self.fp = open(filename, 'w')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.fp.close()
+
+    def write(self, obj):
+        if self.pretty:
+            self.fp.write('[\n  ' if self.count == 0 else ',\n  ')
+            self.fp.write(self.encoder.encode(obj).replace('\n', '\n  '))
+        else:
+            self.fp.write('[' if self.count == 0 else ',')
+            self.fp.write(self.encoder.encode(obj))
+        self.count += 1
+
+    def close(self):
+        if self.count == 0:
+            self.fp.write('[]')
+        else:
+            self.fp.write('\n]' if self.pretty else ']')
+        self.fp.close()
+        log_timing(self.filename, self.start, self.count)
+
+def generate_arp_entries(filename, all_available_macs, pretty=False):
     db = swsssdk.SonicV2Connector(host='127.0.0.1')
     db.connect(db.APPL_DB, False)   # Make one attempt only
 
-    arp_output = []
     arp_entries = []
     keys = db.keys(db.APPL_DB, 'NEIGH_TABLE:*')
     keys = [] if keys is None else keys
-    for key in keys:
-        vlan_name = key.split(':')[1]
-        ip_addr = key.split(':')[2]
-        entry = db.get_all(db.APPL_DB, key)
-        if (vlan_name, entry['neigh'].lower()) not in all_available_macs:
-            # FIXME: print me to log
-            continue
-        obj = {
-          key: entry,
-          'OP': 'SET'
-        }
-        arp_entries.append((vlan_name, entry['neigh'].lower(), ip_addr))
-        arp_output.append(obj)
+    with JsonArrayWriter(filename, pretty) as arp_output:
+        for key in keys:
+            vlan_name = key.split(':')[1]
+            ip_addr = key.split(':')[2]
+            entry = db.get_all(db.APPL_DB, key)
+            if (vlan_name, entry['neigh'].lower()) not in all_available_macs:
+                # FIXME: print me to log
+                continue
+            obj = {
+              key: entry,
+              'OP': 'SET'
+            }
+            arp_entries.append((vlan_name, entry['neigh'].lower(), ip_addr))
+            arp_output.write(obj)
 
     db.close(db.APPL_DB)
 
-    with open(filename, 'w') as fp:
-        json.dump(arp_output, fp, indent=2, separators=(',', ': '))
-
     return arp_entries
 
 def is_mac_unicast(mac):
@@ -56,28 +129,32 @@ def get_vlan_ifaces():
 
     return vlans
 
+def read_asic_objects(db, object_type, pattern='oid:*'):
+    """
+        Read all the ASIC_DB objects of a type with a single KEYS and
+        pipelined HGETALL. Returns a dictionary of the attributes of the
+        objects by key, without the object type prefix.
+    """
+    prefix = ASIC_STATE_PREFIX + object_type + ':'
+    keys = db.keys(db.ASIC_DB, prefix + pattern)
+    keys = [] if keys is None else keys
+    return {key[len(prefix):]: value for key, value in zip(keys, bulk_hgetall(db, db.ASIC_DB, keys))}
+
 def get_bridge_port_id_2_port_id(db):
     bridge_port_id_2_port_id = {}
-    keys = db.keys(db.ASIC_DB, 'ASIC_STATE:SAI_OBJECT_TYPE_BRIDGE_PORT:oid:*')
-    keys = [] if keys is None else keys
-    for key in keys:
-        value = db.get_all(db.ASIC_DB, key)
+    for bridge_id, value in read_asic_objects(db, 'SAI_OBJECT_TYPE_BRIDGE_PORT').items():
         port_type = value['SAI_BRIDGE_PORT_ATTR_TYPE']
         if port_type != 'SAI_BRIDGE_PORT_TYPE_PORT':
             continue
         port_id = value['SAI_BRIDGE_PORT_ATTR_PORT_ID']
         # ignore admin status
-        bridge_id = key.replace('ASIC_STATE:SAI_OBJECT_TYPE_BRIDGE_PORT:', '')
         bridge_port_id_2_port_id[bridge_id] = port_id
 
     return bridge_port_id_2_port_id
 
 def get_map_port_id_2_iface_name(db):
     port_id_2_iface = {}
-    keys = db.keys(db.ASIC_DB, 'ASIC_STATE:SAI_OBJECT_TYPE_HOSTIF:oid:*')
-    keys = [] if keys is None else keys
-    for key in keys:
-        value = db.get_all(db.ASIC_DB, key)
+    for value in read_asic_objects(db, 'SAI_OBJECT_TYPE_HOSTIF').values():
         port_id = value['SAI_HOSTIF_ATTR_OBJ_ID']
         iface_name = value['SAI_HOSTIF_ATTR_NAME']
         port_id_2_iface[port_id] = iface_name
@@ -98,37 +175,64 @@ def get_map_bridge_port_id_2_iface_name(db):
 
     return bridge_port_id_2_iface_name
 
-def get_vlan_oid_by_vlan_id(db, vlan_id):
-    keys = db.keys(db.ASIC_DB, 'ASIC_STATE:SAI_OBJECT_TYPE_VLAN:oid:*')
-    keys = [] if keys is None else keys
-    for key in keys:
-        value = db.get_all(db.ASIC_DB, key)
-        if 'SAI_VLAN_ATTR_VLAN_ID' in value and int(value['SAI_VLAN_ATTR_VLAN_ID']) == vlan_id:
-            return key.replace('ASIC_STATE:SAI_OBJECT_TYPE_VLAN:', '')
-
-    raise Exception('Not found bvi oid for vlan_id: %d' % vlan_id)
-
-def get_fdb(db, vlan_name, vlan_id, bridge_id_2_iface):
+def get_map_vlan_id_2_bvid(db):
+    vlan_id_2_bvid = {}
+    for bvid, value in read_asic_objects(db, 'SAI_OBJECT_TYPE_VLAN').items():
+        if 'SAI_VLAN_ATTR_VLAN_ID' in value:
+            vlan_id_2_bvid[int(value['SAI_VLAN_ATTR_VLAN_ID'])] = bvid
+
+    return vlan_id_2_bvid
+
+def get_map_bvid_2_vlan(db, vlan_ifaces):
+    """
+        Map the bvid of every VLAN interface to its name and VLAN id, in
+        the order of the interfaces.
+    """
+    vlan_id_2_bvid = get_map_vlan_id_2_bvid(db)
+    bvid_2_vlan = OrderedDict()
+    for vlan_name in vlan_ifaces:
+        vlan_id = int(vlan_name.replace('Vlan', ''))
+        if vlan_id not in vlan_id_2_bvid:
+            raise Exception('Not found bvi oid for vlan_id: %d' % vlan_id)
+        bvid_2_vlan[vlan_id_2_bvid[vlan_id]] = (vlan_name, vlan_id)
+
+    return bvid_2_vlan
+
+def get_fdb(db, bvid_2_vlan, bridge_id_2_iface, fdb_output):
+    """
+        Write the unicast FDB entries of the given VLANs to fdb_output,
+        walking the FDB keys once and reading the attributes of the selected
+        entries only, in pipelined batches. The entries are ordered by VLAN.
+    """
     fdb_types = {
       'SAI_FDB_ENTRY_TYPE_DYNAMIC': 'dynamic',
       'SAI_FDB_ENTRY_TYPE_STATIC' : 'static'
     }
 
-    bvid = get_vlan_oid_by_vlan_id(db, vlan_id)
-    available_macs = set()
-    map_mac_ip = {}
-    fdb_entries = []
-    keys = db.keys(db.ASIC_DB, 'ASIC_STATE:SAI_OBJECT_TYPE_FDB_ENTRY:{*\"bvid\":\"%s\"*}' % bvid)
+    # Select the keys of the VLANs, indexed by bvid
+    vlan_fdb_keys = OrderedDict((bvid, []) for bvid in bvid_2_vlan)
+    keys = db.keys(db.ASIC_DB, FDB_ENTRY_PREFIX + '*')
     keys = [] if keys is None else keys
     for key in keys:
-        key_obj = json.loads(key.replace('ASIC_STATE:SAI_OBJECT_TYPE_FDB_ENTRY:', ''))
+        key_obj = json.loads(key[len(FDB_ENTRY_PREFIX):])
+        bvid = key_obj.get('bvid')
+        if bvid not in vlan_fdb_keys:
+            continue
         mac = str(key_obj['mac'])
         if not is_mac_unicast(mac):
             continue
+        vlan_fdb_keys[bvid].append((key, mac))
+
+    selected = [(bvid, key, mac) for bvid, fdb_keys in vlan_fdb_keys.items() for key, mac in fdb_keys]
+    values = bulk_hgetall(db, db.ASIC_DB, [key for _, key, _ in selected])
+
+    available_macs = set()
+    map_mac_ip_per_vlan = {vlan_name: {} for vlan_name, _ in bvid_2_vlan.values()}
+    for (bvid, key, mac), value in zip(selected, values):
+        vlan_name, vlan_id = bvid_2_vlan[bvid]
         available_macs.add((vlan_name, mac.lower()))
         fdb_mac = mac.replace(':', '-')
         # get attributes
-        value = db.get_all(db.ASIC_DB, key)
         fdb_type = fdb_types[value['SAI_FDB_ENTRY_ATTR_TYPE']]
         if value['SAI_FDB_ENTRY_ATTR_BRIDGE_PORT_ID'] not in bridge_id_2_iface:
             continue
@@ -142,89 +246,144 @@ def get_fdb(db, vlan_name, vlan_id, bridge_id_2_iface):
           'OP': 'SET'
         }
 
-        fdb_entries.append(obj)
-        map_mac_ip[mac.lower()] = fdb_port
+        fdb_output.write(obj)
+        map_mac_ip_per_vlan[vlan_name][mac.lower()] = fdb_port
 
-    return fdb_entries, available_macs, map_mac_ip
-
-def generate_fdb_entries(filename):
-    fdb_entries = []
+    return available_macs, map_mac_ip_per_vlan
 
+def generate_fdb_entries(filename, pretty=False):
     db = swsssdk.SonicV2Connector(host='127.0.0.1')
     db.connect(db.ASIC_DB, False)   # Make one attempt only
 
     bridge_id_2_iface = get_map_bridge_port_id_2_iface_name(db)
 
     vlan_ifaces = get_vlan_ifaces()
+    bvid_2_vlan = get_map_bvid_2_vlan(db, vlan_ifaces)
 
-    all_available_macs = set()
-    map_mac_ip_per_vlan = {}
-    for vlan in vlan_ifaces:
-        vlan_id = int(vlan.replace('Vlan', ''))
-        fdb_entry, available_macs, map_mac_ip_per_vlan[vlan] = get_fdb(db, vlan, vlan_id, bridge_id_2_iface)
-        all_available_macs |= available_macs
-        fdb_entries.extend(fdb_entry)
+    with JsonArrayWriter(filename, pretty) as fdb_output:
+        all_available_macs, map_mac_ip_per_vlan = get_fdb(db, bvid_2_vlan, bridge_id_2_iface, fdb_output)
 
     db.close(db.ASIC_DB)
 
-    with open(filename, 'w') as fp:
-        json.dump(fdb_entries, fp, indent=2, separators=(',', ': '))
-
     return all_available_macs, map_mac_ip_per_vlan
 
-def get_if(iff, cmd):
-    s = socket.socket()
-    ifreq = ioctl(s, cmd, struct.pack("16s16x",iff))
-    s.close()
-    return ifreq
+def get_if(iff, cmd, s=None):
+    if s is None:
+        s = socket.socket()
+        try:
+            return ioctl(s, cmd, struct.pack("16s16x",iff))
+        finally:
+            s.close()
+    return ioctl(s, cmd, struct.pack("16s16x",iff))
 
-def get_iface_mac_addr(iff):
+def get_iface_mac_addr(iff, s=None):
     SIOCGIFHWADDR = 0x8927          # Get hardware address
-    return get_if(iff, SIOCGIFHWADDR)[18:24]
+    return get_if(iff, SIOCGIFHWADDR, s)[18:24]
 
-def get_iface_ip_addr(iff):
+def get_iface_ip_addr(iff, s=None):
     SIOCGIFADDR = 0x8915            # Get ip address
-    return get_if(iff, SIOCGIFADDR)[20:24]
-
-def send_arp(s, src_mac, src_ip, dst_mac_s, dst_ip_s):
-    # convert dst_mac in binary
-    dst_ip = socket.inet_aton(dst_ip_s)
-
-    # convert dst_ip in binary
-    dst_mac = binascii.unhexlify(dst_mac_s.replace(':', ''))
-
-    # make ARP packet
-    pkt = dst_mac + src_mac + ARP_CHUNK + src_mac + src_ip + dst_mac + dst_ip + ARP_PAD
-
-    # send it
-    s.send(pkt)
-
-    return
-
-def garp_send(arp_entries, map_mac_ip_per_vlan):
+    return get_if(iff, SIOCGIFADDR, s)[20:24]
+
+class GarpEngine(object):
+    """
+        Gratuitous ARP sender. The frames are built up front in a single
+        buffer, by patching the addresses of every neighbor into copies of
+        ARP_TEMPLATE, then sent in bursts paced to a rate.
+    """
+
+    def __init__(self, rate=DEFAULT_GARP_RATE, burst=DEFAULT_GARP_BURST):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.frames = bytearray()
+        self.ifaces = []
+        self.frame_ifaces = array('H')
+
+    def build(self, entries):
+        """
+            Build the frames of entries of (interface, source MAC, source IP,
+            destination MAC, destination IP), the addresses being binary.
+        """
+        iface_indexes = {}
+        self.ifaces = []
+        self.frame_ifaces = array('H')
+        self.frames = bytearray(ARP_TEMPLATE * len(entries))
+        offset = 0
+        for iface, src_mac, src_ip, dst_mac, dst_ip in entries:
+            if iface not in iface_indexes:
+                iface_indexes[iface] = len(self.ifaces)
+                self.ifaces.append(iface)
+            self.frame_ifaces.append(iface_indexes[iface])
+            ARP_ETHER_ADDRS.pack_into(self.frames, offset, dst_mac, src_mac)
+            ARP_SENDER.pack_into(self.frames, offset + ARP_SENDER_OFFSET, src_mac, src_ip)
+            ARP_TARGET.pack_into(self.frames, offset + ARP_TARGET_OFFSET, dst_mac, dst_ip)
+            offset += ARP_FRAME_SIZE
+
+    def send(self, sockets):
+        """
+            Send the frames, each with the socket of its interface in
+            sockets. Returns the number of frames sent.
+        """
+        frames = memoryview(self.frames)
+        sends = [sockets[iface].send for iface in self.ifaces]
+        count = len(self.frame_ifaces)
+        start = time.time()
+        for first in xrange(0, count, self.burst):
+            if self.rate:
+                delay = start + float(first) / self.rate - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            for index in xrange(first, min(first + self.burst, count)):
+                offset = index * ARP_FRAME_SIZE
+                sends[self.frame_ifaces[index]](frames[offset:offset + ARP_FRAME_SIZE])
+        return count
+
+def open_garp_sockets(ifaces):
+    """
+        Open a raw socket bound to each interface.
+    """
     ETH_P_ALL = 0x03
 
-    # generate source ip addresses for arp packets
-    src_ip_addrs = {vlan_name:get_iface_ip_addr(vlan_name) for vlan_name,_,_ in arp_entries}
-
-    # generate source mac addresses for arp packets
-    src_ifs = {map_mac_ip_per_vlan[vlan_name][dst_mac] for vlan_name, dst_mac, _ in arp_entries}
-    src_mac_addrs = {src_if:get_iface_mac_addr(src_if) for src_if in src_ifs}
-
-    # open raw sockets for all required interfaces
     sockets = {}
-    for src_if in src_ifs:
-        sockets[src_if] = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
-        sockets[src_if].bind((src_if, 0))
+    try:
+        for iface in ifaces:
+            sockets[iface] = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+            sockets[iface].bind((iface, 0))
+    except:
+        for s in sockets.values():
+            s.close()
+        raise
+
+    return sockets
+
+def garp_send(arp_entries, map_mac_ip_per_vlan, rate=DEFAULT_GARP_RATE, burst=DEFAULT_GARP_BURST):
+    # look up the source addresses of the arp packets once per interface,
+    # with a single socket
+    s = socket.socket()
+    try:
+        src_ip_addrs = {vlan_name: get_iface_ip_addr(vlan_name, s) for vlan_name in {vlan_name for vlan_name, _, _ in arp_entries}}
+        src_ifs = {map_mac_ip_per_vlan[vlan_name][dst_mac] for vlan_name, dst_mac, _ in arp_entries}
+        src_mac_addrs = {src_if: get_iface_mac_addr(src_if, s) for src_if in src_ifs}
+    finally:
+        s.close()
 
-    # send arp packets
+    # build the arp packets
+    engine = GarpEngine(rate, burst)
+    frames = []
     for vlan_name, dst_mac, dst_ip in arp_entries:
         src_if = map_mac_ip_per_vlan[vlan_name][dst_mac]
-        send_arp(sockets[src_if], src_mac_addrs[src_if], src_ip_addrs[vlan_name], dst_mac, dst_ip)
+        frames.append((src_if, src_mac_addrs[src_if], src_ip_addrs[vlan_name],
+                       binascii.unhexlify(dst_mac.replace(':', '')), socket.inet_aton(dst_ip)))
+    engine.build(frames)
 
-    # close the raw sockets
-    for s in sockets.values():
-        s.close()
+    # send them through raw sockets for all required interfaces
+    sockets = open_garp_sockets(src_ifs)
+    try:
+        start = time.time()
+        count = engine.send(sockets)
+        log_timing('gratuitous ARP', start, count, 'frames')
+    finally:
+        for s in sockets.values():
+            s.close()
 
     return
 
@@ -242,38 +401,39 @@ def get_default_entries(db, route):
 
     return obj
 
-def generate_default_route_entries(filename):
+def generate_default_route_entries(filename, pretty=False):
     db = swsssdk.SonicV2Connector(host='127.0.0.1')
     db.connect(db.APPL_DB, False)   # Make one attempt only
 
-    default_routes_output = []
-
-    ipv4_default = get_default_entries(db, '0.0.0.0/0')
-    if ipv4_default is not None:
-        default_routes_output.append(ipv4_default)
+    with JsonArrayWriter(filename, pretty) as default_routes_output:
+        ipv4_default = get_default_entries(db, '0.0.0.0/0')
+        if ipv4_default is not None:
+            default_routes_output.write(ipv4_default)
 
-    ipv6_default = get_default_entries(db, '::/0')
-    if ipv6_default is not None:
-        default_routes_output.append(ipv6_default)
+        ipv6_default = get_default_entries(db, '::/0')
+        if ipv6_default is not None:
+            default_routes_output.write(ipv6_default)
 
     db.close(db.APPL_DB)
 
-    with open(filename, 'w') as fp:
-        json.dump(default_routes_output, fp, indent=2, separators=(',', ': '))
-
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('-t', '--target', type=str, default='/tmp', help='target directory for files')
+    parser.add_argument('-r', '--garp-rate', type=int, default=DEFAULT_GARP_RATE,
+                        help='gratuitous ARP packets sent per second, 0 for as fast as possible')
+    parser.add_argument('-b', '--garp-burst', type=int, default=DEFAULT_GARP_BURST,
+                        help='gratuitous ARP packets sent back to back')
+    parser.add_argument('-p', '--pretty', action='store_true', help='write indented JSON files')
     args = parser.parse_args()
     root_dir = args.target
     if not os.path.isdir(root_dir):
         print "Target directory '%s' not found" % root_dir
         return 3
-    all_available_macs, map_mac_ip_per_vlan = generate_fdb_entries(root_dir + '/fdb.json')
-    arp_entries = generate_arp_entries(root_dir + '/arp.json', all_available_macs)
-    generate_default_route_entries(root_dir + '/default_routes.json')
-    garp_send(arp_entries, map_mac_ip_per_vlan)
+    all_available_macs, map_mac_ip_per_vlan = generate_fdb_entries(root_dir + '/fdb.json', args.pretty)
+    arp_entries = generate_arp_entries(root_dir + '/arp.json', all_available_macs, args.pretty)
+    generate_default_route_entries(root_dir + '/default_routes.json', args.pretty)
+    garp_send(arp_entries, map_mac_ip_per_vlan, args.garp_rate, args.garp_burst)
     return 0
 
 if __name__ == '__main__':
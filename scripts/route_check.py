@@ -6,13 +6,56 @@ import sys
 import getopt
 import ipaddress
 import json
-from swsssdk import ConfigDBConnector
+import signal
+import socket
+import tempfile
+import threading
+import time
+from collections import Counter
+from Queue import Queue
+from redis.exceptions import ConnectionError, TimeoutError
+from swsssdk import SonicV2Connector
 
 os.environ['PYTHONUNBUFFERED']='True'
 
 PREFIX_SEPARATOR = '/'
 IPV6_SEPARATOR = ':'
 
+ROUTE_TABLE_PREFIX = 'ROUTE_TABLE:'
+ASIC_ROUTE_ENTRY_PREFIX = 'ASIC_STATE:SAI_OBJECT_TYPE_ROUTE_ENTRY:'
+INTF_TABLE_PREFIX = 'INTF_TABLE:'
+
+# Number of keys read per SCAN and per pipelined batch of HGET
+SCAN_COUNT = 1000
+
+# Number of batches of routes scanned ahead of their next hop reads
+ROUTE_QUEUE_SIZE = 4
+
+FAMILIES = ('IPv4', 'IPv6')
+
+# Sizes of the packed prefixes of each family: network address and length
+RECORD_SIZES = {FAMILIES[0]: 5, FAMILIES[1]: 17}
+
+# Interfaces whose addresses are not programmed in the ASIC
+SKIPPED_INTERFACES = ('eth0', 'docker0')
+
+# Keyspace events of the tables in their database, and the classes of
+# events needed: keyspace, generic (del) and hash commands
+KEYSPACE_PATTERN = '__keyspace@{}__:{}*'
+KEYSPACE_EVENTS = 'Kgh'
+
+# Errors of a lost connection to redis, after which the keyspace
+# notifications may have been lost
+CONNECTION_ERRORS = (ConnectionError, TimeoutError)
+
+# Daemon mode: seconds between checks, seconds a prefix must stay
+# inconsistent before it is reported, seconds between full reloads of the
+# tables, and file the metrics are written to
+DEFAULT_INTERVAL = 5
+DEFAULT_GRACE_PERIOD = 30
+DEFAULT_RELOAD_INTERVAL = 3600
+DEFAULT_METRICS_FILE = '/var/run/route_check.json'
+
 # Modes of operation from quiet to noisy
 MODE_QUIET = 0
 MODE_ERR = 1
@@ -48,99 +91,271 @@ def add_prefix(ip):
 def add_prefix_ifnot(ip):
     return ip if ip.find(PREFIX_SEPARATOR) != -1 else add_prefix(ip)
 
+def prefix_family(prefix):
+    return FAMILIES[0] if prefix.find(IPV6_SEPARATOR) == -1 else FAMILIES[1]
+
 def ip_subnet(ip):
+    # ipaddress only takes unicode addresses
+    ip = unicode(ip)
     if ip.find(":") == -1:
         net = ipaddress.IPv4Network(ip, False)
     else:
         net = ipaddress.IPv6Network(ip, False)
     return net.with_prefixlen
 
-def cmps(s1, s2):
-    if (s1 == s2):
-        return 0
-    if (s1 < s2):
-        return -1
-    return 1
+def pack_prefix(prefix):
+    """
+        Pack a prefix, e.g. '10.0.0.0/24' or 'fc00::1', into a record of its
+        network address and its prefix length in network byte order, of
+        RECORD_SIZES bytes. A prefix without length is a host route. The
+        records of a family sort like the (network, length) integers.
+    """
+    address, _, length = prefix.partition(PREFIX_SEPARATOR)
+    if address.find(IPV6_SEPARATOR) == -1:
+        return socket.inet_pton(socket.AF_INET, address) + chr(int(length or 32))
+    return socket.inet_pton(socket.AF_INET6, address) + chr(int(length or 128))
+
+def pack_prefix_or_skip(prefix):
+    """
+        Pack a prefix as pack_prefix() does, or return None if it is not a
+        bare IP prefix, e.g. the prefix of a VRF route 'Vrf-red:10.0.0.0/24'.
+        Such a prefix can not be checked, and is skipped.
+    """
+    try:
+        return pack_prefix(prefix)
+    except (socket.error, ValueError):
+        print_message(MODE_INFO, "Skipped unparseable prefix {}".format(prefix))
+        return None
 
-def do_diff(t1, t2):
-    t1_x = t2_x = 0
-    t1_miss = []
-    t2_miss = []
-    t1_len = len(t1);
-    t2_len = len(t2);
-    while t1_x < t1_len and t2_x < t2_len:
-        d = cmps(t1[t1_x], t2[t2_x])
-        if (d == 0):
-            t1_x += 1
-            t2_x += 1
-        elif (d < 0):
-            t1_miss.append(t1[t1_x])
-            t1_x += 1
-        else:
-            t2_miss.append(t2[t2_x])
-            t2_x += 1
-
-    while t1_x < t1_len:
-        t1_miss.append(t1[t1_x])
-        t1_x += 1
-
-    while t2_x < t2_len:
-        t2_miss.append(t2[t2_x])
-        t2_x += 1
-    return t1_miss, t2_miss
-
-
-def get_routes():
-    db = ConfigDBConnector()
-    db.db_connect('APPL_DB')
-    print_message(MODE_DEBUG, "APPL DB connected for routes")
-    keys = db.get_keys('ROUTE_TABLE')
-    print_message(MODE_DEBUG, json.dumps({"ROUTE_TABLE": keys}, indent=4))
-
-    valid_rt = []
-    skip_rt = []
-    for k in keys:
-        if db.get_entry('ROUTE_TABLE', k)['nexthop'] != '':
-            valid_rt.append(add_prefix_ifnot(k))
+def record_family(record):
+    return FAMILIES[0] if len(record) == RECORD_SIZES[FAMILIES[0]] else FAMILIES[1]
+
+def unpack_prefix(record):
+    if record_family(record) == FAMILIES[0]:
+        address = socket.inet_ntop(socket.AF_INET, record[:-1])
+    else:
+        address = socket.inet_ntop(socket.AF_INET6, record[:-1])
+    return address + PREFIX_SEPARATOR + str(ord(record[-1]))
+
+def record_key(record):
+    """
+        Sort key of the records of both families, IPv4 first.
+    """
+    return len(record), record
+
+class PrefixTable(object):
+    """
+        Sorted list of prefixes, stored as the concatenation of their
+        packed records in one buffer per family.
+    """
+
+    def __init__(self, records=(), buffers=None):
+        if buffers is None:
+            family_records = {family: [] for family in FAMILIES}
+            ipv4_records = family_records[FAMILIES[0]]
+            ipv6_records = family_records[FAMILIES[1]]
+            ipv4_size = RECORD_SIZES[FAMILIES[0]]
+            for record in records:
+                if len(record) == ipv4_size:
+                    ipv4_records.append(record)
+                else:
+                    ipv6_records.append(record)
+            buffers = {}
+            for family in FAMILIES:
+                family_records[family].sort()
+                buffers[family] = ''.join(family_records.pop(family))
+        self.buffers = buffers
+
+    @classmethod
+    def from_prefixes(cls, prefixes):
+        return cls(pack_prefix(prefix) for prefix in prefixes)
+
+    def __len__(self):
+        return sum(len(self.buffers[family]) // RECORD_SIZES[family] for family in FAMILIES)
+
+    def records(self):
+        for family in FAMILIES:
+            buf = self.buffers[family]
+            size = RECORD_SIZES[family]
+            for offset in xrange(0, len(buf), size):
+                yield buf[offset:offset + size]
+
+    def __iter__(self):
+        for record in self.records():
+            yield unpack_prefix(record)
+
+def diff_buffers(buf1, buf2, size):
+    """
+        Merge two sorted buffers of records of the given size. Returns the
+        buffers of the records only in the first one and only in the second.
+    """
+    if buf1 == buf2:
+        return '', ''
+    x1 = x2 = 0
+    len1 = len(buf1)
+    len2 = len(buf2)
+    miss1 = []
+    miss2 = []
+    while x1 < len1 and x2 < len2:
+        r1 = buf1[x1:x1 + size]
+        r2 = buf2[x2:x2 + size]
+        if r1 == r2:
+            x1 += size
+            x2 += size
+        elif r1 < r2:
+            miss1.append(r1)
+            x1 += size
         else:
-            skip_rt.append(k)
+            miss2.append(r2)
+            x2 += size
+    miss1.append(buf1[x1:])
+    miss2.append(buf2[x2:])
+    return ''.join(miss1), ''.join(miss2)
 
-    print_message(MODE_INFO, json.dumps({"skipped_routes" : skip_rt}, indent=4))
-    return sorted(valid_rt)
+def do_diff(t1, t2):
+    """
+        Diff two PrefixTables. Returns the PrefixTable of the prefixes only
+        in t1 and the one of the prefixes only in t2.
+    """
+    t1_miss = {}
+    t2_miss = {}
+    for family in FAMILIES:
+        t1_miss[family], t2_miss[family] = diff_buffers(t1.buffers[family], t2.buffers[family],
+                                                        RECORD_SIZES[family])
+    return PrefixTable(buffers=t1_miss), PrefixTable(buffers=t2_miss)
+
+
+def connect(db_name):
+    db = SonicV2Connector(host='127.0.0.1')
+    db.connect(getattr(db, db_name))
+    print_message(MODE_DEBUG, "{} connected".format(db_name))
+    return db.get_redis_client(getattr(db, db_name))
+
+def scan_keys(client, prefix, count=SCAN_COUNT):
+    """
+        Iterate over the keys starting with prefix, without the prefix, in
+        batches of about count keys. Unlike KEYS, SCAN neither blocks the
+        database nor builds the whole list of keys at once.
+    """
+    batch = []
+    for key in client.scan_iter(match=prefix + '*', count=count):
+        batch.append(key[len(prefix):])
+        if len(batch) >= count:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def read_nexthops(client, queue, valid_rt, skip_rt, errors):
+    """
+        Read the next hop of the batches of routes put in queue, with a
+        pipelined HGET per batch, until None is put.
+    """
+    while True:
+        prefixes = queue.get()
+        if prefixes is None:
+            return
+        if errors:
+            # Keep draining so that the scan does not block
+            continue
+        try:
+            pipe = client.pipeline(transaction=False)
+            for prefix in prefixes:
+                pipe.hget(ROUTE_TABLE_PREFIX + prefix, 'nexthop')
+            for prefix, nexthop in zip(prefixes, pipe.execute()):
+                if not nexthop:
+                    skip_rt.append(prefix)
+                    continue
+                record = pack_prefix_or_skip(prefix)
+                if record is not None:
+                    valid_rt.append(record)
+        except Exception as e:
+            errors.append(e)
+
+def get_routes(client=None):
+    """
+        Get the PrefixTable of the routes of APPL_DB ROUTE_TABLE which
+        have a next hop.
+        The keys are scanned in batches, and the next hops of the IPv4 and
+        IPv6 routes are read concurrently by a thread per family, at most
+        ROUTE_QUEUE_SIZE batches behind the scan.
+    """
+    if client is None:
+        client = connect('APPL_DB')
+
+    valid_rt = {family: [] for family in FAMILIES}
+    skip_rt = {family: [] for family in FAMILIES}
+    queues = {family: Queue(ROUTE_QUEUE_SIZE) for family in FAMILIES}
+    errors = []
+    threads = [threading.Thread(target=read_nexthops,
+                                args=(client, queues[family], valid_rt[family], skip_rt[family], errors))
+               for family in FAMILIES]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
 
-def get_route_entries():
-    db = ConfigDBConnector()
-    db.db_connect('ASIC_DB')
-    print_message(MODE_DEBUG, "ASIC DB connected")
-    keys = db.get_keys('ASIC_STATE:SAI_OBJECT_TYPE_ROUTE_ENTRY', False)
-    print_message(MODE_DEBUG, json.dumps({"ASIC_ROUTE_ENTRY": keys}, indent=4))
+    try:
+        for keys in scan_keys(client, ROUTE_TABLE_PREFIX):
+            print_message(MODE_DEBUG, json.dumps({"ROUTE_TABLE": keys}, indent=4))
+            batches = {family: [] for family in FAMILIES}
+            for k in keys:
+                batches[prefix_family(k)].append(k)
+            for family in FAMILIES:
+                if batches[family]:
+                    queues[family].put(batches[family])
+    finally:
+        for family in FAMILIES:
+            queues[family].put(None)
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+
+    print_message(MODE_INFO, json.dumps({"skipped_routes" : sorted(skip_rt[FAMILIES[0]] + skip_rt[FAMILIES[1]])}, indent=4))
+    return PrefixTable(valid_rt[FAMILIES[0]] + valid_rt[FAMILIES[1]])
+
+def route_entry_prefix(k):
+    return k.split("\"", -1)[3]
+
+def get_route_entries(client=None):
+    if client is None:
+        client = connect('ASIC_DB')
 
     rt = []
-    for k in keys:
-        rt.append(k.split("\"", -1)[3])
-    return sorted(rt)
-
-
-def get_interfaces():
-    db = ConfigDBConnector()
-    db.db_connect('APPL_DB')
-    print_message(MODE_DEBUG, "APPL DB connected for interfaces")
+    for keys in scan_keys(client, ASIC_ROUTE_ENTRY_PREFIX):
+        print_message(MODE_DEBUG, json.dumps({"ASIC_ROUTE_ENTRY": keys}, indent=4))
+        for k in keys:
+            record = pack_prefix_or_skip(route_entry_prefix(k))
+            if record is not None:
+                rt.append(record)
+    return PrefixTable(rt)
+
+
+def interface_prefixes(k):
+    """
+        Get the prefixes an INTF_TABLE key adds to the ASIC: the address of
+        the interface and, but for the loopback, its subnet.
+    """
+    subk = k.split(':', -1)
+    ip_prefix = ":".join(subk[1:])
+    ip = add_prefix(ip_prefix.split("/", -1)[0])
+    if subk[0] in SKIPPED_INTERFACES:
+        return []
+    if (subk[0] != "lo"):
+        return [ip_subnet(ip_prefix), ip]
+    return [ip]
+
+def get_interfaces(client=None):
+    if client is None:
+        client = connect('APPL_DB')
 
     intf = []
-    keys = db.get_keys('INTF_TABLE')
-    print_message(MODE_DEBUG, json.dumps({"APPL_DB_INTF": keys}, indent=4))
-
-    for k in keys:
-        subk = k.split(':', -1)
-        alias = subk[0]
-        ip_prefix = ":".join(subk[1:])
-        ip = add_prefix(ip_prefix.split("/", -1)[0])
-        if (subk[0] == "eth0") or (subk[0] == "docker0"):
-            continue
-        if (subk[0] != "lo"):
-            intf.append(ip_subnet(ip_prefix))
-        intf.append(ip)
-    return sorted(intf)
+    for keys in scan_keys(client, INTF_TABLE_PREFIX):
+        print_message(MODE_DEBUG, json.dumps({"APPL_DB_INTF": keys}, indent=4))
+
+        for k in keys:
+            intf.extend(record for record in map(pack_prefix_or_skip, interface_prefixes(k)) if record is not None)
+    return PrefixTable(intf)
 
 def check_routes():
     intf_miss = []
@@ -154,15 +369,15 @@ def check_routes():
     intf_miss, re_miss = do_diff(get_interfaces(), re_miss)
 
     if (len(rt_miss) != 0):
-        results["missed_ROUTE_TABLE_routes"] = rt_miss
+        results["missed_ROUTE_TABLE_routes"] = list(rt_miss)
         err_present = True
 
     if (len(intf_miss) != 0):
-        results["missed_INTF_TABLE_entries"] = intf_miss
+        results["missed_INTF_TABLE_entries"] = list(intf_miss)
         err_present = True
 
     if (len(re_miss) != 0):
-        results["Unaccounted_ROUTE_ENTRY_TABLE_entries"] = re_miss
+        results["Unaccounted_ROUTE_ENTRY_TABLE_entries"] = list(re_miss)
         err_present = True
 
     if err_present:
@@ -173,20 +388,312 @@ def check_routes():
         print_message(MODE_ERR, "All good!")
         return 0
 
+class RouteMonitor(object):
+    """
+        Keep the routes of APPL_DB ROUTE_TABLE and INTF_TABLE and the ASIC_DB
+        route entries up to date from keyspace notifications, re-reading
+        only the keys which changed, and track the prefixes which are not
+        consistent between them with the time they were first seen so.
+        Prefixes are kept as their packed records.
+    """
+
+    def __init__(self, grace_period=DEFAULT_GRACE_PERIOD):
+        self.grace_period = grace_period
+        self.db = SonicV2Connector(host='127.0.0.1')
+        for db_name in ('APPL_DB', 'ASIC_DB'):
+            self.db.connect(getattr(self.db, db_name))
+        self.appl_client = self.db.get_redis_client(self.db.APPL_DB)
+        self.asic_client = self.db.get_redis_client(self.db.ASIC_DB)
+        self.loaded_at = None
+        self.routes = set()
+        self.interfaces = {}
+        self.interface_prefixes = Counter()
+        self.entries = set()
+        self.mismatches = {}
+        self.changed = set()
+        self.pubsubs = []
+
+    def enable_keyspace_events(self, client):
+        """
+            Add the classes of keyspace events needed to those the redis
+            server already sends, if any is missing.
+        """
+        events = client.config_get('notify-keyspace-events').get('notify-keyspace-events', '')
+        missing = ''.join(event for event in KEYSPACE_EVENTS
+                          if event not in events and not (event != 'K' and 'A' in events))
+        if missing:
+            client.config_set('notify-keyspace-events', events + missing)
+
+    def subscribe(self):
+        """
+            Subscribe to the changes of the tables. Called before load() so
+            that no change is missed in between.
+        """
+        for db_name, client, prefixes in (('APPL_DB', self.appl_client, (ROUTE_TABLE_PREFIX, INTF_TABLE_PREFIX)),
+                                          ('ASIC_DB', self.asic_client, (ASIC_ROUTE_ENTRY_PREFIX,))):
+            self.enable_keyspace_events(client)
+            pubsub = client.pubsub()
+            dbid = self.db.get_dbid(db_name)
+            pubsub.psubscribe(*[KEYSPACE_PATTERN.format(dbid, prefix) for prefix in prefixes])
+            self.pubsubs.append(pubsub)
+
+    def unsubscribe(self):
+        for pubsub in self.pubsubs:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+        self.pubsubs = []
+
+    def resync(self):
+        """
+            Subscribe again and read the whole tables, once notifications
+            may have been lost.
+        """
+        self.unsubscribe()
+        self.subscribe()
+        self.load()
+
+    def load(self):
+        """
+            Read the whole tables once. The prefixes which were inconsistent
+            are checked again, even if they are in no table anymore.
+        """
+        self.loaded_at = time.time()
+        self.routes = set(get_routes(self.appl_client).records())
+        self.interfaces = {}
+        self.interface_prefixes = Counter()
+        for keys in scan_keys(self.appl_client, INTF_TABLE_PREFIX):
+            for k in keys:
+                self.update_interface(k, True)
+        self.entries = set(get_route_entries(self.asic_client).records())
+        self.changed = self.routes | set(self.interface_prefixes) | self.entries | set(self.mismatches)
+
+    def update_route(self, k):
+        prefix = pack_prefix_or_skip(k)
+        if prefix is None:
+            return
+        if self.appl_client.hget(ROUTE_TABLE_PREFIX + k, 'nexthop'):
+            self.routes.add(prefix)
+        else:
+            self.routes.discard(prefix)
+        self.changed.add(prefix)
+
+    def update_interface(self, k, exists=None):
+        if exists is None:
+            exists = self.appl_client.exists(INTF_TABLE_PREFIX + k)
+        prefixes = self.interfaces.pop(k, [])
+        for prefix in prefixes:
+            self.interface_prefixes[prefix] -= 1
+            if not self.interface_prefixes[prefix]:
+                del self.interface_prefixes[prefix]
+        if exists:
+            prefixes = [record for record in map(pack_prefix_or_skip, interface_prefixes(k)) if record is not None]
+            self.interfaces[k] = prefixes
+            self.interface_prefixes.update(prefixes)
+        self.changed.update(prefixes)
+
+    def update_entry(self, k):
+        prefix = pack_prefix_or_skip(route_entry_prefix(k))
+        if prefix is None:
+            return
+        if self.asic_client.exists(ASIC_ROUTE_ENTRY_PREFIX + k):
+            self.entries.add(prefix)
+        else:
+            self.entries.discard(prefix)
+        self.changed.add(prefix)
+
+    def handle_event(self, channel):
+        """
+            Update the tables from the keyspace notification of a key.
+        """
+        key = channel.split(':', 1)[1]
+        if key.startswith(ROUTE_TABLE_PREFIX):
+            self.update_route(key[len(ROUTE_TABLE_PREFIX):])
+        elif key.startswith(INTF_TABLE_PREFIX):
+            self.update_interface(key[len(INTF_TABLE_PREFIX):])
+        elif key.startswith(ASIC_ROUTE_ENTRY_PREFIX):
+            self.update_entry(key[len(ASIC_ROUTE_ENTRY_PREFIX):])
+
+    def process_events(self):
+        """
+            Apply the pending keyspace notifications. Returns their number.
+        """
+        count = 0
+        for pubsub in self.pubsubs:
+            while True:
+                message = pubsub.get_message()
+                if message is None:
+                    break
+                if message['type'] == 'pmessage':
+                    self.handle_event(message['channel'])
+                    count += 1
+        return count
+
+    def check(self, now):
+        """
+            Check the prefixes changed since the last check.
+        """
+        for prefix in self.changed:
+            expected = prefix in self.routes or self.interface_prefixes[prefix] > 0
+            if expected == (prefix in self.entries):
+                self.mismatches.pop(prefix, None)
+            else:
+                self.mismatches.setdefault(prefix, now)
+        self.changed = set()
+
+    def get_results(self, now):
+        """
+            Get the prefixes inconsistent for at least the grace period, as
+            reported by check_routes().
+        """
+        rt_miss = []
+        intf_miss = []
+        re_miss = []
+        for prefix, since in self.mismatches.iteritems():
+            if now - since < self.grace_period:
+                continue
+            if prefix in self.entries:
+                re_miss.append(prefix)
+                continue
+            if prefix in self.routes:
+                rt_miss.append(prefix)
+            if self.interface_prefixes[prefix] > 0:
+                intf_miss.append(prefix)
+
+        results = {}
+        if rt_miss:
+            results["missed_ROUTE_TABLE_routes"] = [unpack_prefix(record) for record in sorted(rt_miss, key=record_key)]
+        if intf_miss:
+            results["missed_INTF_TABLE_entries"] = [unpack_prefix(record) for record in sorted(intf_miss, key=record_key)]
+        if re_miss:
+            results["Unaccounted_ROUTE_ENTRY_TABLE_entries"] = [unpack_prefix(record)
+                                                                for record in sorted(re_miss, key=record_key)]
+        return results
+
+def write_metrics(path, metrics):
+    """
+        Atomically write the metrics to path as JSON.
+    """
+    dirname, basename = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + basename + '.', dir=dirname)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(metrics, f, indent=4)
+        os.chmod(tmp_path, 0o644)
+        os.rename(tmp_path, path)
+    except:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def run_daemon(interval=DEFAULT_INTERVAL, grace_period=DEFAULT_GRACE_PERIOD,
+               metrics_file=DEFAULT_METRICS_FILE, count=None, reload_interval=DEFAULT_RELOAD_INTERVAL):
+    """
+        Check the routes continuously, every interval seconds, reporting the
+        prefixes inconsistent for at least grace_period seconds whenever
+        they change, and writing the metrics of every check to metrics_file.
+        The tables are read again every reload_interval seconds, and after
+        the connection to redis is lost, as notifications may have been
+        lost. Stops after count checks if given, or when interrupted.
+    """
+    start = time.time()
+    monitor = RouteMonitor(grace_period)
+    monitor.subscribe()
+    monitor.load()
+    print_message(MODE_INFO, "Loaded {} routes, {} interfaces and {} route entries in {:.3f}s".format(
+                  len(monitor.routes), len(monitor.interfaces), len(monitor.entries), time.time() - start))
+
+    reported = {}
+    checks = 0
+    resync = False
+    try:
+        while count is None or checks < count:
+            if checks:
+                time.sleep(interval)
+            checks += 1
+            start = time.time()
+            try:
+                if resync:
+                    monitor.resync()
+                    resync = False
+                elif reload_interval and start - monitor.loaded_at >= reload_interval:
+                    monitor.load()
+                events = monitor.process_events()
+            except CONNECTION_ERRORS as e:
+                print_message(MODE_ERR, "Lost the connection to redis ({}), reloading the tables".format(e))
+                resync = True
+                continue
+            monitor.check(start)
+            results = monitor.get_results(start)
+            latency = time.time() - start
+
+            if results != reported:
+                if results:
+                    print_message(MODE_ERR, "results: {",  json.dumps(results, indent=4), "}")
+                    print_message(MODE_ERR, "Failed. Look at reported mismatches above")
+                else:
+                    print_message(MODE_ERR, "All good!")
+                reported = results
+
+            if metrics_file:
+                write_metrics(metrics_file, {
+                    "time": int(start),
+                    "mismatches": sum(len(prefixes) for prefixes in results.itervalues()),
+                    "pending_mismatches": len(monitor.mismatches),
+                    "check_latency_ms": round(latency * 1000, 3),
+                    "events": events,
+                    "routes": len(monitor.routes),
+                    "route_entries": len(monitor.entries),
+                    "interfaces": len(monitor.interfaces)
+                })
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.unsubscribe()
+    return monitor
+
 def usage():
     print sys.argv[0], "[-m <QUIET|ERR|INFO|DEBUG>]"
     print sys.argv[0], "[--mode=<QUIET|ERR|INFO|DEBUG>]"
+    print sys.argv[0], "-d [-i <interval>] [-g <grace period>] [-r <reload interval>] [-f <metrics file>]"
+    print sys.argv[0], "--daemon [--interval=<seconds>] [--grace=<seconds>] [--reload=<seconds>] [--metrics=<file>]"
     sys.exit(-1)
 
 def main(argv):
     try:
-        opts, argv = getopt.getopt(argv, "m:", ["mode="])
+        opts, argv = getopt.getopt(argv, "m:di:g:r:f:",
+                                   ["mode=", "daemon", "interval=", "grace=", "reload=", "metrics="])
     except getopt.GetoptError:
         usage()
 
-    for opt, arg in opts:
-        if opt in ("-m", "--mode"):
-            set_mode(arg)
+    daemon = False
+    interval = DEFAULT_INTERVAL
+    grace_period = DEFAULT_GRACE_PERIOD
+    reload_interval = DEFAULT_RELOAD_INTERVAL
+    metrics_file = DEFAULT_METRICS_FILE
+    try:
+        for opt, arg in opts:
+            if opt in ("-m", "--mode"):
+                set_mode(arg)
+            elif opt in ("-d", "--daemon"):
+                daemon = True
+            elif opt in ("-i", "--interval"):
+                interval = float(arg)
+            elif opt in ("-g", "--grace"):
+                grace_period = float(arg)
+            elif opt in ("-r", "--reload"):
+                reload_interval = float(arg)
+            elif opt in ("-f", "--metrics"):
+                metrics_file = arg
+    except ValueError:
+        usage()
+
+    if daemon:
+        # Stop on SIGTERM as on Ctrl-C
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        run_daemon(interval, grace_period, metrics_file, reload_interval=reload_interval)
+        sys.exit(0)
 
     ret = check_routes()
     sys.exit(ret)
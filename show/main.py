@@ -1,6 +1,10 @@
 #! /usr/bin/python -u
 
+import time
+_import_start_time = time.time()
+
 import errno
+import imp
 import json
 import netaddr
 import netifaces
@@ -12,17 +16,23 @@ import ipaddress
 
 import click
 from click_default_group import DefaultGroup
+from distutils.spawn import find_executable
 from natsort import natsorted
 from tabulate import tabulate
 
 import sonic_device_util
 from swsssdk import ConfigDBConnector
 from swsssdk import SonicV2Connector
+from utilities_common.util_base import UtilHelper
 
 import mlnx
 
 SONIC_CFGGEN_PATH = '/usr/local/bin/sonic-cfggen'
 
+# Set SHOW_PROFILE_IMPORT in the environment to print the time spent in
+# each phase of the 'show' startup to stderr
+SHOW_PROFILE_IMPORT = os.getenv('SHOW_PROFILE_IMPORT') is not None
+
 VLAN_SUB_INTERFACE_SEPARATOR = '.'
 
 try:
@@ -33,6 +43,15 @@ except ImportError:
     import configparser
 
 
+def profile_phase(phase, start_time):
+    """Print the time elapsed since start_time if SHOW_PROFILE_IMPORT is set"""
+    if SHOW_PROFILE_IMPORT:
+        click.echo("[profile] {}: {:.1f} ms".format(phase, (time.time() - start_time) * 1000), err=True)
+
+
+profile_phase("imports", _import_start_time)
+
+
 # This is from the aliases example:
 # https://github.com/pallets/click/blob/57c6f09611fc47ca80db0bd010f05998b3c0aa95/examples/aliases/aliases.py
 class Config(object):
@@ -54,65 +73,120 @@ class InterfaceAliasConverter(object):
     """Class which handles conversion between interface name and alias"""
 
     def __init__(self):
-        self.alias_max_length = 0
-
+        # The PORT table is only read from ConfigDB when it is first needed
+        self._port_dict = None
+        self._alias_max_length = 0
+        self._name_to_alias_map = {}
+        self._alias_to_name_map = {}
+        self._name_regexes = {}
+
+    def load_port_dict(self):
+        start_time = time.time()
         config_db = ConfigDBConnector()
         config_db.connect()
-        self.port_dict = config_db.get_table('PORT')
+        port_dict = config_db.get_table('PORT')
 
-        if not self.port_dict:
+        if not port_dict:
             click.echo(message="Warning: failed to retrieve PORT table from ConfigDB!", err=True)
-            self.port_dict = {}
+            port_dict = {}
+
+        self.set_port_dict(port_dict)
+        profile_phase("port alias table", start_time)
 
-        for port_name in self.port_dict.keys():
+    def set_port_dict(self, port_dict):
+        """Set the PORT table and build the name <-> alias indexes"""
+        self._port_dict = port_dict
+        self._alias_max_length = 0
+        self._name_regexes = {}
+
+        for port_name in self._port_dict.keys():
             try:
-                if self.alias_max_length < len(
-                        self.port_dict[port_name]['alias']):
-                   self.alias_max_length = len(
-                        self.port_dict[port_name]['alias'])
+                if self._alias_max_length < len(
+                        self._port_dict[port_name]['alias']):
+                   self._alias_max_length = len(
+                        self._port_dict[port_name]['alias'])
             except KeyError:
                 break
 
-    def name_to_alias(self, interface_name):
-        """Return vendor interface alias if SONiC
-           interface name is given as argument
-        """
+        self._name_to_alias_map = {port_name: port['alias']
+                                   for port_name, port in self._port_dict.items() if 'alias' in port}
+        self._alias_to_name_map = {alias: port_name
+                                   for port_name, alias in self._name_to_alias_map.items()}
+
+    @property
+    def port_dict(self):
+        if self._port_dict is None:
+            self.load_port_dict()
+        return self._port_dict
+
+    @property
+    def alias_max_length(self):
+        if self._port_dict is None:
+            self.load_port_dict()
+        return self._alias_max_length
+
+    @property
+    def name_to_alias_map(self):
+        if self._port_dict is None:
+            self.load_port_dict()
+        return self._name_to_alias_map
+
+    @property
+    def alias_to_name_map(self):
+        if self._port_dict is None:
+            self.load_port_dict()
+        return self._alias_to_name_map
+
+    def _convert(self, interface, index):
+        """Look up interface (optionally a sub-interface) in index"""
         vlan_id = ''
         sub_intf_sep_idx = -1
-        if interface_name is not None:
-            sub_intf_sep_idx = interface_name.find(VLAN_SUB_INTERFACE_SEPARATOR)
+        if interface is not None:
+            sub_intf_sep_idx = interface.find(VLAN_SUB_INTERFACE_SEPARATOR)
             if sub_intf_sep_idx != -1:
-                vlan_id = interface_name[sub_intf_sep_idx + 1:]
-                # interface_name holds the parent port name
-                interface_name = interface_name[:sub_intf_sep_idx]
+                vlan_id = interface[sub_intf_sep_idx + 1:]
+                # interface holds the parent port name or alias
+                interface = interface[:sub_intf_sep_idx]
 
-            for port_name in self.port_dict.keys():
-                if interface_name == port_name:
-                    return self.port_dict[port_name]['alias'] if sub_intf_sep_idx == -1 \
-                            else self.port_dict[port_name]['alias'] + VLAN_SUB_INTERFACE_SEPARATOR + vlan_id
+            interface = index.get(interface, interface)
 
-        # interface_name not in port_dict. Just return interface_name
-        return interface_name if sub_intf_sep_idx == -1 else interface_name + VLAN_SUB_INTERFACE_SEPARATOR + vlan_id
+        # interface not in index. Just return interface
+        return interface if sub_intf_sep_idx == -1 else interface + VLAN_SUB_INTERFACE_SEPARATOR + vlan_id
+
+    def name_to_alias(self, interface_name):
+        """Return vendor interface alias if SONiC
+           interface name is given as argument
+        """
+        return self._convert(interface_name, self.name_to_alias_map)
 
     def alias_to_name(self, interface_alias):
         """Return SONiC interface name if vendor
            port alias is given as argument
         """
-        vlan_id = ''
-        sub_intf_sep_idx = -1
-        if interface_alias is not None:
-            sub_intf_sep_idx = interface_alias.find(VLAN_SUB_INTERFACE_SEPARATOR)
-            if sub_intf_sep_idx != -1:
-                vlan_id = interface_alias[sub_intf_sep_idx + 1:]
-                # interface_alias holds the parent port alias
-                interface_alias = interface_alias[:sub_intf_sep_idx]
+        return self._convert(interface_alias, self.alias_to_name_map)
 
-            for port_name in self.port_dict.keys():
-                if interface_alias == self.port_dict[port_name]['alias']:
-                    return port_name if sub_intf_sep_idx == -1 else port_name + VLAN_SUB_INTERFACE_SEPARATOR + vlan_id
+    def name_regex(self, suffix):
+        """Return a compiled regex matching any SONiC interface name which is
+           preceded by whitespace or the start of the text and followed by
+           the suffix pattern, None if there are no ports
+        """
+        if suffix not in self._name_regexes:
+            names = sorted(self.name_to_alias_map.keys(), key=len, reverse=True)
+            if names:
+                self._name_regexes[suffix] = re.compile(r"(?<!\S)({})(?={})".format(
+                        "|".join(re.escape(name) for name in names), suffix))
+            else:
+                self._name_regexes[suffix] = None
+        return self._name_regexes[suffix]
 
-        # interface_alias not in port_dict. Just return interface_alias
-        return interface_alias if sub_intf_sep_idx == -1 else interface_alias + VLAN_SUB_INTERFACE_SEPARATOR + vlan_id
+    def replace_names(self, text, suffix):
+        """Replace all the SONiC interface names followed by the suffix
+           pattern in text with the vendor aliases, in a single pass
+        """
+        regex = self.name_regex(suffix)
+        if regex is None:
+            return text
+        return regex.sub(lambda match: self._name_to_alias_map[match.group(1)], text)
 
 
 # Global Config object
@@ -143,6 +217,13 @@ class AliasedGroup(DefaultGroup):
         if rv is not None:
             return rv
 
+        # Some commands are registered on demand, retry once they are in
+        # place
+        if self.load_commands():
+            rv = click.Group.get_command(self, ctx, cmd_name)
+            if rv is not None:
+                return rv
+
         # No builtin found. Look up an explicit command alias in the config
         if cmd_name in _config.aliases:
             actual_cmd = _config.aliases[cmd_name]
@@ -163,30 +244,40 @@ class AliasedGroup(DefaultGroup):
             return DefaultGroup.get_command(self, ctx, matches[0])
         ctx.fail('Too many matches: %s' % ', '.join(sorted(matches)))
 
+    def load_commands(self):
+        """Register the commands of the group which are registered on
+           demand. Returns True if any was registered
+        """
+        return False
 
-# To be enhanced. Routing-stack information should be collected from a global
-# location (configdb?), so that we prevent the continous execution of this
-# bash oneliner. To be revisited once routing-stack info is tracked somewhere.
-def get_routing_stack():
-    command = "sudo docker ps | grep bgp | awk '{print$2}' | cut -d'-' -f3 | cut -d':' -f1"
 
-    try:
-        proc = subprocess.Popen(command,
-                                stdout=subprocess.PIPE,
-                                shell=True,
-                                stderr=subprocess.STDOUT)
-        stdout = proc.communicate()[0]
-        proc.wait()
-        result = stdout.rstrip('\n')
+class RoutingStackGroup(AliasedGroup):
+    """AliasedGroup hosting routing-stack specific commands, which are only
+    registered when the commands of the group are listed or a lookup misses
+    its builtin commands. The other groups never detect the routing stack.
+    """
 
-    except OSError, e:
-        raise OSError("Cannot detect routing-stack")
+    def load_commands(self):
+        return load_routing_stack_commands()
 
-    return (result)
+    def list_commands(self, ctx):
+        self.load_commands()
+        return AliasedGroup.list_commands(self, ctx)
 
 
-# Global Routing-Stack variable
-routing_stack = get_routing_stack()
+# The routing stack is cached on disk by the metadata cache of util_base, and
+# only looked up once a command needs it.
+_routing_stack = None
+
+def get_routing_stack():
+    global _routing_stack
+
+    if _routing_stack is None:
+        start_time = time.time()
+        _routing_stack = UtilHelper().get_routing_stack()
+        profile_phase("routing stack detection", start_time)
+
+    return _routing_stack
 
 
 def run_command(command, display_cmd=False, return_cmd=False):
@@ -216,6 +307,55 @@ def run_command(command, display_cmd=False, return_cmd=False):
         sys.exit(rc)
 
 
+# Stat scripts which can be run in-process through their main(argv, name_to_alias)
+# entry point, instead of forking a shell and a second Python interpreter
+IN_PROCESS_STAT_SCRIPTS = ['portstat', 'intfstat', 'pfcstat', 'queuestat', 'watermarkstat']
+
+_stat_scripts = {}
+
+def load_stat_script(name):
+    """Import the stat script found on the PATH as a module, None if the
+       script can't be found
+    """
+    if name not in _stat_scripts:
+        module = None
+        script_path = find_executable(name)
+        if script_path is not None:
+            # Don't leave compiled files next to the installed scripts
+            dont_write_bytecode = sys.dont_write_bytecode
+            sys.dont_write_bytecode = True
+            try:
+                module = imp.load_source(name, script_path)
+            finally:
+                sys.dont_write_bytecode = dont_write_bytecode
+        _stat_scripts[name] = module
+
+    return _stat_scripts[name]
+
+
+def run_stat_command(command, display_cmd=False):
+    """Run a stat script command in-process. In alias mode, the script
+       converts the interface names of its rows before tabulating them
+    """
+    args = command.split()
+    module = None
+    if args[0] in IN_PROCESS_STAT_SCRIPTS:
+        module = load_stat_script(args[0])
+
+    if module is None:
+        run_command(command, display_cmd=display_cmd)
+        return
+
+    if display_cmd:
+        click.echo(click.style("Command: ", fg='cyan') + click.style(command, fg='green'))
+
+    name_to_alias = None
+    if get_interface_mode() == "alias":
+        name_to_alias = iface_alias_converter.name_to_alias
+
+    module.main(args[1:], name_to_alias)
+
+
 def get_interface_mode():
     mode = os.getenv('SONIC_CLI_IFACE_MODE')
     if mode is None:
@@ -232,7 +372,8 @@ def is_ip_prefix_in_key(key):
     return (isinstance(key, tuple))
 
 
-# Global class instance for SONiC interface name to alias conversion
+# Global class instance for SONiC interface name to alias conversion. The
+# PORT table is loaded from ConfigDB on first use
 iface_alias_converter = InterfaceAliasConverter()
 
 
@@ -258,9 +399,7 @@ def print_output_in_alias_mode(output, index):
     if word:
         interface_name = word[index]
         interface_name = interface_name.replace(':', '')
-    for port_name in natsorted(iface_alias_converter.port_dict.keys()):
-            if interface_name == port_name:
-                alias_name = iface_alias_converter.port_dict[port_name]['alias']
+        alias_name = iface_alias_converter.name_to_alias_map.get(interface_name, "")
     if alias_name:
         if len(alias_name) < iface_alias_converter.alias_max_length:
             alias_name = alias_name.rjust(
@@ -371,11 +510,8 @@ def run_command_in_alias_mode(command):
                 whitespace and followed immediately by either the end of a line or whitespace
                 OR followed immediately by '(D)', '(S)', '(D*)' or '(S*)'
                 """
-                converted_output = raw_output
-                for port_name in iface_alias_converter.port_dict.keys():
-                    converted_output = re.sub(r"(^|\s){}(\([DS]\*{{0,1}}\)(?:$|\s))".format(port_name),
-                            r"\1{}\2".format(iface_alias_converter.name_to_alias(port_name)),
-                            converted_output)
+                converted_output = iface_alias_converter.replace_names(raw_output,
+                        r"\([DS]\*{0,1}\)(?:$|\s)")
                 click.echo(converted_output.rstrip('\n'))
 
             else:
@@ -385,11 +521,7 @@ def run_command_in_alias_mode(command):
                 whitespace and followed immediately by either the end of a line or whitespace
                 or a comma followed by whitespace
                 """
-                converted_output = raw_output
-                for port_name in iface_alias_converter.port_dict.keys():
-                    converted_output = re.sub(r"(^|\s){}($|,{{0,1}}\s)".format(port_name),
-                            r"\1{}\2".format(iface_alias_converter.name_to_alias(port_name)),
-                            converted_output)
+                converted_output = iface_alias_converter.replace_names(raw_output, r"$|,{0,1}\s")
                 click.echo(converted_output.rstrip('\n'))
 
     rc = process.poll()
@@ -545,10 +677,10 @@ CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help', '-?'])
 
 # This is our entrypoint - the main "show" command
 # TODO: Consider changing function name to 'show' for better understandability
-@click.group(cls=AliasedGroup, context_settings=CONTEXT_SETTINGS)
+@click.group(cls=RoutingStackGroup, context_settings=CONTEXT_SETTINGS)
 def cli():
     """SONiC command line - 'show' command"""
-    pass
+    profile_phase("startup", _import_start_time)
 
 #
 # 'vrf' command ("show vrf")
@@ -954,9 +1086,12 @@ def status(interfacename, verbose):
 @interfaces.group(invoke_without_command=True)
 @click.option('-a', '--printall', is_flag=True)
 @click.option('-p', '--period')
+@click.option('--top', type=int, help="Show only the top N interfaces")
+@click.option('--sort', type=click.Choice(['rx_bps', 'tx_bps', 'rx_drop', 'tx_err', 'util']),
+              help="Counter to rank the interfaces by with --top")
 @click.option('--verbose', is_flag=True, help="Enable verbose output")
 @click.pass_context
-def counters(ctx, verbose, period, printall):
+def counters(ctx, verbose, period, printall, top, sort):
     """Show interface counters"""
 
     if ctx.invoked_subcommand is None:
@@ -966,8 +1101,12 @@ def counters(ctx, verbose, period, printall):
             cmd += " -a"
         if period is not None:
             cmd += " -p {}".format(period)
+        if top is not None:
+            cmd += " --top {}".format(top)
+        if sort is not None:
+            cmd += " --sort {}".format(sort)
 
-        run_command(cmd, display_cmd=verbose)
+        run_stat_command(cmd, display_cmd=verbose)
 
 # 'counters' subcommand ("show interfaces counters rif")
 @counters.command()
@@ -983,7 +1122,7 @@ def rif(interface, period, verbose):
     if interface is not None:
         cmd += " -i {}".format(interface)
 
-    run_command(cmd, display_cmd=verbose)
+    run_stat_command(cmd, display_cmd=verbose)
 
 # 'portchannel' subcommand ("show interfaces portchannel")
 @interfaces.command()
@@ -1035,13 +1174,19 @@ def pfc():
 
 # 'counters' subcommand ("show interfaces pfccounters")
 @pfc.command()
+@click.option('-p', '--period')
+@click.option('--threshold', help="PFC frames/s above which a priority is flagged as storming with -p")
 @click.option('--verbose', is_flag=True, help="Enable verbose output")
-def counters(verbose):
+def counters(period, threshold, verbose):
     """Show pfc counters"""
 
     cmd = "pfcstat"
+    if period is not None:
+        cmd += " -p {}".format(period)
+    if threshold is not None:
+        cmd += " --threshold {}".format(threshold)
 
-    run_command(cmd, display_cmd=verbose)
+    run_stat_command(cmd, display_cmd=verbose)
 
 # 'naming_mode' subcommand ("show interfaces naming_mode")
 @interfaces.command()
@@ -1098,7 +1243,7 @@ def counters(interfacename, verbose):
     if interfacename is not None:
         cmd += " -p {}".format(interfacename)
 
-    run_command(cmd, display_cmd=verbose)
+    run_stat_command(cmd, display_cmd=verbose)
 
 #
 # 'watermarks' subgroup ("show queue watermarks ...")
@@ -1114,14 +1259,14 @@ def watermark():
 def wm_q_uni():
     """Show user WM for unicast queues"""
     command = 'watermarkstat -t q_shared_uni'
-    run_command(command)
+    run_stat_command(command)
 
 # 'multicast' subcommand ("show queue watermarks multicast")
 @watermark.command('multicast')
 def wm_q_multi():
     """Show user WM for multicast queues"""
     command = 'watermarkstat -t q_shared_multi'
-    run_command(command)
+    run_stat_command(command)
 
 #
 # 'persistent-watermarks' subgroup ("show queue persistent-watermarks ...")
@@ -1137,14 +1282,14 @@ def persistent_watermark():
 def pwm_q_uni():
     """Show persistent WM for unicast queues"""
     command = 'watermarkstat -p -t q_shared_uni'
-    run_command(command)
+    run_stat_command(command)
 
 # 'multicast' subcommand ("show queue persistent-watermarks multicast")
 @persistent_watermark.command('multicast')
 def pwm_q_multi():
     """Show persistent WM for multicast queues"""
     command = 'watermarkstat -p -t q_shared_multi'
-    run_command(command)
+    run_stat_command(command)
 
 
 #
@@ -1164,13 +1309,13 @@ def watermark():
 def wm_pg_headroom():
     """Show user headroom WM for pg"""
     command = 'watermarkstat -t pg_headroom'
-    run_command(command)
+    run_stat_command(command)
 
 @watermark.command('shared')
 def wm_pg_shared():
     """Show user shared WM for pg"""
     command = 'watermarkstat -t pg_shared'
-    run_command(command)
+    run_stat_command(command)
 
 @priority_group.group(name='persistent-watermark')
 def persistent_watermark():
@@ -1181,13 +1326,13 @@ def persistent_watermark():
 def pwm_pg_headroom():
     """Show persistent headroom WM for pg"""
     command = 'watermarkstat -p -t pg_headroom'
-    run_command(command)
+    run_stat_command(command)
 
 @persistent_watermark.command('shared')
 def pwm_pg_shared():
     """Show persistent shared WM for pg"""
     command = 'watermarkstat -p -t pg_shared'
-    run_command(command)
+    run_stat_command(command)
 
 
 #
@@ -1202,13 +1347,13 @@ def buffer_pool():
 def wm_buffer_pool():
     """Show user WM for buffer pools"""
     command = 'watermarkstat -t buffer_pool'
-    run_command(command)
+    run_stat_command(command)
 
 @buffer_pool.command('persistent-watermark')
 def pwm_buffer_pool():
     """Show persistent WM for buffer pools"""
     command = 'watermarkstat -p -t buffer_pool'
-    run_command(command)
+    run_stat_command(command)
 
 
 #
@@ -1435,7 +1580,7 @@ def protocol(verbose):
 #
 
 # This group houses IPv6-related commands and subgroups
-@cli.group(cls=AliasedGroup, default_if_no_args=False)
+@cli.group(cls=RoutingStackGroup, default_if_no_args=False)
 def ipv6():
     """Show IPv6 commands"""
     pass
@@ -1541,22 +1686,42 @@ def protocol(verbose):
 from .bgp_quagga_v4 import bgp
 ip.add_command(bgp)
 
-if routing_stack == "quagga":
-    from .bgp_quagga_v6 import bgp
-    ipv6.add_command(bgp)
-elif routing_stack == "frr":
-    from .bgp_frr_v6 import bgp
-    ipv6.add_command(bgp)
-    @cli.command()
-    @click.argument('bgp_args', nargs = -1, required = False)
-    @click.option('--verbose', is_flag=True, help="Enable verbose output")
-    def bgp(bgp_args, verbose):
-        """Show BGP information"""
-        bgp_cmd = "show bgp"
-        for arg in bgp_args:
-            bgp_cmd += " " + str(arg)
-        cmd = 'sudo vtysh -c "{}"'.format(bgp_cmd)
-        run_command(cmd, display_cmd=verbose)
+# 'bgp' command ("show bgp"), only available with the frr routing-stack
+@click.command('bgp')
+@click.argument('bgp_args', nargs = -1, required = False)
+@click.option('--verbose', is_flag=True, help="Enable verbose output")
+def frr_bgp(bgp_args, verbose):
+    """Show BGP information"""
+    bgp_cmd = "show bgp"
+    for arg in bgp_args:
+        bgp_cmd += " " + str(arg)
+    cmd = 'sudo vtysh -c "{}"'.format(bgp_cmd)
+    run_command(cmd, display_cmd=verbose)
+
+# Detecting the routing-stack forks 'docker ps', so the commands depending on
+# it are only registered by the groups hosting them (RoutingStackGroup), when
+# their commands are listed or a lookup misses their builtin commands
+_routing_stack_commands_loaded = False
+
+def load_routing_stack_commands():
+    """Register the routing-stack specific commands. Returns True the first
+       time it is called, False afterwards
+    """
+    global _routing_stack_commands_loaded
+
+    if _routing_stack_commands_loaded:
+        return False
+    _routing_stack_commands_loaded = True
+
+    routing_stack = get_routing_stack()
+    if routing_stack == "quagga":
+        from .bgp_quagga_v6 import bgp
+        ipv6.add_command(bgp)
+    elif routing_stack == "frr":
+        from .bgp_frr_v6 import bgp
+        ipv6.add_command(bgp)
+        cli.add_command(frr_bgp)
+    return True
 
 
 #
@@ -2806,5 +2971,7 @@ def features():
         body.append([key, status_data[key]['status']])
     click.echo(tabulate(body, header))
 
+profile_phase("module load", _import_start_time)
+
 if __name__ == '__main__':
     cli()
@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+import mock
+import mock_tables.dbconnector
+from helpers import benchmark
+
+import show.main as show
+
+BENCHMARK_PORT_COUNT = 512
+
+
+def make_port_dict(port_count):
+    return {"Ethernet{}".format(i * 4): {"alias": "etp{}".format(i + 1)} for i in range(port_count)}
+
+
+class TestInterfaceAliasConverter(object):
+    def setup_method(self, method):
+        self.converter = show.InterfaceAliasConverter()
+        self.converter.set_port_dict(make_port_dict(32))
+
+    def test_name_to_alias(self):
+        assert self.converter.name_to_alias("Ethernet0") == "etp1"
+        assert self.converter.name_to_alias("Ethernet124") == "etp32"
+        assert self.converter.name_to_alias("Ethernet4.10") == "etp2.10"
+        assert self.converter.name_to_alias("Ethernet1000") == "Ethernet1000"
+        assert self.converter.name_to_alias("PortChannel0001") == "PortChannel0001"
+
+    def test_alias_to_name(self):
+        assert self.converter.alias_to_name("etp1") == "Ethernet0"
+        assert self.converter.alias_to_name("etp2.10") == "Ethernet4.10"
+        assert self.converter.alias_to_name("etp1000") == "etp1000"
+
+    def test_lazy_load(self):
+        converter = show.InterfaceAliasConverter()
+        assert converter.name_to_alias("Ethernet20") == "etp6"
+        assert converter.alias_to_name("etp29") == "Ethernet112"
+        assert converter.alias_max_length == 5
+
+    def test_replace_names(self):
+        output = "Ethernet0 Ethernet4, Ethernet40 Ethernet400 Ethernet4-1\n"
+        assert self.converter.replace_names(output, r"$|,{0,1}\s") == \
+            "etp1 etp2, etp11 Ethernet400 Ethernet4-1\n"
+        output = "PortChannel0001  LACP(A)(Up)  Ethernet0(S) Ethernet4(D*)\n"
+        assert self.converter.replace_names(output, r"\([DS]\*{0,1}\)(?:$|\s)") == \
+            "PortChannel0001  LACP(A)(Up)  etp1(S) etp2(D*)\n"
+
+    def test_print_output_in_alias_mode(self):
+        lines = ["Ethernet0        U  1,234\n", "Ethernet124      U  0\n", "PortChannel0001  U  5\n"]
+        with mock.patch.object(show, "iface_alias_converter", self.converter), \
+                mock.patch.object(show.click, "echo") as echo:
+            for line in lines:
+                show.print_output_in_alias_mode(line, 0)
+        assert [call[0][0].split() for call in echo.call_args_list] == \
+            [["etp1", "U", "1,234"], ["etp32", "U", "0"], ["PortChannel0001", "U", "5"]]
+
+    @benchmark
+    def test_benchmark_alias_mode_512_ports(self):
+        converter = show.InterfaceAliasConverter()
+        converter.set_port_dict(make_port_dict(BENCHMARK_PORT_COUNT))
+        names = sorted(converter.port_dict.keys())
+        lines = ["{}        U  1,234  0.00 B/s  0.00%  0  0  0\n".format(name) for name in names]
+
+        with mock.patch.object(show, "iface_alias_converter", converter), \
+                mock.patch.object(show.click, "echo") as echo:
+            start = time.time()
+            for line in lines:
+                echo(line.rstrip('\n'))
+            default_time = time.time() - start
+
+            start = time.time()
+            for line in lines:
+                show.print_output_in_alias_mode(line, 0)
+            alias_time = time.time() - start
+
+            start = time.time()
+            for line in lines:
+                converter.replace_names(line, r"$|,{0,1}\s")
+            rewrite_time = time.time() - start
+
+        print("{} lines: default {:.4f}s, alias mode {:.4f}s, regex rewrite {:.4f}s".format(
+              len(lines), default_time, alias_time, rewrite_time))
+
+        assert echo.call_args_list[len(lines)][0][0].split()[0] == converter.name_to_alias(names[0])
+        assert echo.call_args_list[-1][0][0].split()[0] == converter.name_to_alias(names[-1])
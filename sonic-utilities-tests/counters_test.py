@@ -0,0 +1,71 @@
+import os
+import sys
+
+import swsssdk
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+import mock_tables.dbconnector
+
+from utilities_common.counters import CountersDB, CounterSnapshot, COUNTER_MAX, COUNTER_NA, \
+    COUNTERS_PORT_NAME_MAP, COUNTERS_RIF_NAME_MAP, bulk_hgetall, bulk_hmget, counter_value
+
+
+class TestCountersDB(object):
+    def setup_method(self, method):
+        self.counters = CountersDB()
+
+    def test_name_map_loaded_once(self):
+        name_map = self.counters.get_name_map(COUNTERS_PORT_NAME_MAP)
+        assert name_map == {"Ethernet0": "oid:0x1000000000002",
+                            "Ethernet4": "oid:0x1000000000004",
+                            "Ethernet8": "oid:0x1000000000006"}
+        assert self.counters.get_name_map(COUNTERS_PORT_NAME_MAP) is name_map
+        assert self.counters.get_name_map("COUNTERS_NONEXISTENT_MAP") == {}
+
+    def test_snapshot(self):
+        snapshot = self.counters.snapshot(COUNTERS_PORT_NAME_MAP,
+                                          ["SAI_PORT_STAT_IF_IN_ERRORS",
+                                           "SAI_PORT_STAT_IF_IN_DISCARDS",
+                                           "SAI_PORT_STAT_IF_IN_OCTETS"])
+        assert snapshot.names == ["Ethernet0", "Ethernet4", "Ethernet8"]
+        assert snapshot.oids == ["oid:0x1000000000002", "oid:0x1000000000004", "oid:0x1000000000006"]
+        assert list(snapshot.column("SAI_PORT_STAT_IF_IN_DISCARDS")) == [100, 1000, 10]
+        assert list(snapshot.column("SAI_PORT_STAT_IF_IN_OCTETS")) == [COUNTER_NA] * 3
+        assert snapshot.get("Ethernet8", "SAI_PORT_STAT_IF_IN_ERRORS") == 100
+        assert snapshot.get("Ethernet8", "SAI_PORT_STAT_IF_IN_OCTETS") is None
+        assert snapshot.row("Ethernet4") == {"SAI_PORT_STAT_IF_IN_ERRORS": 0,
+                                             "SAI_PORT_STAT_IF_IN_DISCARDS": 1000,
+                                             "SAI_PORT_STAT_IF_IN_OCTETS": None}
+
+    def test_snapshot_subset(self):
+        snapshot = self.counters.snapshot(COUNTERS_RIF_NAME_MAP,
+                                          ["SAI_ROUTER_INTERFACE_STAT_IN_ERROR_OCTETS"],
+                                          names=["Ethernet20", "Ethernet1000"])
+        assert snapshot.names == ["Ethernet20"]
+        assert "Ethernet20" in snapshot
+        assert "Ethernet1000" not in snapshot
+        assert snapshot.get("Ethernet20", "SAI_ROUTER_INTERFACE_STAT_IN_ERROR_OCTETS") == 1128
+
+    def test_bulk_helpers(self):
+        db = swsssdk.SonicV2Connector(host='127.0.0.1')
+        db.connect(db.APPL_DB)
+        entries = bulk_hgetall(db, db.APPL_DB, ["PORT_TABLE:Ethernet0", "PORT_TABLE:Ethernet1"])
+        assert entries[0]["speed"] == "25000"
+        assert entries[1] == {}
+        values = bulk_hmget(db, db.APPL_DB, ["PORT_TABLE:Ethernet200"], ["speed", "nonexistent"])
+        assert values == [["100000", None]]
+
+    def test_counter_value(self):
+        assert counter_value("1234") == 1234
+        assert counter_value(None) == COUNTER_NA
+        assert counter_value("N/A") == COUNTER_NA
+        # Counters beyond int64 saturate instead of overflowing the columns
+        assert counter_value(str(2 ** 63)) == COUNTER_MAX
+        assert counter_value(str(2 ** 64 - 1)) == COUNTER_MAX
+        snapshot = CounterSnapshot(["Ethernet0"], ["oid:0x1000000000002"], ["SAI_PORT_STAT_IF_IN_OCTETS"])
+        snapshot.columns["SAI_PORT_STAT_IF_IN_OCTETS"][0] = counter_value(str(2 ** 64 - 1))
+        assert snapshot.get("Ethernet0", "SAI_PORT_STAT_IF_IN_OCTETS") == COUNTER_MAX
@@ -1,5 +1,9 @@
+import imp
 import sys
 import os
+import shutil
+import tempfile
+import mock
 import pytest
 import click
 import swsssdk
@@ -15,6 +19,8 @@ import mock_tables.dbconnector
 import show.main as show
 import clear.main as clear
 
+dropstat = imp.load_source('dropstat', os.path.join(scripts_path, 'dropstat'))
+
 expected_counter_capabilities = """Counter Type           Total
 -------------------  -------
 PORT_INGRESS_DROPS         4
@@ -128,6 +134,33 @@ class TestDropCounters(object):
         print(result.output)
         assert result.output == expected_counts_with_clear
 
+    def test_show_and_clear_share_counts(self, capsys):
+        stats_dir = tempfile.mkdtemp()
+        try:
+            stat = dropstat.DropStat()
+            stat.port_drop_stats_file = os.path.join(stats_dir, 'port-stats')
+            stat.switch_drop_stats_file = os.path.join(stats_dir, 'switch-stats')
+            with mock.patch.object(dropstat.socket, 'gethostname', return_value='sonic_drops_test'), \
+                    mock.patch.object(stat.db, 'get', wraps=stat.db.get) as get, \
+                    mock.patch.object(stat.config_db, 'get_entry', wraps=stat.config_db.get_entry) as get_entry, \
+                    mock.patch.object(stat.counters, 'snapshot_objects',
+                                      wraps=stat.counters.snapshot_objects) as snapshot_objects:
+                stat.show_drop_counts(None, None)
+                stat.show_drop_counts(None, 'PORT_INGRESS_DROPS')
+                stat.clear_drop_counts()
+            out, err = capsys.readouterr()
+            assert out.startswith(expected_counts)
+
+            # Counters are read once for the ports and once for the switch,
+            # and the DEBUG_COUNTER configuration once
+            assert get.call_count == 0
+            assert get_entry.call_count == 0
+            assert snapshot_objects.call_count == 2
+            assert dropstat.load_counts_table(stat.port_drop_stats_file) == stat.get_port_drop_counts()
+            assert dropstat.load_counts(stat.switch_drop_stats_file) == stat.get_switch_drop_counts()[1]
+        finally:
+            shutil.rmtree(stats_dir)
+
     @classmethod
     def teardown_class(cls):
         print("TEARDOWN")
@@ -0,0 +1,450 @@
+import imp
+import json
+import os
+import re
+import shutil
+import socket
+import sys
+import tempfile
+import time
+
+import mock
+import swsssdk
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+scripts_path = os.path.join(modules_path, "scripts")
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+import mock_tables.dbconnector
+from helpers import benchmark, count_round_trips, fdb_key, timed, vlan_oid
+
+fast_reboot_dump = imp.load_source('fast_reboot_dump', os.path.join(scripts_path, 'fast-reboot-dump.py'))
+
+BENCHMARK_VLAN_COUNT = 16
+BENCHMARK_MAC_COUNT = 2000
+BENCHMARK_GARP_COUNT = 20000
+BENCHMARK_JSON_COUNT = 50000
+
+def make_asic_db(vlan_count, mac_count, port_count=32):
+    """
+        Build an ASIC_DB with VLANs 1000 and up, the ports, their host
+        interfaces and bridge ports, and mac_count FDB entries per VLAN
+        spread over the ports. Each VLAN also has a multicast entry, and an
+        entry on a bridge port which is not a port.
+    """
+    db = swsssdk.SonicV2Connector(host='127.0.0.1')
+    db.connect(db.ASIC_DB)
+    client = db.get_redis_client(db.ASIC_DB)
+    for key in client.keys("ASIC_STATE:*"):
+        if not key.startswith("ASIC_STATE:SAI_OBJECT_TYPE_SWITCH:"):
+            client.delete(key)
+
+    pipe = client.pipeline(transaction=False)
+    pipe.hset("ASIC_STATE:SAI_OBJECT_TYPE_VLAN:" + vlan_oid(1), "SAI_VLAN_ATTR_VLAN_ID", "1")
+    pipe.hset("ASIC_STATE:SAI_OBJECT_TYPE_VLAN:" + vlan_oid(4095), "SAI_VLAN_ATTR_MEMBER_LIST", "")
+    for port_index in range(port_count):
+        port_oid = "oid:0x1{:015x}".format(port_index)
+        pipe.hmset("ASIC_STATE:SAI_OBJECT_TYPE_HOSTIF:oid:0xd{:015x}".format(port_index),
+                   {"SAI_HOSTIF_ATTR_OBJ_ID": port_oid, "SAI_HOSTIF_ATTR_NAME": "Ethernet{}".format(port_index * 4),
+                    "SAI_HOSTIF_ATTR_TYPE": "SAI_HOSTIF_TYPE_NETDEV"})
+        pipe.hmset("ASIC_STATE:SAI_OBJECT_TYPE_BRIDGE_PORT:oid:0x3a{:014x}".format(port_index),
+                   {"SAI_BRIDGE_PORT_ATTR_TYPE": "SAI_BRIDGE_PORT_TYPE_PORT", "SAI_BRIDGE_PORT_ATTR_PORT_ID": port_oid})
+    pipe.hmset("ASIC_STATE:SAI_OBJECT_TYPE_BRIDGE_PORT:oid:0x3affffffffffff",
+               {"SAI_BRIDGE_PORT_ATTR_TYPE": "SAI_BRIDGE_PORT_TYPE_1Q_ROUTER"})
+
+    for vlan_index in range(vlan_count):
+        vlan_id = 1000 + vlan_index
+        pipe.hset("ASIC_STATE:SAI_OBJECT_TYPE_VLAN:" + vlan_oid(vlan_id), "SAI_VLAN_ATTR_VLAN_ID", str(vlan_id))
+        for mac_index in range(mac_count):
+            mac = "00:{:02X}:{:02X}:{:02X}:{:02X}:{:02X}".format(
+                vlan_index, mac_index >> 24 & 0xff, mac_index >> 16 & 0xff, mac_index >> 8 & 0xff, mac_index & 0xff)
+            pipe.hmset(fdb_key(vlan_id, mac),
+                       {"SAI_FDB_ENTRY_ATTR_TYPE": "SAI_FDB_ENTRY_TYPE_DYNAMIC" if mac_index % 8 else
+                                                   "SAI_FDB_ENTRY_TYPE_STATIC",
+                        "SAI_FDB_ENTRY_ATTR_BRIDGE_PORT_ID": "oid:0x3a{:014x}".format(mac_index % port_count)})
+        pipe.hmset(fdb_key(vlan_id, "01:00:5E:00:00:{:02X}".format(vlan_index)),
+                   {"SAI_FDB_ENTRY_ATTR_TYPE": "SAI_FDB_ENTRY_TYPE_STATIC",
+                    "SAI_FDB_ENTRY_ATTR_BRIDGE_PORT_ID": "oid:0x3a{:014x}".format(0)})
+        pipe.hmset(fdb_key(vlan_id, "00:FF:{:02X}:00:00:01".format(vlan_index)),
+                   {"SAI_FDB_ENTRY_ATTR_TYPE": "SAI_FDB_ENTRY_TYPE_DYNAMIC",
+                    "SAI_FDB_ENTRY_ATTR_BRIDGE_PORT_ID": "oid:0x3affffffffffff"})
+    pipe.execute()
+
+    # Keep using the populated connection
+    db.connect = lambda *args, **kwargs: None
+    db.close = lambda *args, **kwargs: None
+    return db
+
+
+def generate_fdb_entries_per_vlan(db, vlan_ifaces):
+    """
+        Reference implementation looking up the VLAN objects and globbing
+        the FDB entries once per VLAN, and reading every object with its
+        own HGETALL.
+    """
+    def get_all_objects(pattern):
+        keys = db.keys(db.ASIC_DB, pattern) or []
+        return [(key, db.get_all(db.ASIC_DB, key)) for key in keys]
+
+    port_id_2_iface = {value['SAI_HOSTIF_ATTR_OBJ_ID']: value['SAI_HOSTIF_ATTR_NAME']
+                       for key, value in get_all_objects('ASIC_STATE:SAI_OBJECT_TYPE_HOSTIF:oid:*')}
+    bridge_id_2_iface = {}
+    for key, value in get_all_objects('ASIC_STATE:SAI_OBJECT_TYPE_BRIDGE_PORT:oid:*'):
+        if value['SAI_BRIDGE_PORT_ATTR_TYPE'] == 'SAI_BRIDGE_PORT_TYPE_PORT':
+            bridge_id_2_iface[key.replace('ASIC_STATE:SAI_OBJECT_TYPE_BRIDGE_PORT:', '')] = \
+                port_id_2_iface[value['SAI_BRIDGE_PORT_ATTR_PORT_ID']]
+
+    fdb_types = {'SAI_FDB_ENTRY_TYPE_DYNAMIC': 'dynamic', 'SAI_FDB_ENTRY_TYPE_STATIC': 'static'}
+    fdb_entries = []
+    all_available_macs = set()
+    map_mac_ip_per_vlan = {}
+    for vlan_name in vlan_ifaces:
+        vlan_id = int(vlan_name.replace('Vlan', ''))
+        bvid = None
+        for key, value in get_all_objects('ASIC_STATE:SAI_OBJECT_TYPE_VLAN:oid:*'):
+            if 'SAI_VLAN_ATTR_VLAN_ID' in value and int(value['SAI_VLAN_ATTR_VLAN_ID']) == vlan_id:
+                bvid = key.replace('ASIC_STATE:SAI_OBJECT_TYPE_VLAN:', '')
+                break
+        map_mac_ip = map_mac_ip_per_vlan[vlan_name] = {}
+        for key, value in get_all_objects('ASIC_STATE:SAI_OBJECT_TYPE_FDB_ENTRY:{*\"bvid\":\"%s\"*}' % bvid):
+            mac = str(json.loads(key.replace('ASIC_STATE:SAI_OBJECT_TYPE_FDB_ENTRY:', ''))['mac'])
+            if not fast_reboot_dump.is_mac_unicast(mac):
+                continue
+            all_available_macs.add((vlan_name, mac.lower()))
+            if value['SAI_FDB_ENTRY_ATTR_BRIDGE_PORT_ID'] not in bridge_id_2_iface:
+                continue
+            fdb_port = bridge_id_2_iface[value['SAI_FDB_ENTRY_ATTR_BRIDGE_PORT_ID']]
+            fdb_entries.append({'FDB_TABLE:Vlan%d:%s' % (vlan_id, mac.replace(':', '-')): {
+                                    'type': fdb_types[value['SAI_FDB_ENTRY_ATTR_TYPE']], 'port': fdb_port},
+                                'OP': 'SET'})
+            map_mac_ip[mac.lower()] = fdb_port
+    return fdb_entries, all_available_macs, map_mac_ip_per_vlan
+
+
+def arp_frame(src_mac, src_ip, dst_mac, dst_ip):
+    """
+        Reference ARP request frame, built by concatenation.
+    """
+    return dst_mac + src_mac + fast_reboot_dump.ARP_CHUNK + src_mac + src_ip + dst_mac + dst_ip + \
+        fast_reboot_dump.ARP_PAD
+
+
+def make_garp_entries(count, iface_count=4):
+    """
+        Build the frame entries of count neighbors spread over iface_count
+        interfaces.
+    """
+    entries = []
+    for i in range(count):
+        iface = i % iface_count
+        entries.append(("Ethernet{}".format(iface * 4), "\x00\x01\x02\x03\x04" + chr(iface),
+                        socket.inet_aton("192.168.{}.1".format(iface)),
+                        "\x00\xaa" + fast_reboot_dump.struct.pack('>I', i),
+                        socket.inet_aton("192.168.{}.{}".format(iface, 2 + i % 250))))
+    return entries
+
+
+def garp_send_per_frame(arp_entries, map_mac_ip_per_vlan, sockets):
+    """
+        Reference implementation looking up the source IP address of every
+        neighbor, and building and sending its frame on its own. Returns
+        the frames sent.
+    """
+    sent_frames = []
+    src_ip_addrs = {vlan_name: fast_reboot_dump.get_iface_ip_addr(vlan_name) for vlan_name, _, _ in arp_entries}
+    src_ifs = {map_mac_ip_per_vlan[vlan_name][dst_mac] for vlan_name, dst_mac, _ in arp_entries}
+    src_mac_addrs = {src_if: fast_reboot_dump.get_iface_mac_addr(src_if) for src_if in src_ifs}
+    for vlan_name, dst_mac, dst_ip in arp_entries:
+        src_if = map_mac_ip_per_vlan[vlan_name][dst_mac]
+        frame = arp_frame(src_mac_addrs[src_if], src_ip_addrs[vlan_name],
+                          fast_reboot_dump.binascii.unhexlify(dst_mac.replace(':', '')), socket.inet_aton(dst_ip))
+        sent_frames.append(frame)
+        sockets[src_if].send(frame)
+    return sent_frames
+
+
+class PacketSink(object):
+    """
+        Local UDP sockets standing in for the raw sockets of interfaces: a
+        sending socket per interface, connected to a receiving socket.
+    """
+
+    def __init__(self, ifaces):
+        self.receivers = {}
+        self.sockets = {}
+        for iface in ifaces:
+            receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            receiver.bind(('127.0.0.1', 0))
+            receiver.setblocking(False)
+            sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sender.connect(receiver.getsockname())
+            self.receivers[iface] = receiver
+            self.sockets[iface] = sender
+
+    def received(self, iface):
+        frames = []
+        while True:
+            try:
+                frames.append(self.receivers[iface].recv(4096))
+            except socket.error:
+                return frames
+
+    def close(self):
+        for s in self.receivers.values() + self.sockets.values():
+            s.close()
+
+
+class FakeSocket(object):
+    def __init__(self, clock):
+        self.clock = clock
+        self.sent = []
+
+    def send(self, frame):
+        self.sent.append((self.clock[0], frame.tobytes()))
+        return len(frame)
+
+
+class TestFastRebootDump(object):
+    def setup_method(self, method):
+        self.dir = tempfile.mkdtemp()
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.dir)
+
+    def generate_fdb_entries(self, db, vlan_ifaces):
+        filename = os.path.join(self.dir, "fdb.json")
+        with mock.patch.object(fast_reboot_dump.swsssdk, 'SonicV2Connector', return_value=db), \
+                mock.patch.object(fast_reboot_dump, 'get_vlan_ifaces', return_value=vlan_ifaces), \
+                mock.patch.object(fast_reboot_dump.syslog, 'syslog') as syslog:
+            all_available_macs, map_mac_ip_per_vlan = fast_reboot_dump.generate_fdb_entries(filename)
+        with open(filename) as fp:
+            fdb_entries = json.load(fp)
+        return (fdb_entries, all_available_macs, map_mac_ip_per_vlan), syslog
+
+    def test_generate_fdb_entries(self):
+        db = make_asic_db(3, 10, port_count=4)
+        vlan_ifaces = ['Vlan1002', 'Vlan1000']
+        ((fdb_entries, all_available_macs, map_mac_ip_per_vlan), syslog), round_trips = count_round_trips(
+            db, db.ASIC_DB, lambda: self.generate_fdb_entries(db, vlan_ifaces))
+
+        expected, per_vlan_round_trips = count_round_trips(
+            db, db.ASIC_DB, lambda: generate_fdb_entries_per_vlan(db, vlan_ifaces))
+        assert round_trips < 20
+        assert per_vlan_round_trips > 20
+        assert fdb_entries == json.loads(json.dumps(expected[0]))
+        assert all_available_macs == expected[1]
+        assert map_mac_ip_per_vlan == expected[2]
+
+        assert len(fdb_entries) == 20
+        # Entries are ordered by VLAN
+        fdb_keys = [key for entry in fdb_entries for key in entry if key != 'OP']
+        assert all(key.startswith('FDB_TABLE:Vlan1002:') for key in fdb_keys[:10])
+        assert {'FDB_TABLE:Vlan1002:00-02-00-00-00-00': {'type': 'static', 'port': 'Ethernet0'},
+                'OP': 'SET'} in fdb_entries
+        assert ('Vlan1000', '00:ff:00:00:00:01') in all_available_macs
+        assert ('Vlan1000', '01:00:5e:00:00:00') not in all_available_macs
+        assert map_mac_ip_per_vlan['Vlan1000']['00:00:00:00:00:05'] == 'Ethernet4'
+        assert re.match(r".*/fdb\.json: 20 entries in [0-9.]+ ms$", syslog.call_args[0][1])
+
+    def test_missing_vlan(self):
+        db = make_asic_db(1, 1)
+        try:
+            self.generate_fdb_entries(db, ['Vlan1000', 'Vlan2000'])
+        except Exception as e:
+            assert str(e) == 'Not found bvi oid for vlan_id: 2000'
+        else:
+            assert False
+
+    @benchmark
+    def test_benchmark_fdb_entries(self):
+        db = make_asic_db(BENCHMARK_VLAN_COUNT, BENCHMARK_MAC_COUNT)
+        vlan_ifaces = ['Vlan{}'.format(1000 + i) for i in range(BENCHMARK_VLAN_COUNT)]
+
+        (expected, per_vlan_round_trips), per_vlan_time = timed(
+            lambda: count_round_trips(db, db.ASIC_DB, lambda: generate_fdb_entries_per_vlan(db, vlan_ifaces)))
+        (result, batch_round_trips), batch_time = timed(
+            lambda: count_round_trips(db, db.ASIC_DB, lambda: self.generate_fdb_entries(db, vlan_ifaces)[0]))
+
+        print("fast-reboot-dump {} VLANs x {} MACs: per-VLAN {:.0f} ms {} round trips, "
+              "single pass {:.0f} ms {} round trips, {:.0f} ms saved".format(
+                  BENCHMARK_VLAN_COUNT, BENCHMARK_MAC_COUNT, per_vlan_time * 1000, per_vlan_round_trips,
+                  batch_time * 1000, batch_round_trips, (per_vlan_time - batch_time) * 1000))
+
+        assert len(result[0]) == len(expected[0]) == BENCHMARK_VLAN_COUNT * BENCHMARK_MAC_COUNT
+        assert result[1] == expected[1]
+        assert batch_round_trips < 50
+
+    def write_json(self, entries, pretty=False):
+        filename = os.path.join(self.dir, "entries.json")
+        with mock.patch.object(fast_reboot_dump.syslog, 'syslog') as syslog:
+            with fast_reboot_dump.JsonArrayWriter(filename, pretty) as writer:
+                for entry in entries:
+                    writer.write(entry)
+        with open(filename) as fp:
+            return fp.read(), syslog
+
+    def test_json_array_writer(self):
+        entries = [{'FDB_TABLE:Vlan1000:00-00-00-00-00-01': {'type': 'dynamic', 'port': 'Ethernet0'}, 'OP': 'SET'},
+                   {'NEIGH_TABLE:Vlan1000:192.168.0.2': {'neigh': '00:00:00:00:00:01', 'family': 'IPv4'},
+                    'OP': 'SET'}]
+        for count in (0, 1, 2):
+            data, syslog = self.write_json(entries[:count])
+            assert data == json.dumps(entries[:count], separators=(',', ':'))
+            data, syslog = self.write_json(entries[:count], pretty=True)
+            assert data == json.dumps(entries[:count], indent=2, separators=(',', ': '))
+            assert re.match(r".*/entries\.json: {} entries in [0-9.]+ ms$".format(count), syslog.call_args[0][1])
+
+    def test_json_array_writer_error(self):
+        filename = os.path.join(self.dir, "entries.json")
+        with mock.patch.object(fast_reboot_dump.syslog, 'syslog') as syslog:
+            try:
+                with fast_reboot_dump.JsonArrayWriter(filename) as writer:
+                    writer.write({'OP': 'SET'})
+                    raise ValueError("error")
+            except ValueError:
+                pass
+        assert writer.fp.closed
+        assert not syslog.called
+
+    def test_generate_pretty(self):
+        db = make_asic_db(2, 4, port_count=4)
+        filename = os.path.join(self.dir, "fdb.json")
+        with mock.patch.object(fast_reboot_dump.swsssdk, 'SonicV2Connector', return_value=db), \
+                mock.patch.object(fast_reboot_dump, 'get_vlan_ifaces', return_value=['Vlan1000', 'Vlan1001']), \
+                mock.patch.object(fast_reboot_dump.syslog, 'syslog'):
+            fast_reboot_dump.generate_fdb_entries(filename, pretty=True)
+            with open(filename) as fp:
+                pretty = fp.read()
+            fast_reboot_dump.generate_fdb_entries(filename)
+            with open(filename) as fp:
+                compact = fp.read()
+        assert len(json.loads(pretty)) == 8
+        assert pretty.startswith('[\n  {\n    "') and pretty.endswith('\n  }\n]')
+        assert json.loads(compact) == json.loads(pretty)
+        assert '\n' not in compact
+
+    @benchmark
+    def test_benchmark_json(self):
+        entries = [{'FDB_TABLE:Vlan{}:00-aa-00-00-{:02x}-{:02x}'.format(1000 + i % 16, (i >> 8) & 0xff, i & 0xff):
+                    {'type': 'dynamic', 'port': 'Ethernet{}'.format(i % 32 * 4)}, 'OP': 'SET'}
+                   for i in range(BENCHMARK_JSON_COUNT)]
+        filename = os.path.join(self.dir, "fdb.json")
+
+        start = time.time()
+        with open(filename, 'w') as fp:
+            json.dump(entries, fp, indent=2, separators=(',', ': '))
+        list_time = time.time() - start
+        list_size = os.path.getsize(filename)
+
+        start = time.time()
+        data, _ = self.write_json(entries)
+        stream_time = time.time() - start
+
+        print("fast-reboot-dump {} FDB entries: json.dump {:.0f} ms {:.1f}MB, "
+              "streamed {:.0f} ms {:.1f}MB".format(BENCHMARK_JSON_COUNT, list_time * 1000, list_size / 1e6,
+                                                   stream_time * 1000, len(data) / 1e6))
+
+        assert json.loads(data) == entries
+
+    def test_garp_engine(self):
+        entries = make_garp_entries(10)
+        engine = fast_reboot_dump.GarpEngine()
+        engine.build(entries)
+        assert len(engine.frames) == 10 * fast_reboot_dump.ARP_FRAME_SIZE
+
+        sink = PacketSink(engine.ifaces)
+        try:
+            assert engine.send(sink.sockets) == 10
+            for iface in engine.ifaces:
+                assert sink.received(iface) == [arp_frame(*entry[1:]) for entry in entries if entry[0] == iface]
+        finally:
+            sink.close()
+
+    def test_garp_rate(self):
+        clock = [100.0]
+
+        def sleep(seconds):
+            clock[0] += seconds
+
+        sockets = {"Ethernet0": FakeSocket(clock), "Ethernet4": FakeSocket(clock)}
+        engine = fast_reboot_dump.GarpEngine(rate=4, burst=2)
+        engine.build(make_garp_entries(10, iface_count=2))
+        with mock.patch.object(fast_reboot_dump.time, 'time', side_effect=lambda: clock[0]), \
+                mock.patch.object(fast_reboot_dump.time, 'sleep', side_effect=sleep) as sleep_mock:
+            assert engine.send(sockets) == 10
+
+        # Bursts of 2 frames, one to each interface, every half second
+        assert sleep_mock.call_args_list == [mock.call(0.5)] * 4
+        assert [t for t, _ in sockets["Ethernet0"].sent] == [100.0, 100.5, 101.0, 101.5, 102.0]
+        assert [t for t, _ in sockets["Ethernet4"].sent] == [100.0, 100.5, 101.0, 101.5, 102.0]
+
+    def test_garp_send(self):
+        src_macs = {"Ethernet0": "\x00\x01\x02\x03\x04\x00", "Ethernet4": "\x00\x01\x02\x03\x04\x01"}
+        arp_entries = [("Vlan1000", "00:00:00:00:00:05", "192.168.0.5"),
+                       ("Vlan1000", "00:00:00:00:00:06", "192.168.0.6"),
+                       ("Vlan1000", "00:00:00:00:00:07", "192.168.0.7")]
+        map_mac_ip_per_vlan = {"Vlan1000": {"00:00:00:00:00:05": "Ethernet0", "00:00:00:00:00:06": "Ethernet4",
+                                            "00:00:00:00:00:07": "Ethernet0"}}
+        sink = PacketSink(src_macs)
+        try:
+            with mock.patch.object(fast_reboot_dump, 'open_garp_sockets', return_value=sink.sockets), \
+                    mock.patch.object(fast_reboot_dump, 'get_iface_ip_addr',
+                                      return_value=socket.inet_aton("192.168.0.1")) as get_iface_ip_addr, \
+                    mock.patch.object(fast_reboot_dump, 'get_iface_mac_addr',
+                                      side_effect=lambda iff, s: src_macs[iff]), \
+                    mock.patch.object(fast_reboot_dump.syslog, 'syslog') as syslog:
+                fast_reboot_dump.garp_send(arp_entries, map_mac_ip_per_vlan)
+            assert sink.received("Ethernet0") == [
+                arp_frame(src_macs["Ethernet0"], socket.inet_aton("192.168.0.1"),
+                          "\x00\x00\x00\x00\x00" + chr(n), socket.inet_aton("192.168.0.{}".format(n)))
+                for n in (5, 7)]
+            assert len(sink.received("Ethernet4")) == 1
+        finally:
+            sink.close()
+
+        # Addresses are looked up once per interface
+        assert get_iface_ip_addr.call_count == 1
+        assert re.match(r"gratuitous ARP: 3 frames in [0-9.]+ ms$", syslog.call_args[0][1])
+
+    @benchmark
+    def test_benchmark_garp(self):
+        arp_entries = []
+        map_mac_ip_per_vlan = {}
+        for i in range(BENCHMARK_GARP_COUNT):
+            vlan_name = "Vlan{}".format(1000 + i % 4)
+            mac = "00:aa:00:00:{:02x}:{:02x}".format(i >> 8, i & 0xff)
+            arp_entries.append((vlan_name, mac, "192.168.{}.{}".format(i >> 8, i & 0xff)))
+            map_mac_ip_per_vlan.setdefault(vlan_name, {})[mac] = "Ethernet{}".format(i % 8 * 4)
+        sink = PacketSink({"Ethernet{}".format(i * 4) for i in range(8)})
+
+        # Look up the addresses of the loopback interface, which needs no
+        # privileges, in place of those of the VLANs and ports
+        get_if = fast_reboot_dump.get_if
+        try:
+            with mock.patch.object(fast_reboot_dump, 'get_if', 
+                                   side_effect=lambda iff, cmd, s=None: get_if('lo', cmd, s)):
+                start = time.time()
+                sent_frames = garp_send_per_frame(arp_entries, map_mac_ip_per_vlan, sink.sockets)
+                per_frame_time = time.time() - start
+                for iface in sink.sockets:
+                    sink.received(iface)
+
+                with mock.patch.object(fast_reboot_dump, 'open_garp_sockets', return_value=sink.sockets), \
+                        mock.patch.object(fast_reboot_dump.syslog, 'syslog') as syslog, \
+                        mock.patch.object(fast_reboot_dump.GarpEngine, 'send',
+                                          autospec=True, side_effect=fast_reboot_dump.GarpEngine.send) as send:
+                    start = time.time()
+                    fast_reboot_dump.garp_send(arp_entries, map_mac_ip_per_vlan)
+                    engine_time = time.time() - start
+        finally:
+            sink.close()
+
+        print("fast-reboot-dump {} gratuitous ARP frames: per-frame {:.0f} ms, prebuilt {:.0f} ms".format(
+              BENCHMARK_GARP_COUNT, per_frame_time * 1000, engine_time * 1000))
+
+        engine = send.call_args[0][0]
+        assert engine.frames == bytearray(''.join(sent_frames))
+        assert re.match(r"gratuitous ARP: {} frames in [0-9.]+ ms$".format(BENCHMARK_GARP_COUNT),
+                        syslog.call_args[0][1])
@@ -0,0 +1,114 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import mock
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+import mock_tables.dbconnector
+from helpers import count_round_trips, fdb_key, get_fdb_per_entry, make_fdb_db, vlan_oid
+from utilities_common import fdb
+
+
+class TestFdbIndex(object):
+    def setup_method(self, method):
+        self.dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.dir, "fdb.json")
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.dir)
+
+    def get_fdb_index(self, db, **kwargs):
+        """
+            Get the FDB index through the cache file of the test, with the
+            round trips it takes.
+        """
+        return count_round_trips(db, db.ASIC_DB, lambda: fdb.get_fdb_index(db, cache_file=self.cache_file, **kwargs))
+
+    def test_read_fdb_index(self):
+        db = make_fdb_db(2, 4, port_count=4)
+        keys = fdb.get_fdb_keys(db)
+        index = fdb.read_fdb_index(db, keys, generation=fdb.get_fdb_generation(db))
+        assert index.complete
+        assert index.generation == len(db.get_redis_client(db.ASIC_DB).keys())
+        assert index.get_entries() == get_fdb_per_entry(db)
+        assert index.vlans == {1000, 1001}
+        assert index.lookup(1001, "00:01:00:00:00:01") == ("Ethernet4", "Dynamic")
+        assert index.lookup("1000", "00:00:00:00:00:00") == ("Ethernet0", "Static")
+        assert index.lookup(1001, "00:01:00:00:00:09") is None
+        assert index.get_entries(vlan="1001", port="Ethernet4") == [(1001, "00:01:00:00:00:01", "Ethernet4", "Dynamic")]
+        assert index.unknown_bvids == [vlan_oid(4000)]
+
+        # Entries are selected by VLAN, then by port
+        index = fdb.read_fdb_index(db, keys, port="Ethernet8")
+        assert not index.complete
+        assert index.vlans == {1000, 1001}
+        assert index.get_entries() == get_fdb_per_entry(db, port="Ethernet8")
+
+    def test_generation(self):
+        db = make_fdb_db(2, 4, port_count=4)
+        client = db.get_redis_client(db.ASIC_DB)
+        generation, round_trips = count_round_trips(db, db.ASIC_DB, lambda: fdb.get_fdb_generation(db))
+        assert round_trips == 1
+
+        # A MAC move keeps the generation, a new or removed entry changes it
+        client.hset(fdb_key(1000, "00:00:00:00:00:00"),
+                    "SAI_FDB_ENTRY_ATTR_BRIDGE_PORT_ID", "oid:0x3a{:014x}".format(1))
+        assert fdb.get_fdb_generation(db) == generation
+        client.delete(fdb_key(1000, "00:00:00:00:00:00"))
+        assert fdb.get_fdb_generation(db) == generation - 1
+
+    def test_cache(self):
+        db = make_fdb_db(2, 4, port_count=4)
+        index = fdb.get_fdb_index(db, cache_file=self.cache_file)
+        assert os.path.exists(self.cache_file)
+
+        # Only the size of the ASIC_DB is read while the cache is valid
+        cached, round_trips = self.get_fdb_index(db)
+        assert round_trips == 1
+        assert cached.get_entries() == index.get_entries()
+        assert cached.vlans == index.vlans
+        assert cached.lookup(1001, "00:01:00:00:00:01") == ("Ethernet4", "Dynamic")
+        assert cached.unknown_bvids == index.unknown_bvids
+        cached, round_trips = self.get_fdb_index(db, vlan=1000)
+        assert round_trips == 1
+
+        # A new FDB entry changes the generation
+        db.get_redis_client(db.ASIC_DB).hmset(
+            fdb_key(1000, "00:00:00:00:00:10"),
+            {"SAI_FDB_ENTRY_ATTR_TYPE": "SAI_FDB_ENTRY_TYPE_DYNAMIC",
+             "SAI_FDB_ENTRY_ATTR_BRIDGE_PORT_ID": "oid:0x3a{:014x}".format(3)})
+        index, round_trips = self.get_fdb_index(db)
+        assert round_trips > 1
+        assert index.lookup(1000, "00:00:00:00:00:10") == ("Ethernet12", "Dynamic")
+
+        # The cache expires after max_age
+        with mock.patch.object(fdb.time, 'time', return_value=index.timestamp + fdb.FDB_CACHE_MAX_AGE + 1):
+            _, round_trips = self.get_fdb_index(db)
+        assert round_trips > 1
+
+    def test_filtered_not_cached(self):
+        db = make_fdb_db(2, 4, port_count=4)
+        index = fdb.get_fdb_index(db, vlan="1001", cache_file=self.cache_file)
+        assert not os.path.exists(self.cache_file)
+        assert index.get_entries("1001") == get_fdb_per_entry(db, vlan="1001")
+
+        with open(self.cache_file, 'w') as f:
+            f.write("{")
+        index = fdb.get_fdb_index(db, cache_file=self.cache_file)
+        assert index.get_entries() == get_fdb_per_entry(db)
+        with open(self.cache_file) as f:
+            assert json.load(f)['generation'] == index.generation
+
+    def test_untrusted_cache_ignored(self):
+        db = make_fdb_db(2, 4, port_count=4)
+        fdb.get_fdb_index(db, cache_file=self.cache_file)
+        os.chmod(self.cache_file, 0o666)
+        _, round_trips = self.get_fdb_index(db)
+        assert round_trips > 1
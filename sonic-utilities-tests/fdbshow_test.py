@@ -0,0 +1,111 @@
+import imp
+import os
+import shutil
+import sys
+import tempfile
+
+import mock
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+scripts_path = os.path.join(modules_path, "scripts")
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+import mock_tables.dbconnector
+from helpers import benchmark, count_round_trips, fdb_key, get_fdb_per_entry, make_fdb_db, timed, vlan_oid
+from utilities_common import fdb as fdb_index
+from utilities_common.counters import BULK_CHUNK_SIZE
+
+fdbshow = imp.load_source('fdbshow', os.path.join(scripts_path, 'fdbshow'))
+
+BENCHMARK_VLAN_COUNT = 16
+BENCHMARK_MAC_COUNT = 4096
+
+
+def new_fdbshow(db, vlan=None, port=None):
+    with mock.patch.object(fdbshow, 'SonicV2Connector', return_value=db):
+        return fdbshow.FdbShow(vlan, port)
+
+
+class TestFdbShow(object):
+    def setup_method(self, method):
+        self.dir = tempfile.mkdtemp()
+        self.cache_file = mock.patch.object(fdb_index, 'FDB_CACHE_FILE', os.path.join(self.dir, "fdb.json"))
+        self.cache_file.start()
+
+    def teardown_method(self, method):
+        self.cache_file.stop()
+        shutil.rmtree(self.dir)
+
+    def test_fetch_fdb_data(self, capsys):
+        db = make_fdb_db(3, 10, port_count=4)
+        fdb = new_fdbshow(db)
+        assert capsys.readouterr()[0] == "Failed to get Vlan id for bvid {}\n\n".format(vlan_oid(4000))
+        assert fdb.bridge_mac_list == get_fdb_per_entry(db)
+        assert len(fdb.bridge_mac_list) == 30
+        assert fdb.bridge_mac_list[0] == (1000, "00:00:00:00:00:00", "Ethernet0", "Static")
+        assert fdb.bridge_mac_list[5] == (1000, "00:00:00:00:00:05", "Ethernet4", "Dynamic")
+
+    def test_cache_not_used(self):
+        db = make_fdb_db(2, 4, port_count=4)
+        new_fdbshow(db)
+        assert os.path.exists(fdb_index.FDB_CACHE_FILE)
+
+        # A MAC move keeps the size of the ASIC_DB, and so the generation of
+        # the cache
+        db.get_redis_client(db.ASIC_DB).hset(fdb_key(1000, "00:00:00:00:00:00"),
+                                             "SAI_FDB_ENTRY_ATTR_BRIDGE_PORT_ID", "oid:0x3a{:014x}".format(1))
+        fdb = new_fdbshow(db)
+        assert fdb.bridge_mac_list[0] == (1000, "00:00:00:00:00:00", "Ethernet4", "Static")
+
+    def test_filters(self):
+        db = make_fdb_db(3, 10, port_count=4)
+        for vlan, port in (("1001", None), (None, "Ethernet4"), ("1002", "Ethernet12")):
+            fdb, round_trips = count_round_trips(db, db.ASIC_DB, lambda: new_fdbshow(db, vlan, port))
+            assert fdb.bridge_mac_list == get_fdb_per_entry(db, vlan, port)
+            assert round_trips <= 10
+
+    def test_display(self, capsys):
+        db = make_fdb_db(2, 4, port_count=4)
+        fdb = new_fdbshow(db, "1001", "Ethernet4")
+        capsys.readouterr()
+        fdb.display("1001", "Ethernet4")
+        lines = capsys.readouterr()[0].splitlines()
+        assert lines[0].split() == fdbshow.FdbShow.HEADER
+        assert lines[2].split() == ["1", "1001", "00:01:00:00:00:01", "Ethernet4", "Dynamic"]
+        assert lines[3] == "Total number of entries 1 "
+
+    def test_main_not_found(self, capsys):
+        db = make_fdb_db(2, 4, port_count=4)
+        for args, message in ((["-v", "1005"], "1005 is not in list"),
+                              (["-v", "1000", "-p", "Ethernet20"], "'Ethernet20' is not in list")):
+            with mock.patch.object(fdbshow, 'SonicV2Connector', return_value=db), \
+                    mock.patch.object(sys, 'argv', ["fdbshow"] + args):
+                try:
+                    fdbshow.main()
+                except SystemExit as e:
+                    assert e.code == 1
+                else:
+                    assert False
+            assert capsys.readouterr()[0].splitlines()[-1] == message
+
+    @benchmark
+    def test_benchmark_64k_entries(self):
+        db = make_fdb_db(BENCHMARK_VLAN_COUNT, BENCHMARK_MAC_COUNT)
+
+        results = []
+        for vlan, port in ((None, "Ethernet4"), ("1003", None), (None, None)):
+            (expected, per_entry_round_trips), per_entry_time = timed(
+                lambda: count_round_trips(db, db.ASIC_DB, lambda: get_fdb_per_entry(db, vlan, port)))
+            (fdb, batch_round_trips), batch_time = timed(
+                lambda: count_round_trips(db, db.ASIC_DB, lambda: new_fdbshow(db, vlan, port)))
+            results.append("{}: per-entry {:.0f} ms {} round trips, batched {:.0f} ms {} round trips".format(
+                           " ".join("{} {}".format(option, value) for option, value in (("-v", vlan), ("-p", port))
+                                    if value is not None) or "all",
+                           per_entry_time * 1000, per_entry_round_trips, batch_time * 1000, batch_round_trips))
+
+            assert fdb.bridge_mac_list == expected
+            assert batch_round_trips < 10 + 2 * BENCHMARK_VLAN_COUNT * BENCHMARK_MAC_COUNT / BULK_CHUNK_SIZE
+
+        print("fdbshow {} VLANs x {} MACs: {}".format(BENCHMARK_VLAN_COUNT, BENCHMARK_MAC_COUNT, "; ".join(results)))
@@ -0,0 +1,139 @@
+import json
+import os
+import time
+from collections import OrderedDict
+
+import mock
+import pytest
+import swsssdk
+from swsssdk import port_util
+
+import mock_tables.dbconnector
+from utilities_common import fdb as fdb_index
+
+SWITCH_ID = "oid:0x21000000000000"
+
+# The benchmarks build switch-sized mock DBs and print their timings, so
+# they only run when SONIC_UTILITIES_BENCHMARK is set
+benchmark = pytest.mark.skipif(not os.environ.get('SONIC_UTILITIES_BENCHMARK'),
+                               reason="SONIC_UTILITIES_BENCHMARK is not set")
+
+
+def timed(func):
+    """
+        Call func, returning its result and the seconds it took.
+    """
+    start = time.time()
+    result = func()
+    return result, time.time() - start
+
+
+def count_round_trips(db, db_name, func):
+    """
+        Call func, counting the KEYS, GET, HGETALL and DBSIZE calls and the
+        pipelines it sends to the db_name database of db. Returns the result
+        of func and the count.
+    """
+    client = db.get_redis_client(db_name)
+    with mock.patch.object(db, 'keys', wraps=db.keys) as keys, \
+            mock.patch.object(db, 'get', wraps=db.get) as get, \
+            mock.patch.object(db, 'get_all', wraps=db.get_all) as get_all, \
+            mock.patch.object(client, 'dbsize', wraps=client.dbsize) as dbsize, \
+            mock.patch.object(client, 'pipeline', wraps=client.pipeline) as pipeline:
+        result = func()
+    return result, keys.call_count + get.call_count + get_all.call_count + dbsize.call_count + pipeline.call_count
+
+
+def without_time(cnstat_dict):
+    """
+        The counters of a cnstat dict, without its 'time' entry.
+    """
+    return OrderedDict((key, value) for key, value in cnstat_dict.items() if key != 'time')
+
+
+def vlan_oid(vlan_id):
+    return "oid:0x26{:014x}".format(vlan_id)
+
+
+def fdb_key(vlan_id, mac):
+    return fdb_index.FDB_ENTRY_PREFIX + json.dumps(
+        {"bvid": vlan_oid(vlan_id), "mac": mac, "switch_id": SWITCH_ID}, separators=(',', ':'), sort_keys=True)
+
+
+def make_fdb_db(vlan_count, mac_count, port_count=32):
+    """
+        Build an ASIC_DB with VLANs 1000 and up, the bridge ports of
+        port_count ports named in the COUNTERS_DB, and mac_count FDB entries
+        per VLAN spread over the ports. Each VLAN also has an entry on a
+        bridge port which is not a port, and there is an entry of a VLAN
+        which is not in the ASIC_DB.
+    """
+    db = swsssdk.SonicV2Connector(host='127.0.0.1')
+    db.connect(db.ASIC_DB)
+    db.connect(db.COUNTERS_DB)
+    client = db.get_redis_client(db.ASIC_DB)
+    for key in client.keys("ASIC_STATE:*"):
+        if not key.startswith("ASIC_STATE:SAI_OBJECT_TYPE_SWITCH:"):
+            client.delete(key)
+    counters_client = db.get_redis_client(db.COUNTERS_DB)
+    counters_client.delete("COUNTERS_PORT_NAME_MAP")
+
+    pipe = client.pipeline(transaction=False)
+    counters_pipe = counters_client.pipeline(transaction=False)
+    for port_index in range(port_count):
+        port_oid = "oid:0x1{:015x}".format(port_index)
+        counters_pipe.hset("COUNTERS_PORT_NAME_MAP", "Ethernet{}".format(port_index * 4), port_oid)
+        pipe.hmset(fdb_index.BRIDGE_PORT_PREFIX + "oid:0x3a{:014x}".format(port_index),
+                   {"SAI_BRIDGE_PORT_ATTR_TYPE": "SAI_BRIDGE_PORT_TYPE_PORT", "SAI_BRIDGE_PORT_ATTR_PORT_ID": port_oid})
+    pipe.hmset(fdb_index.BRIDGE_PORT_PREFIX + "oid:0x3affffffffffff",
+               {"SAI_BRIDGE_PORT_ATTR_TYPE": "SAI_BRIDGE_PORT_TYPE_1Q_ROUTER"})
+
+    for vlan_index in range(vlan_count):
+        vlan_id = 1000 + vlan_index
+        pipe.hset(fdb_index.VLAN_PREFIX + vlan_oid(vlan_id), "SAI_VLAN_ATTR_VLAN_ID", str(vlan_id))
+        for mac_index in range(mac_count):
+            mac = "00:{:02X}:{:02X}:{:02X}:{:02X}:{:02X}".format(
+                vlan_index, mac_index >> 24 & 0xff, mac_index >> 16 & 0xff, mac_index >> 8 & 0xff, mac_index & 0xff)
+            pipe.hmset(fdb_key(vlan_id, mac),
+                       {"SAI_FDB_ENTRY_ATTR_TYPE": "SAI_FDB_ENTRY_TYPE_DYNAMIC" if mac_index % 8 else
+                                                   "SAI_FDB_ENTRY_TYPE_STATIC",
+                        "SAI_FDB_ENTRY_ATTR_BRIDGE_PORT_ID": "oid:0x3a{:014x}".format(mac_index % port_count)})
+        pipe.hmset(fdb_key(vlan_id, "00:FF:{:02X}:00:00:01".format(vlan_index)),
+                   {"SAI_FDB_ENTRY_ATTR_TYPE": "SAI_FDB_ENTRY_TYPE_DYNAMIC",
+                    "SAI_FDB_ENTRY_ATTR_BRIDGE_PORT_ID": "oid:0x3affffffffffff"})
+    pipe.hmset(fdb_key(4000, "00:00:00:00:40:00"),
+               {"SAI_FDB_ENTRY_ATTR_TYPE": "SAI_FDB_ENTRY_TYPE_DYNAMIC",
+                "SAI_FDB_ENTRY_ATTR_BRIDGE_PORT_ID": "oid:0x3a{:014x}".format(0)})
+    pipe.execute()
+    counters_pipe.execute()
+
+    # Keep using the populated connections
+    db.connect = lambda *args, **kwargs: None
+    return db
+
+
+def get_fdb_per_entry(db, vlan=None, port=None):
+    """
+        Reference implementation reading every FDB entry and the VLAN id of
+        its bvid on its own, then filtering by vlan and port. The KEYS
+        port_util.get_vlan_id_from_bvid also issues per entry, which scans
+        the whole mock ASIC_DB, is left out.
+    """
+    if_name_map, if_oid_map = port_util.get_interface_oid_map(db)
+    if_br_oid_map = port_util.get_bridge_port_map(db)
+    bridge_mac_list = []
+    for s in db.keys('ASIC_DB', fdb_index.FDB_ENTRY_PREFIX + "*"):
+        fdb = json.loads(s.split(":", 2)[-1])
+        ent = db.get_all('ASIC_DB', s, blocking=True)
+        br_port_id = ent["SAI_FDB_ENTRY_ATTR_BRIDGE_PORT_ID"][len("oid:0x"):]
+        fdb_type = ['Dynamic', 'Static'][ent["SAI_FDB_ENTRY_ATTR_TYPE"] == "SAI_FDB_ENTRY_TYPE_STATIC"]
+        if br_port_id not in if_br_oid_map:
+            continue
+        port_id = if_br_oid_map[br_port_id]
+        if_name = if_oid_map.get(port_id, port_id)
+        vlan_entry = db.get_all('ASIC_DB', fdb_index.VLAN_PREFIX + fdb["bvid"], blocking=True)
+        if not vlan_entry:
+            continue
+        bridge_mac_list.append((int(vlan_entry["SAI_VLAN_ATTR_VLAN_ID"]), fdb["mac"], if_name, fdb_type))
+    return sorted(fdb for fdb in bridge_mac_list
+                  if (vlan is None or fdb[0] == int(vlan)) and (port is None or fdb[2] == port))
@@ -1,14 +1,83 @@
+import imp
 import os
 import sys
+import time
 from click.testing import CliRunner
 from unittest import TestCase
 import subprocess
 
+import mock
+import mockredis
+import swsssdk
+
 import show.main as show
 
 root_path = os.path.dirname(os.path.abspath(__file__))
 modules_path = os.path.dirname(root_path)
 scripts_path = os.path.join(modules_path, "scripts")
+sys.path.insert(0, root_path)
+sys.path.insert(0, modules_path)
+
+import mock_tables.dbconnector
+from helpers import benchmark
+
+intfutil = imp.load_source('intfutil', os.path.join(scripts_path, 'intfutil'))
+
+BENCHMARK_PORT_COUNT = 512
+BENCHMARK_LAG_COUNT = 64
+
+
+def make_intf_dbs(port_count, lag_count):
+    """
+        Build APPL_DB, STATE_DB and CONFIG_DB with port_count ports and
+        lag_count LAGs of 4 members each.
+    """
+    appl_db = swsssdk.SonicV2Connector(host='127.0.0.1')
+    appl_db.connect(appl_db.APPL_DB)
+    state_db = swsssdk.SonicV2Connector(host='127.0.0.1')
+    state_db.connect(state_db.STATE_DB)
+    config_db = swsssdk.ConfigDBConnector()
+    config_db.connect()
+
+    appl_pipe = appl_db.get_redis_client(appl_db.APPL_DB).pipeline(transaction=False)
+    state_pipe = state_db.get_redis_client(state_db.STATE_DB).pipeline(transaction=False)
+    config_pipe = config_db.get_redis_client(config_db.CONFIG_DB).pipeline(transaction=False)
+    for index in range(port_count):
+        port = "Ethernet{}".format(index * 4)
+        appl_pipe.hmset("PORT_TABLE:" + port, {"lanes": str(index), "speed": "100000", "mtu": "9100",
+                                                "alias": "etp{}".format(index + 1), "oper_status": "up",
+                                                "admin_status": "up", "pfc_asym": "off"})
+        state_pipe.hmset("TRANSCEIVER_INFO|" + port, {"type": "QSFP28 or later", "hardware_rev": "A"})
+        config_pipe.hmset("PORT|" + port, {"alias": "etp{}".format(index + 1)})
+        if index < lag_count * 4:
+            config_pipe.hmset("PORTCHANNEL_MEMBER|PortChannel{:04d}|{}".format(index / 4 + 1, port), {"NULL": "NULL"})
+    for index in range(lag_count):
+        po = "PortChannel{:04d}".format(index + 1)
+        appl_pipe.hmset("LAG_TABLE:" + po, {"oper_status": "up", "admin_status": "up", "mtu": "9100"})
+        config_pipe.hmset("PORTCHANNEL|" + po, {"mtu": "9100"})
+    appl_pipe.execute()
+    state_pipe.execute()
+    config_pipe.execute()
+
+    # Keep using the populated connections
+    for db in (appl_db, state_db, config_db):
+        db.connect = lambda *args, **kwargs: None
+    return appl_db, state_db, config_db
+
+
+def intf_status(dbs, intf_name=None):
+    appl_db, state_db, config_db = dbs
+    with mock.patch.object(intfutil, 'db_connect_appl', return_value=appl_db), \
+            mock.patch.object(intfutil, 'db_connect_state', return_value=state_db), \
+            mock.patch.object(intfutil, 'db_connect_configdb', return_value=config_db):
+        return intfutil.IntfStatus(intf_name)
+
+
+def intf_status_output(dbs, intf_name=None):
+    with mock.patch('sys.stdout') as stdout:
+        intf_status(dbs, intf_name)
+    return "".join(call[0][0] for call in stdout.write.call_args_list)
+
 
 class TestIntfutil(TestCase):
     @classmethod
@@ -122,6 +191,75 @@ class TestIntfutil(TestCase):
 
         os.environ["SONIC_CLI_IFACE_MODE"] = "default"
 
+    # Test 'intfutil status' with LAGs on a large number of ports
+    def test_intf_status_batched(self):
+        dbs = make_intf_dbs(16, 2)
+        output = intf_status_output(dbs)
+        lines = output.splitlines()
+        self.assertEqual(lines[2].split(), ['Ethernet0', '0', '100G', '9100', 'etp1', 'PortChannel0001',
+                                            'up', 'up', 'QSFP28', 'or', 'later', 'off'])
+        self.assertEqual(lines[-2].split(), ['PortChannel0001', 'N/A', '400G', '9100', 'N/A', 'routed',
+                                             'up', 'up', 'N/A', 'N/A'])
+
+        # The prefetched tables give the output of the reads field by field
+        with mock.patch.object(intfutil.PrefetchedDB, 'prefetch'):
+            self.assertEqual(intf_status_output(dbs), output)
+
+    @benchmark
+    def test_benchmark_intf_status(self):
+        dbs = make_intf_dbs(BENCHMARK_PORT_COUNT, BENCHMARK_LAG_COUNT)
+        clients = [db.get_redis_client(db_name) for db, db_name in
+                   zip(dbs, (dbs[0].APPL_DB, dbs[1].STATE_DB, dbs[2].CONFIG_DB))]
+
+        def count_round_trips(prefetch):
+            # Commands queued on a pipeline are sent in the round trip of its execute()
+            round_trips = [0]
+            in_pipeline = [False]
+
+            def counted(func):
+                def wrapper(*args, **kwargs):
+                    if not in_pipeline[0]:
+                        round_trips[0] += 1
+                    return func(*args, **kwargs)
+                return wrapper
+
+            execute = mockredis.pipeline.MockRedisPipeline.execute
+
+            def counted_execute(pipeline):
+                round_trips[0] += 1
+                in_pipeline[0] = True
+                try:
+                    return execute(pipeline)
+                finally:
+                    in_pipeline[0] = False
+
+            patches = [mock.patch.object(client, name, counted(getattr(client, name)))
+                       for client in clients for name in ('hget', 'hgetall', 'hmget', 'keys')]
+            patches.append(mock.patch.object(mockredis.pipeline.MockRedisPipeline, 'execute', counted_execute))
+            if not prefetch:
+                patches.append(mock.patch.object(intfutil.PrefetchedDB, 'prefetch'))
+            with mock.patch('sys.stdout') as stdout:
+                for patch in patches:
+                    patch.start()
+                try:
+                    start = time.time()
+                    intf_status(dbs)
+                    elapsed = time.time() - start
+                finally:
+                    for patch in patches:
+                        patch.stop()
+            output = "".join(call[0][0] for call in stdout.write.call_args_list)
+            return output, elapsed, round_trips[0]
+
+        expected, per_field_time, per_field_round_trips = count_round_trips(False)
+        output, batch_time, batch_round_trips = count_round_trips(True)
+        print >> sys.stderr, "intfutil status {} ports: per-field {:.3f}s {} round trips, " \
+            "batched {:.3f}s {} round trips".format(BENCHMARK_PORT_COUNT, per_field_time, per_field_round_trips,
+                                                    batch_time, batch_round_trips)
+
+        self.assertEqual(output, expected)
+        self.assertTrue(batch_round_trips < 20)
+
     @classmethod
     def teardown_class(cls):
         print("TEARDOWN")
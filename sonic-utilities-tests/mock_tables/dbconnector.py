@@ -84,6 +84,10 @@ class SwssSyncClient(mockredis.MockRedis):
         # Find every key that matches the pattern
         return [key for key in self.redis.keys() if regex.match(key.decode('utf-8'))]
 
+    def dbsize(self):
+        """Emulate dbsize."""
+        return len(self.keys())
+
 
 swsssdk.interface.DBInterface._subscribe_keyspace_notification = _subscribe_keyspace_notification
 mockredis.MockRedis.config_set = config_set
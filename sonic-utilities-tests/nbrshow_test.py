@@ -0,0 +1,140 @@
+import imp
+import os
+import shutil
+import sys
+import tempfile
+
+import mock
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+scripts_path = os.path.join(modules_path, "scripts")
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+import mock_tables.dbconnector
+from helpers import benchmark, count_round_trips, get_fdb_per_entry, make_fdb_db, timed
+from utilities_common import fdb
+
+nbrshow = imp.load_source('nbrshow', os.path.join(scripts_path, 'nbrshow'))
+
+BENCHMARK_VLAN_COUNT = 16
+BENCHMARK_MAC_COUNT = 1024
+BENCHMARK_NEIGHBOR_COUNT = 1000
+
+ARP_HEADER = "Address                  HWtype  HWaddress           Flags Mask            Iface\n"
+
+
+def arp_output(neighbors):
+    """
+        Format the (address, MAC address, interface) of neighbors as the
+        output of "arp -n".
+    """
+    return ARP_HEADER + "".join("{:<24} ether   {:<19} C                     {}\n".format(*neighbor)
+                                for neighbor in neighbors)
+
+
+def show_arp(db, neighbors):
+    with mock.patch.object(nbrshow, 'SonicV2Connector', return_value=db), \
+            mock.patch.object(nbrshow.NbrBase, 'fetch_nbr_data', return_value=arp_output(neighbors)):
+        arp = nbrshow.ArpShow(None, None)
+        arp.display()
+    return arp
+
+
+def lookup_per_entry(db, neighbors):
+    """
+        Reference implementation looking the neighbors up in the list of
+        the FDB entries read one by one.
+    """
+    bridge_mac_list = get_fdb_per_entry(db)
+    ifaces = []
+    for ip, mac, iface in neighbors:
+        vlanid = int(iface[len("Vlan"):])
+        fdb_ent = next((fdb for fdb in bridge_mac_list if fdb[0] == vlanid and fdb[1] == mac.upper()), None)
+        ifaces.append(fdb_ent[2] if fdb_ent is not None else '-')
+    return ifaces
+
+
+def lookup_indexed(db, neighbors):
+    index = fdb.get_fdb_index(db)
+    ifaces = []
+    for ip, mac, iface in neighbors:
+        fdb_ent = index.lookup(int(iface[len("Vlan"):]), mac)
+        ifaces.append(fdb_ent[0] if fdb_ent is not None else '-')
+    return ifaces
+
+
+class TestNbrShow(object):
+    def setup_method(self, method):
+        self.dir = tempfile.mkdtemp()
+        self.cache_file = mock.patch.object(fdb, 'FDB_CACHE_FILE', os.path.join(self.dir, "fdb.json"))
+        self.cache_file.start()
+
+    def teardown_method(self, method):
+        self.cache_file.stop()
+        shutil.rmtree(self.dir)
+
+    def test_show_arp(self, capsys):
+        db = make_fdb_db(2, 4, port_count=4)
+        show_arp(db, [("192.168.0.2", "00:01:00:00:00:01", "Vlan1001"),
+                      ("192.168.0.3", "00:00:00:00:00:09", "Vlan1000"),
+                      ("10.0.0.57", "52:54:00:87:8f:2c", "PortChannel0001")])
+        out = capsys.readouterr()[0]
+        assert out.startswith("Failed to get Vlan id for bvid ")
+        lines = out.split("\n\n", 1)[1].splitlines()
+        assert lines[0].split() == nbrshow.ArpShow.HEADER
+        assert lines[2].split() == ["10.0.0.57", "52:54:00:87:8f:2c", "PortChannel0001", "-"]
+        assert lines[3].split() == ["192.168.0.2", "00:01:00:00:00:01", "Ethernet4", "1001"]
+        assert lines[4].split() == ["192.168.0.3", "00:00:00:00:00:09", "-", "1000"]
+        assert lines[5] == "Total number of entries 3 "
+
+    def test_no_vlan_neighbors(self):
+        db = make_fdb_db(2, 4, port_count=4)
+        with mock.patch.object(nbrshow, 'get_fdb_index') as get_fdb_index:
+            arp = show_arp(db, [("10.0.0.57", "52:54:00:87:8f:2c", "PortChannel0001")])
+        assert not get_fdb_index.called
+        assert arp.nbrdata == [["10.0.0.57", "52:54:00:87:8f:2c", "PortChannel0001", "-"]]
+
+    def test_lookup(self, capsys):
+        db = make_fdb_db(4, 16, port_count=4)
+        neighbors = [("192.{}.0.{}".format(168 + i % 4, i), "00:{:02x}:00:00:00:{:02x}".format(i % 4, i * 3 % 20),
+                      "Vlan{}".format(1000 + i % 4)) for i in range(40)]
+        expected = lookup_per_entry(db, neighbors)
+        ifaces = lookup_indexed(db, neighbors)
+        cached_ifaces, cached_round_trips = count_round_trips(db, db.ASIC_DB, lambda: lookup_indexed(db, neighbors))
+        arp = show_arp(db, neighbors)
+        capsys.readouterr()
+
+        assert ifaces == cached_ifaces == expected
+        assert '-' in expected
+        assert cached_round_trips == 1
+        assert sorted(ent[2] for ent in arp.nbrdata) == sorted(expected)
+
+    @benchmark
+    def test_benchmark_neighbors(self, capsys):
+        db = make_fdb_db(BENCHMARK_VLAN_COUNT, BENCHMARK_MAC_COUNT)
+        neighbors = []
+        for i in range(BENCHMARK_NEIGHBOR_COUNT):
+            vlan_index = i % BENCHMARK_VLAN_COUNT
+            mac_index = i * 7 % (BENCHMARK_MAC_COUNT + 8)
+            neighbors.append(("192.{}.{}.{}".format(168 + vlan_index, mac_index >> 8, mac_index & 0xff),
+                              "00:{:02x}:00:00:{:02x}:{:02x}".format(vlan_index, mac_index >> 8, mac_index & 0xff),
+                              "Vlan{}".format(1000 + vlan_index)))
+
+        expected, per_entry_time = timed(lambda: lookup_per_entry(db, neighbors))
+        (ifaces, read_round_trips), read_time = timed(
+            lambda: count_round_trips(db, db.ASIC_DB, lambda: lookup_indexed(db, neighbors)))
+        (cached_ifaces, cached_round_trips), cached_time = timed(
+            lambda: count_round_trips(db, db.ASIC_DB, lambda: lookup_indexed(db, neighbors)))
+        arp = show_arp(db, neighbors)
+        capsys.readouterr()
+
+        print("nbrshow {} neighbors, {} VLANs x {} MACs: per-entry {:.0f} ms, indexed {:.0f} ms {} round trips, "
+              "cached {:.0f} ms {} round trips".format(
+                  BENCHMARK_NEIGHBOR_COUNT, BENCHMARK_VLAN_COUNT, BENCHMARK_MAC_COUNT, per_entry_time * 1000,
+                  read_time * 1000, read_round_trips, cached_time * 1000, cached_round_trips))
+
+        assert ifaces == cached_ifaces == expected
+        assert cached_round_trips == 1
+        assert sorted(ent[2] for ent in arp.nbrdata) == sorted(expected)
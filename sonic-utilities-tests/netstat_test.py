@@ -0,0 +1,122 @@
+import os
+import random
+import sys
+import time
+from collections import namedtuple, OrderedDict
+
+import mock
+from tabulate import tabulate
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+from helpers import benchmark
+from utilities_common import netstat
+from utilities_common.counters import CounterSnapshot
+from utilities_common.netstat import STATUS_NA, cnstat_columns, counter_columns, format_brate, format_diff, format_prate, \
+    format_table, format_util, ns_batch, ns_brate, ns_diff, ns_diff_batch, ns_prate, ns_util
+
+BENCHMARK_PORT_COUNT = 512
+
+
+def make_counters(count, seed):
+    """
+        Build new and old counter strings with some counters not available,
+        and some which went backwards.
+    """
+    rand = random.Random(seed)
+    new, old = [], []
+    for i in range(count):
+        value = rand.randint(0, 2 ** 48)
+        new.append(STATUS_NA if i % 17 == 3 else str(value))
+        old.append(STATUS_NA if i % 23 == 5 else str(max(0, value - rand.randint(-1000, 2 ** 40))))
+    return new, old
+
+
+def to_column(strings):
+    return [netstat.COUNTER_NA if value == STATUS_NA else int(value) for value in strings]
+
+
+def check_batch(count, delta):
+    new_packets, old_packets = make_counters(count, 1)
+    new_bytes, old_bytes = make_counters(count, 2)
+    port_rates = [random.Random(i).choice([10, 25, 40, 100]) for i in range(count)]
+
+    columns = ns_batch(to_column(new_packets), to_column(old_packets),
+                       to_column(new_bytes), to_column(old_bytes), delta, port_rates)
+    for row in range(count):
+        assert format_diff(columns.diff[row]) == ns_diff(new_packets[row], old_packets[row])
+        assert format_prate(columns.pps[row]) == ns_prate(new_packets[row], old_packets[row], delta)
+        assert format_brate(columns.bps[row]) == ns_brate(new_bytes[row], old_bytes[row], delta)
+        assert format_util(columns.util[row]) == \
+            ns_util(new_bytes[row], old_bytes[row], delta, port_rates[row])
+
+    diff = ns_diff_batch(to_column(new_bytes), to_column(old_bytes))
+    assert [format_diff(value) for value in diff] == \
+        [ns_diff(new, old) for new, old in zip(new_bytes, old_bytes)]
+
+
+class TestNetstat(object):
+    def test_ns_functions(self):
+        assert ns_diff('1000', '1') == '999'
+        assert ns_diff('1', '1000') == '0'
+        assert ns_diff(STATUS_NA, '1') == STATUS_NA
+        assert ns_brate('41943041', '1', 2.0) == '20.00 MB/s'
+        assert ns_brate('40961', '1', 2.0) == '20.00 KB/s'
+        assert ns_prate('101', '1', 2.0) == '50.00/s'
+        assert ns_util('5368709121', '1', 1.0) == '100.00%'
+
+    def test_batch(self):
+        check_batch(256, 3.5)
+
+    def test_batch_without_numpy(self):
+        with mock.patch.object(netstat, 'numpy', None):
+            check_batch(256, 3.5)
+
+    def test_cnstat_columns(self):
+        Stats = namedtuple("Stats", "ok, err")
+        cnstat_dict = OrderedDict([('time', None), ('Ethernet0', Stats('10', STATUS_NA))])
+        columns = cnstat_columns(cnstat_dict, ['Ethernet0', 'Ethernet4'], Stats._fields)
+        assert list(columns['ok']) == [10, netstat.COUNTER_NA]
+        assert list(columns['err']) == [netstat.COUNTER_NA, netstat.COUNTER_NA]
+
+    def test_snapshot_columns(self):
+        snapshot = CounterSnapshot(['Ethernet0', 'Ethernet4'], ['', ''], ['ok'])
+        snapshot.columns['ok'][0] = 10
+        columns = counter_columns(snapshot, ['Ethernet0', 'Ethernet4'], ['ok', 'err'])
+        # The columns of a snapshot with the same rows are not copied
+        assert columns['ok'] is snapshot.columns['ok']
+        assert list(columns['err']) == [netstat.COUNTER_NA, netstat.COUNTER_NA]
+        columns = counter_columns(snapshot, ['Ethernet8', 'Ethernet0'], ['ok'])
+        assert list(columns['ok']) == [netstat.COUNTER_NA, 10]
+
+    def test_format_table(self):
+        header = ['IFACE', 'STATE', 'RX_OK', 'RX_BPS', 'RX_UTIL', 'RX_ERR']
+        table = [('Ethernet0', 'U', '1,234,567', '10.00 MB/s', '2.50%', '0'),
+                 ('Ethernet4', 'N/A', '0', '0.00 B/s', '0.00%', '12'),
+                 ('Ethernet100', 'X', STATUS_NA, STATUS_NA, STATUS_NA, '3')]
+        for rows in (table, table[1:], []):
+            assert format_table(rows, header) == tabulate(rows, header, tablefmt='simple', stralign='right')
+
+    @benchmark
+    def test_benchmark_512_ports(self):
+        new_packets, old_packets = make_counters(BENCHMARK_PORT_COUNT, 1)
+        new_bytes, old_bytes = make_counters(BENCHMARK_PORT_COUNT, 2)
+
+        start = time.time()
+        for row in range(BENCHMARK_PORT_COUNT):
+            ns_diff(new_packets[row], old_packets[row])
+            ns_brate(new_bytes[row], old_bytes[row], 1.0)
+            ns_prate(new_packets[row], old_packets[row], 1.0)
+            ns_util(new_bytes[row], old_bytes[row], 1.0)
+        per_cell_time = time.time() - start
+
+        columns = [to_column(strings) for strings in (new_packets, old_packets, new_bytes, old_bytes)]
+        start = time.time()
+        ns_batch(*columns, delta=1.0)
+        batch_time = time.time() - start
+
+        print("{} ports: per-cell {:.4f}s, batch {:.4f}s (numpy {})".format(
+              BENCHMARK_PORT_COUNT, per_cell_time, batch_time, netstat.numpy is not None))
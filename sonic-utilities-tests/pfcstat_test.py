@@ -0,0 +1,163 @@
+import imp
+import os
+import sys
+
+import mock
+import swsssdk
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+scripts_path = os.path.join(modules_path, "scripts")
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+import mock_tables.dbconnector
+from helpers import benchmark, count_round_trips, timed, without_time
+
+pfcstat = imp.load_source('pfcstat', os.path.join(scripts_path, 'pfcstat'))
+
+BENCHMARK_PORT_COUNT = 512
+
+
+def make_counters_db(port_count):
+    """
+        Build a COUNTERS_DB with the PFC counters of port_count ports, the
+        Tx counters of the last port not being available.
+    """
+    db = swsssdk.SonicV2Connector(host='127.0.0.1')
+    db.connect(db.COUNTERS_DB)
+    client = db.get_redis_client(db.COUNTERS_DB)
+    client.delete(pfcstat.COUNTERS_PORT_NAME_MAP)
+
+    pipe = client.pipeline(transaction=False)
+    for port_index in range(port_count):
+        port = "Ethernet{}".format(port_index * 4)
+        oid = "oid:0x1{:015x}".format(port_index)
+        pipe.hset(pfcstat.COUNTERS_PORT_NAME_MAP, port, oid)
+        counters = {counter_name: str(port_index * 100 + pos)
+                    for counter_name, pos in pfcstat.counter_bucket_rx_dict.items()}
+        if port_index != port_count - 1:
+            counters.update({counter_name: str(port_index * 1000 + pos)
+                             for counter_name, pos in pfcstat.counter_bucket_tx_dict.items()})
+        pipe.delete(pfcstat.COUNTER_TABLE_PREFIX + oid)
+        pipe.hmset(pfcstat.COUNTER_TABLE_PREFIX + oid, counters)
+    pipe.execute()
+
+    # Keep using the populated connection
+    db.connect = lambda *args, **kwargs: None
+    return db
+
+
+def get_cnstat_per_counter(db, rx):
+    """
+        Reference implementation issuing one GET per counter of every port.
+    """
+    bucket_dict = pfcstat.counter_bucket_rx_dict if rx else pfcstat.counter_bucket_tx_dict
+    port_name_map = db.get_all(db.COUNTERS_DB, pfcstat.COUNTERS_PORT_NAME_MAP)
+    cnstat_dict = pfcstat.OrderedDict()
+    for port in pfcstat.natsorted(port_name_map):
+        fields = ["0"] * 8
+        for counter_name, pos in bucket_dict.iteritems():
+            counter_data = db.get(db.COUNTERS_DB, pfcstat.COUNTER_TABLE_PREFIX + port_name_map[port], counter_name)
+            fields[pos] = pfcstat.STATUS_NA if counter_data is None else str(counter_data)
+        cnstat_dict[port] = pfcstat.PStats._make(fields)
+    return cnstat_dict
+
+
+def new_pfcstat(db):
+    with mock.patch.object(pfcstat.swsssdk, 'SonicV2Connector', return_value=db):
+        return pfcstat.Pfcstat()
+
+
+class TestPfcstat(object):
+    def test_get_all_cnstat(self):
+        db = make_counters_db(4)
+        stat = new_pfcstat(db)
+        (cnstat_dict_rx, cnstat_dict_tx), round_trips = count_round_trips(db, db.COUNTERS_DB, stat.get_all_cnstat)
+
+        # The port name map and the 16 counters of every port
+        assert round_trips == 2
+        assert without_time(cnstat_dict_rx) == get_cnstat_per_counter(db, True)
+        assert without_time(cnstat_dict_tx) == get_cnstat_per_counter(db, False)
+        assert cnstat_dict_rx['Ethernet8'] == pfcstat.PStats(*[str(200 + pos) for pos in range(8)])
+        assert cnstat_dict_tx['Ethernet12'] == pfcstat.PStats(*[pfcstat.STATUS_NA] * 8)
+        assert cnstat_dict_rx['time'] == cnstat_dict_tx['time']
+
+    def test_period(self, capsys):
+        db = make_counters_db(4)
+        client = db.get_redis_client(db.COUNTERS_DB)
+        port_name_map = db.get_all(db.COUNTERS_DB, pfcstat.COUNTERS_PORT_NAME_MAP)
+        clock = [pfcstat.datetime.datetime(2020, 1, 1)]
+
+        def sleep(seconds):
+            # Ethernet4 receives 5000 frames/s on priority 3, and Ethernet8
+            # sends 50 frames/s on priority 4
+            client.hincrby(pfcstat.COUNTER_TABLE_PREFIX + port_name_map['Ethernet4'],
+                           'SAI_PORT_STAT_PFC_3_RX_PKTS', 5000 * seconds)
+            client.hincrby(pfcstat.COUNTER_TABLE_PREFIX + port_name_map['Ethernet8'],
+                           'SAI_PORT_STAT_PFC_4_TX_PKTS', 50 * seconds)
+            clock[0] += pfcstat.datetime.timedelta(seconds=seconds)
+
+        snapshots = []
+        get_snapshot = pfcstat.Pfcstat.get_snapshot
+
+        def get_timed_snapshot(self):
+            snapshot = get_snapshot(self)
+            snapshot.time = clock[0]
+            snapshots.append(snapshot)
+            return snapshot
+
+        with mock.patch.object(pfcstat.swsssdk, 'SonicV2Connector', return_value=db), \
+                mock.patch.object(pfcstat.time, 'sleep', side_effect=sleep), \
+                mock.patch.object(pfcstat.Pfcstat, 'get_snapshot', get_timed_snapshot):
+            try:
+                pfcstat.main(['-p', '2'])
+            except SystemExit as e:
+                assert e.code == 0
+
+        out, err = capsys.readouterr()
+        lines = out.splitlines()
+        assert lines[0] == "The rates are calculated within 2 seconds period"
+        assert lines[1].split() == ' '.join(pfcstat.header_Rx + pfcstat.header_storm).split()
+        assert lines[3].split() == ['Ethernet0'] + ['0.00/s'] * 8
+        assert lines[4].split() == ['Ethernet4'] + ['0.00/s'] * 3 + ['5000.00/s'] + ['0.00/s'] * 4 + ['PFC3']
+        assert lines[-1] == "PFC storm above 1000 frames/s on: Ethernet4"
+
+        stat = new_pfcstat(db)
+        old, new = snapshots
+        tx_rates = stat.get_rates(new, old, False)
+        assert tx_rates[4][2] == 50.0
+        assert tx_rates[4][3] == pfcstat.COUNTER_NA
+
+        # A lower threshold flags the Tx priority as well
+        assert stat.cnstat_rate_print(new, old, False, 10) == ['Ethernet8']
+
+    def test_period_invalid_options(self, capsys):
+        for argv in (["-p", "2", "-c"], ["-p", "2", "-d"]):
+            try:
+                pfcstat.main(argv)
+            except SystemExit as e:
+                assert e.code == 2
+            else:
+                assert False
+        assert capsys.readouterr()[1].count("error: argument -p/--period: not allowed") == 2
+
+    @benchmark
+    def test_benchmark_512_ports(self):
+        db = make_counters_db(BENCHMARK_PORT_COUNT)
+
+        def per_counter():
+            return get_cnstat_per_counter(db, True), get_cnstat_per_counter(db, False)
+
+        ((expected_rx, expected_tx), per_counter_round_trips), per_counter_time = timed(
+            lambda: count_round_trips(db, db.COUNTERS_DB, per_counter))
+        stat = new_pfcstat(db)
+        ((cnstat_dict_rx, cnstat_dict_tx), batch_round_trips), batch_time = timed(
+            lambda: count_round_trips(db, db.COUNTERS_DB, stat.get_all_cnstat))
+
+        print("pfcstat {} ports: per-counter {:.3f}s {} round trips, batched {:.3f}s {} round trips".format(
+              BENCHMARK_PORT_COUNT, per_counter_time, per_counter_round_trips, batch_time, batch_round_trips))
+
+        assert batch_round_trips < 10
+        assert without_time(cnstat_dict_rx) == expected_rx
+        assert without_time(cnstat_dict_tx) == expected_tx
@@ -0,0 +1,232 @@
+import datetime
+import imp
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+scripts_path = os.path.join(modules_path, "scripts")
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+import mock
+import mock_tables.dbconnector
+from helpers import benchmark, count_round_trips, timed
+
+portstat = imp.load_source('portstat', os.path.join(scripts_path, 'portstat'))
+
+BENCHMARK_PORT_COUNT = 512
+
+
+def scale_counters_db(db, port_count):
+    """
+        Populate COUNTERS_DB and APPL_DB with port_count ports, using the
+        counters of the first mock port as a template.
+    """
+    counters = db.get_redis_client(db.COUNTERS_DB)
+    appl = db.get_redis_client(db.APPL_DB)
+
+    template = counters.hgetall("COUNTERS:oid:0x1000000000002")
+    for name in portstat.counter_bucket_dict:
+        template.setdefault(name, "1")
+
+    for i in range(port_count):
+        port = "Ethernet{}".format(i * 4)
+        oid = "oid:0x1{:015x}".format(0x100000 + i)
+        counters.hset(portstat.COUNTERS_PORT_NAME_MAP, port, oid)
+        counters.hmset(portstat.COUNTER_TABLE_PREFIX + oid,
+                       {k: str(int(v) + i) for k, v in template.items()})
+        appl.hmset(portstat.PORT_STATUS_TABLE_PREFIX + port,
+                   {"admin_status": "up", "oper_status": "up", "speed": "100000"})
+
+
+def get_cnstat_per_field(stat):
+    """
+        Reference implementation issuing one GET per counter per port.
+    """
+    cnstat_dict = {}
+    counter_port_name_map = stat.db.get_all(stat.db.COUNTERS_DB, portstat.COUNTERS_PORT_NAME_MAP)
+    for port, oid in counter_port_name_map.items():
+        fields = ["0"] * 10
+        for counter_name, pos in portstat.counter_bucket_dict.iteritems():
+            counter_data = stat.db.get(stat.db.COUNTERS_DB, portstat.COUNTER_TABLE_PREFIX + oid, counter_name)
+            if counter_data is None:
+                fields[pos] = portstat.STATUS_NA
+            elif fields[pos] != portstat.STATUS_NA:
+                fields[pos] = str(int(fields[pos]) + int(counter_data))
+        cnstat_dict[port] = portstat.NStats._make(fields)
+    return cnstat_dict
+
+
+class TestPortstat(object):
+    def test_get_cnstat(self):
+        stat = portstat.Portstat()
+        cnstat_dict, round_trips = count_round_trips(stat.db, stat.db.COUNTERS_DB, stat.get_cnstat)
+        # The port name map and a pipeline of the counters of all ports
+        assert round_trips <= 2
+        assert list(cnstat_dict.keys()) == ['time', 'Ethernet0', 'Ethernet4', 'Ethernet8']
+        expected = get_cnstat_per_field(stat)
+        for port, cntr in expected.items():
+            assert cnstat_dict[port] == cntr
+
+    def test_port_state_and_speed(self):
+        stat = portstat.Portstat()
+        stat.load_port_status(['Ethernet0', 'Ethernet200', 'Ethernet8'])
+        assert stat.get_port_state('Ethernet0') == portstat.PORT_STATE_DOWN
+        assert stat.get_port_speed('Ethernet0') == 25
+        assert stat.get_port_speed('Ethernet200') == 100
+        assert stat.get_port_state('Ethernet8') == portstat.STATUS_NA
+        assert stat.get_port_speed('Ethernet8') == portstat.PORT_RATE
+
+    def test_main_alias_mode(self, capsys):
+        portstat.main([], {"Ethernet0": "etp1", "Ethernet4": "etp2", "Ethernet8": "etp3"}.get)
+        out, err = capsys.readouterr()
+        names = [line.split()[0] for line in out.splitlines()[2:]]
+        assert names == ["etp1", "etp2", "etp3"]
+
+    def test_top(self, capsys):
+        stat = portstat.Portstat()
+        old = stat.get_cnstat()
+        new = OrderedDict(old)
+        new['time'] = old['time'] + datetime.timedelta(seconds=10)
+        for i, port in enumerate(['Ethernet0', 'Ethernet4', 'Ethernet8']):
+            new[port] = portstat.NStats._make(['100', '0', str(10 * i), '0', '100', '0', '0', '0',
+                                                str(1000 * (3 - i)), '1000'])
+            old[port] = portstat.NStats._make(['0'] * 10)
+
+        stat.cnstat_diff_print(new, old, False, True)
+        full = capsys.readouterr()[0].splitlines()
+
+        stat.cnstat_diff_print(new, old, False, True, top=2, sort_by='rx_bps')
+        assert capsys.readouterr()[0].splitlines() == full[:4]
+
+        stat.cnstat_diff_print(new, old, False, True, top=1, sort_by='rx_drop')
+        out = capsys.readouterr()[0].splitlines()
+        assert len(out) == 3
+        assert out[2].split() == full[4].split()
+
+    def test_diff_from_snapshot_file(self, capsys):
+        stat = portstat.Portstat()
+        old = stat.get_cnstat()
+        new = OrderedDict(old)
+        new['time'] = old['time'] + datetime.timedelta(seconds=10)
+        new['Ethernet4'] = portstat.NStats._make([str(int(value) + 100) if value != portstat.STATUS_NA else value
+                                                  for value in old['Ethernet4']])
+        stat.cnstat_diff_print(new, old, False, True)
+        expected = capsys.readouterr()[0]
+
+        path = os.path.join(tempfile.mkdtemp(), "portstat")
+        try:
+            portstat.save_cnstat(path, old, portstat.NStats)
+            snapshot = portstat.load_cnstat_snapshot(path, portstat.NStats)
+        finally:
+            shutil.rmtree(os.path.dirname(path))
+        with mock.patch.object(portstat, 'counter_columns', wraps=portstat.counter_columns) as counter_columns:
+            stat.cnstat_diff_print(new, snapshot, False, True)
+        assert counter_columns.call_args_list[1][0][0] is snapshot
+        assert capsys.readouterr()[0] == expected
+
+    def test_top_util_per_port_speed(self, capsys):
+        stat = portstat.Portstat()
+        old = stat.get_cnstat()
+        new = OrderedDict(old)
+        new['time'] = old['time'] + datetime.timedelta(seconds=1)
+        # Ethernet0 is a 25G port at 8Gbps, Ethernet200 a 100G one at 16Gbps
+        for port, rx_byt in (('Ethernet0', 10 ** 9), ('Ethernet4', 0), ('Ethernet8', 0)):
+            new[port] = portstat.NStats._make(['1', '0', '0', '0', '0', '0', '0', '0', str(rx_byt), '0'])
+            old[port] = portstat.NStats._make(['0'] * 10)
+        new['Ethernet200'] = portstat.NStats._make(['1', '0', '0', '0', '0', '0', '0', '0', str(2 * 10 ** 9), '0'])
+        old['Ethernet200'] = portstat.NStats._make(['0'] * 10)
+
+        stat.cnstat_diff_print(new, old, False, False, top=1, sort_by='util')
+        assert capsys.readouterr()[0].splitlines()[2].split()[0] == 'Ethernet0'
+        stat.cnstat_diff_print(new, old, False, False, top=1, sort_by='rx_bps')
+        assert capsys.readouterr()[0].splitlines()[2].split()[0] == 'Ethernet200'
+
+    def test_top_invalid_options(self, capsys):
+        for argv in (["--top", "0"], ["--top", "-1"], ["--top", "2", "-r"], ["--sort", "util"]):
+            try:
+                portstat.main(argv)
+            except SystemExit as e:
+                assert e.code == 2
+            else:
+                assert False
+        assert capsys.readouterr()[1].count("error: argument --") == 4
+
+    def test_watch(self, capsys):
+        stat = portstat.Portstat()
+        with mock.patch.object(portstat.time, 'sleep'):
+            stat.watch(1, False, True, count=3)
+        out, err = capsys.readouterr()
+        assert out.count("The rates are calculated within") == 2
+        assert out.count("Ethernet8") == 3
+
+    def test_process_changes(self):
+        stat = portstat.Portstat()
+        stat.get_cnstat()
+        stat.load_port_status(['Ethernet0', 'Ethernet4'])
+        pubsub = mock.Mock()
+        pubsub.get_message.side_effect = [
+            {'type': 'psubscribe', 'channel': '__keyspace@0__:PORT_TABLE:*', 'data': 1},
+            {'type': 'pmessage', 'channel': '__keyspace@0__:PORT_TABLE:Ethernet4', 'data': 'hset'},
+            None]
+        stat.process_changes([pubsub])
+        assert 'Ethernet0' in stat.port_status_cache
+        assert 'Ethernet4' not in stat.port_status_cache
+        assert portstat.COUNTERS_PORT_NAME_MAP in stat.counters.name_maps
+
+        stat.process_changes(None)
+        assert stat.port_status_cache == {}
+        assert stat.counters.name_maps == {}
+
+    @benchmark
+    def test_benchmark_watch_512_ports(self, capsys):
+        stat = portstat.Portstat()
+        scale_counters_db(stat.db, BENCHMARK_PORT_COUNT)
+        old = stat.get_cnstat()
+        stat.load_port_status(old.keys())
+        capsys.readouterr()
+
+        stat.watching = True
+        start = time.time()
+        new = stat.get_cnstat()
+        stat.cnstat_diff_print(new, old, False, True)
+        tick_time = time.time() - start
+        watch_out, err = capsys.readouterr()
+
+        stat.watching = False
+        stat.cnstat_diff_print(new, old, False, True)
+        out, err = capsys.readouterr()
+
+        print("portstat watch {} ports: {:.4f}s per refresh".format(BENCHMARK_PORT_COUNT, tick_time))
+        assert watch_out == out
+
+    @benchmark
+    def test_benchmark_512_ports(self):
+        stat = portstat.Portstat()
+        scale_counters_db(stat.db, BENCHMARK_PORT_COUNT)
+
+        (expected, per_field_round_trips), per_field_time = timed(
+            lambda: count_round_trips(stat.db, stat.db.COUNTERS_DB, lambda: get_cnstat_per_field(stat)))
+
+        def get_cnstat():
+            cnstat_dict = stat.get_cnstat()
+            stat.load_port_status(cnstat_dict.keys())
+            return cnstat_dict
+
+        (cnstat_dict, bulk_round_trips), bulk_time = timed(
+            lambda: count_round_trips(stat.db, stat.db.COUNTERS_DB, get_cnstat))
+
+        print("portstat {} ports: per-field {:.3f}s {} round trips, pipelined {:.3f}s {} round trips".format(
+              len(expected), per_field_time, per_field_round_trips, bulk_time, bulk_round_trips))
+
+        assert bulk_round_trips < 10
+        assert len(cnstat_dict) == len(expected) + 1
+        for port, cntr in expected.items():
+            assert cnstat_dict[port] == cntr
+        assert stat.get_port_state('Ethernet4') == portstat.PORT_STATE_UP
+        assert stat.get_port_speed('Ethernet4') == 100
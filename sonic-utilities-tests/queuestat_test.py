@@ -0,0 +1,210 @@
+import imp
+import cPickle as pickle
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+import mock
+import swsssdk
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+scripts_path = os.path.join(modules_path, "scripts")
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+import mock_tables.dbconnector
+from helpers import benchmark, count_round_trips, timed, without_time
+from utilities_common.snapshot_file import read_snapshot
+
+queuestat = imp.load_source('queuestat', os.path.join(scripts_path, 'queuestat'))
+
+BENCHMARK_PORT_COUNT = 512
+BENCHMARK_QUEUE_COUNT = 20
+
+
+def make_counters_db(port_count, queue_count):
+    """
+        Build a COUNTERS_DB with port_count ports of queue_count queues each,
+        half unicast and half multicast.
+    """
+    db = swsssdk.SonicV2Connector(host='127.0.0.1')
+    db.connect(db.COUNTERS_DB)
+    client = db.get_redis_client(db.COUNTERS_DB)
+    client.delete(queuestat.COUNTERS_PORT_NAME_MAP)
+
+    pipe = client.pipeline(transaction=False)
+    for port_index in range(port_count):
+        port = "Ethernet{}".format(port_index * 4)
+        port_oid = "oid:0x1{:015x}".format(port_index)
+        pipe.hset(queuestat.COUNTERS_PORT_NAME_MAP, port, port_oid)
+        for index in range(queue_count):
+            oid = "oid:0x15{:014x}".format(port_index * queue_count + index)
+            pipe.hset(queuestat.COUNTERS_QUEUE_NAME_MAP, "{}:{}".format(port, index), oid)
+            pipe.hset(queuestat.COUNTERS_QUEUE_PORT_MAP, oid, port_oid)
+            pipe.hset(queuestat.COUNTERS_QUEUE_INDEX_MAP, oid, str(index))
+            pipe.hset(queuestat.COUNTERS_QUEUE_TYPE_MAP, oid,
+                      queuestat.SAI_QUEUE_TYPE_UNICAST if index < queue_count / 2 else
+                      queuestat.SAI_QUEUE_TYPE_MULTICAST)
+            counters = {"SAI_QUEUE_STAT_PACKETS": str(index),
+                        "SAI_QUEUE_STAT_BYTES": str(index * 100),
+                        "SAI_QUEUE_STAT_DROPPED_PACKETS": str(port_index)}
+            pipe.hmset(queuestat.COUNTER_TABLE_PREFIX + oid, counters)
+    pipe.execute()
+
+    # Keep using the populated connection
+    db.connect = lambda *args, **kwargs: None
+    return db
+
+
+def get_all_cnstat_per_queue(db):
+    """
+        Reference implementation issuing one GET per map entry and per
+        counter of every queue.
+    """
+    all_cnstat = OrderedDict()
+    port_name_map = db.get_all(db.COUNTERS_DB, queuestat.COUNTERS_PORT_NAME_MAP)
+    port_oids = {oid: port for port, oid in port_name_map.items()}
+    port_queues_map = {port: {} for port in port_name_map}
+    queue_name_map = db.get_all(db.COUNTERS_DB, queuestat.COUNTERS_QUEUE_NAME_MAP)
+    for queue, oid in queue_name_map.items():
+        port = port_oids[db.get(db.COUNTERS_DB, queuestat.COUNTERS_QUEUE_PORT_MAP, oid)]
+        port_queues_map[port][queue] = oid
+
+    queue_types = {queuestat.SAI_QUEUE_TYPE_UNICAST: queuestat.QUEUE_TYPE_UC,
+                   queuestat.SAI_QUEUE_TYPE_MULTICAST: queuestat.QUEUE_TYPE_MC,
+                   queuestat.SAI_QUEUE_TYPE_ALL: queuestat.QUEUE_TYPE_ALL}
+    for port in queuestat.natsorted(port_queues_map):
+        cnstat_dict = OrderedDict()
+        for queue in queuestat.natsorted(port_queues_map[port]):
+            oid = port_queues_map[port][queue]
+            fields = ["0"] * 6
+            fields[0] = db.get(db.COUNTERS_DB, queuestat.COUNTERS_QUEUE_INDEX_MAP, oid)
+            fields[1] = queue_types[db.get(db.COUNTERS_DB, queuestat.COUNTERS_QUEUE_TYPE_MAP, oid)]
+            for counter_name, pos in queuestat.counter_bucket_dict.iteritems():
+                counter_data = db.get(db.COUNTERS_DB, queuestat.COUNTER_TABLE_PREFIX + oid, counter_name)
+                fields[pos] = queuestat.STATUS_NA if counter_data is None else str(int(counter_data))
+            cnstat_dict[queue] = queuestat.QueueStats._make(fields)
+        all_cnstat[port] = cnstat_dict
+    return all_cnstat
+
+
+def new_queuestat(db):
+    with mock.patch.object(queuestat.swsssdk, 'SonicV2Connector', return_value=db):
+        return queuestat.Queuestat()
+
+
+class TestQueuestat(object):
+    def setup_method(self, method):
+        self.dir = tempfile.mkdtemp()
+        queuestat.cnstat_dir = self.dir
+        queuestat.cnstat_fqn_file = os.path.join(self.dir, "0")
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.dir)
+
+    def test_get_all_cnstat(self):
+        db = make_counters_db(4, 8)
+        stat = new_queuestat(db)
+        expected = get_all_cnstat_per_queue(db)
+        all_cnstat, round_trips = count_round_trips(db, db.COUNTERS_DB, stat.get_all_cnstat)
+        assert round_trips < 20
+        assert list(all_cnstat.keys()) == list(expected.keys())
+        for port, cnstat_dict in all_cnstat.items():
+            assert without_time(cnstat_dict) == expected[port]
+        assert all_cnstat['Ethernet4']['Ethernet4:7'] == \
+            queuestat.QueueStats('7', 'MC', '7', '700', '1', queuestat.STATUS_NA)
+
+    def test_port_reads_only_its_queues(self):
+        db = make_counters_db(4, 8)
+        stat = new_queuestat(db)
+        with mock.patch.object(stat.counters, 'snapshot_objects',
+                               wraps=stat.counters.snapshot_objects) as snapshot_objects:
+            cnstat_dict = stat.get_cnstat('Ethernet8')
+        assert snapshot_objects.call_count == 1
+        assert snapshot_objects.call_args[0][0] == ["Ethernet8:{}".format(i) for i in range(8)]
+        assert without_time(cnstat_dict) == get_all_cnstat_per_queue(db)['Ethernet8']
+
+    def test_print_port_stat(self, capsys):
+        db = make_counters_db(2, 4)
+        stat = new_queuestat(db)
+        stat.get_print_port_stat('Ethernet4')
+        out, err = capsys.readouterr()
+        lines = out.splitlines()
+        assert lines[0].split() == queuestat.header
+        assert lines[2].split() == ['Ethernet4', 'UC0', '0', '0', '1', 'N/A']
+        assert lines[5].split() == ['Ethernet4', 'MC3', '3', '300', '1', 'N/A']
+
+    def test_save_fresh_stats(self, capsys):
+        db = make_counters_db(3, 4)
+        stat = new_queuestat(db)
+        # Counters saved per port by older versions are replaced
+        pickle.dump(stat.get_cnstat('Ethernet4'), open(queuestat.cnstat_fqn_file + 'Ethernet4', 'w'))
+        stat.save_fresh_stats()
+        out, err = capsys.readouterr()
+        assert out.splitlines() == ["Clear and update saved counters for Ethernet{}".format(i * 4) for i in range(3)]
+        assert os.listdir(self.dir) == ["0"]
+
+        snapshot = read_snapshot(queuestat.cnstat_fqn_file, 'Ethernet4')
+        assert snapshot.names == ["Ethernet4:{}".format(i) for i in range(4)]
+        assert snapshot.counter_names == queuestat.QUEUE_COUNTER_FIELDS
+        assert list(snapshot.column('totalbytes')) == [0, 100, 200, 300]
+        assert list(snapshot.column('droppacket')) == [1] * 4
+        assert read_snapshot(queuestat.cnstat_fqn_file, 'Ethernet12') is None
+
+        cached = stat.load_cached_cnstat(['Ethernet8'])
+        assert list(cached.keys()) == ['Ethernet8']
+        assert cached['Ethernet8']['Ethernet8:3'] == \
+            queuestat.QueueStats(None, None, '3', '300', '2', queuestat.STATUS_NA)
+
+        stat.get_print_port_stat('Ethernet8')
+        out, err = capsys.readouterr()
+        lines = out.splitlines()
+        assert lines[0].startswith("Last cached time was ")
+        assert lines[3].split() == ['Ethernet8', 'UC0', '0', '0', '0', 'N/A']
+
+        stat.get_print_all_stat()
+        out, err = capsys.readouterr()
+        assert len([line for line in out.splitlines() if "Last cached time was" in line]) == 3
+
+    def test_load_legacy_cached_stats(self):
+        db = make_counters_db(2, 4)
+        stat = new_queuestat(db)
+        cnstat_dict = stat.get_cnstat('Ethernet0')
+        pickle.dump(cnstat_dict, open(queuestat.cnstat_fqn_file + 'Ethernet0', 'w'))
+        assert stat.load_cached_cnstat(['Ethernet0', 'Ethernet4']) == {'Ethernet0': cnstat_dict}
+
+    @benchmark
+    def test_benchmark_512_ports_20_queues(self):
+        db = make_counters_db(BENCHMARK_PORT_COUNT, BENCHMARK_QUEUE_COUNT)
+
+        (expected, per_queue_round_trips), per_queue_time = timed(
+            lambda: count_round_trips(db, db.COUNTERS_DB, lambda: get_all_cnstat_per_queue(db)))
+        (all_cnstat, batch_round_trips), batch_time = timed(
+            lambda: count_round_trips(db, db.COUNTERS_DB, lambda: new_queuestat(db).get_all_cnstat()))
+
+        print("queuestat {} ports x {} queues: per-queue {:.3f}s {} round trips, "
+              "batched {:.3f}s {} round trips".format(
+                  BENCHMARK_PORT_COUNT, BENCHMARK_QUEUE_COUNT, per_queue_time, per_queue_round_trips,
+                  batch_time, batch_round_trips))
+
+        assert batch_round_trips < 20
+        for port in ('Ethernet0', 'Ethernet1024', 'Ethernet2044'):
+            assert without_time(all_cnstat[port]) == expected[port]
+
+        # Load the saved counters of one port: whole pickle vs snapshot slice
+        pickle.dump(expected, open(queuestat.cnstat_fqn_file + ".pickle", 'w'))
+        start = time.time()
+        pickle.load(open(queuestat.cnstat_fqn_file + ".pickle"))['Ethernet2044']
+        pickle_time = time.time() - start
+        stat = new_queuestat(db)
+        stat.save_fresh_stats()
+        start = time.time()
+        cached = stat.load_cached_cnstat(['Ethernet2044'])
+        snapshot_time = time.time() - start
+        print("queuestat -p load of saved counters: pickle {:.4f}s, snapshot {:.4f}s".format(
+              pickle_time, snapshot_time))
+        assert without_time(cached['Ethernet2044']).keys() == expected['Ethernet2044'].keys()
@@ -0,0 +1,466 @@
+import contextlib
+import imp
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import mock
+import swsssdk
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+scripts_path = os.path.join(modules_path, "scripts")
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+import mock_tables.dbconnector
+from helpers import benchmark, count_round_trips, timed
+
+route_check = imp.load_source('route_check', os.path.join(scripts_path, 'route_check.py'))
+
+BENCHMARK_ROUTE_COUNT = 20000
+DIFF_PREFIX_COUNT = 2000
+BENCHMARK_PREFIX_COUNT = 200000
+
+ASIC_ROUTE_ENTRY_KEY = 'ASIC_STATE:SAI_OBJECT_TYPE_ROUTE_ENTRY:' \
+    '{{"dest":"{}","switch_id":"oid:0x21000000000000","vr":"oid:0x3000000000022"}}'
+
+
+def make_prefixes(count):
+    """
+        Build count route prefixes, one in four of them IPv6.
+    """
+    prefixes = []
+    for i in range(count):
+        if i % 4 == 3:
+            prefixes.append("20c0:{:x}:{:x}::/64".format(i >> 16, i & 0xffff))
+        else:
+            prefixes.append("{}.{}.{}.0/24".format(100 + (i >> 16), (i >> 8) & 0xff, i & 0xff))
+    return prefixes
+
+
+def make_route_dbs(prefixes, asic_prefixes=None, interfaces=()):
+    """
+        Build the APPL_DB ROUTE_TABLE and INTF_TABLE and the ASIC_DB route
+        entries of the given prefixes, with a next hop for all but the
+        last route. The ASIC_DB has the routes of asic_prefixes, by default
+        the routes with a next hop and the interface subnets and addresses.
+    """
+    db = swsssdk.SonicV2Connector(host='127.0.0.1')
+    db.connect(db.APPL_DB)
+    db.connect(db.ASIC_DB)
+    appl_client = db.get_redis_client(db.APPL_DB)
+    asic_client = db.get_redis_client(db.ASIC_DB)
+    for client, pattern in ((appl_client, "ROUTE_TABLE:*"), (appl_client, "INTF_TABLE:*"),
+                            (asic_client, "ASIC_STATE:SAI_OBJECT_TYPE_ROUTE_ENTRY:*")):
+        for key in client.keys(pattern):
+            client.delete(key)
+
+    pipe = appl_client.pipeline(transaction=False)
+    for i, prefix in enumerate(prefixes):
+        nexthop = "" if i == len(prefixes) - 1 else "10.0.0.{}".format(i % 64)
+        pipe.hmset("ROUTE_TABLE:" + prefix, {"nexthop": nexthop, "ifname": "PortChannel01"})
+    for interface in interfaces:
+        pipe.hmset("INTF_TABLE:" + interface, {"scope": "global", "family": "IPv4"})
+    pipe.execute()
+
+    if asic_prefixes is None:
+        asic_prefixes = [route_check.add_prefix_ifnot(prefix) for prefix in prefixes[:-1]]
+        for interface in interfaces:
+            name, ip_prefix = interface.split(':', 1)
+            if name in ('eth0', 'docker0'):
+                continue
+            asic_prefixes.append(route_check.add_prefix(ip_prefix.split('/')[0]))
+            if name != 'lo':
+                asic_prefixes.append(route_check.ip_subnet(ip_prefix))
+    pipe = asic_client.pipeline(transaction=False)
+    for prefix in asic_prefixes:
+        pipe.hset(ASIC_ROUTE_ENTRY_KEY.format(prefix), "SAI_ROUTE_ENTRY_ATTR_NEXT_HOP_ID", "oid:0x5000000000614")
+    pipe.execute()
+
+    # Keep using the populated connections
+    db.connect = lambda *args, **kwargs: None
+    return db
+
+
+def make_route_tables(count):
+    """
+        Generate the APPL_DB ROUTE_TABLE and the ASIC_DB route entries of
+        count routes, as loaded from the mock_tables JSON files. The first
+        route is missing from the ASIC_DB, which has an extra route entry.
+    """
+    prefixes = make_prefixes(count)
+    appl_db = {"ROUTE_TABLE:" + prefix: {"nexthop": "10.0.0.1", "ifname": "PortChannel01"} for prefix in prefixes}
+    asic_db = {ASIC_ROUTE_ENTRY_KEY.format(route_check.add_prefix_ifnot(prefix)):
+               {"SAI_ROUTE_ENTRY_ATTR_NEXT_HOP_ID": "oid:0x5000000000614"} for prefix in prefixes[1:]}
+    asic_db[ASIC_ROUTE_ENTRY_KEY.format("192.193.120.255/25")] = {"SAI_ROUTE_ENTRY_ATTR_NEXT_HOP_ID": ""}
+    return json.loads(json.dumps(appl_db)), json.loads(json.dumps(asic_db))
+
+
+def diff_strings(t1, t2):
+    """
+        Reference diff of sorted lists of prefix strings.
+    """
+    t1_miss = []
+    t2_miss = []
+    t1_x = t2_x = 0
+    while t1_x < len(t1) and t2_x < len(t2):
+        if t1[t1_x] == t2[t2_x]:
+            t1_x += 1
+            t2_x += 1
+        elif t1[t1_x] < t2[t2_x]:
+            t1_miss.append(t1[t1_x])
+            t1_x += 1
+        else:
+            t2_miss.append(t2[t2_x])
+            t2_x += 1
+    return t1_miss + t1[t1_x:], t2_miss + t2[t2_x:]
+
+
+def get_routes_per_key(db):
+    """
+        Reference implementation issuing one HGETALL per route.
+    """
+    valid_rt = []
+    for key in db.keys(db.APPL_DB, "ROUTE_TABLE:*"):
+        if db.get_all(db.APPL_DB, key)['nexthop'] != '':
+            valid_rt.append(route_check.add_prefix_ifnot(key[len("ROUTE_TABLE:"):]))
+    return sorted(valid_rt)
+
+
+class FakePubSub(object):
+    def __init__(self):
+        self.patterns = []
+        self.messages = []
+        self.closed = False
+
+    def psubscribe(self, *patterns):
+        self.patterns.extend(patterns)
+
+    def get_message(self):
+        return self.messages.pop(0) if self.messages else None
+
+    def close(self):
+        self.closed = True
+
+    def notify(self, key, event='hset'):
+        self.messages.append({'type': 'pmessage', 'pattern': self.patterns[0],
+                              'channel': '__keyspace@0__:' + key, 'data': event})
+
+
+def patch_pubsubs(db, appl_pubsubs, asic_pubsubs):
+    """
+        Patch the clients of db to subscribe with the given FakePubSubs, in
+        turn, on a server sending all the keyspace events.
+    """
+    patches = []
+    for db_name, pubsubs in ((db.APPL_DB, appl_pubsubs), (db.ASIC_DB, asic_pubsubs)):
+        client = db.get_redis_client(db_name)
+        patches.append(mock.patch.object(client, 'pubsub', side_effect=pubsubs))
+        patches.append(mock.patch.object(client, 'config_get', create=True,
+                                         return_value={'notify-keyspace-events': 'AKE'}))
+    return contextlib.nested(*patches)
+
+
+def new_monitor(db, grace_period):
+    """
+        Build a loaded RouteMonitor, its keyspace notifications read from a
+        FakePubSub per database.
+    """
+    pubsubs = [FakePubSub(), FakePubSub()]
+    with mock.patch.object(route_check, 'SonicV2Connector', return_value=db), \
+            patch_pubsubs(db, pubsubs[:1], pubsubs[1:]):
+        monitor = route_check.RouteMonitor(grace_period)
+        monitor.subscribe()
+        monitor.load()
+    return monitor, pubsubs
+
+
+def check_routes(db):
+    with mock.patch.object(route_check, 'SonicV2Connector', return_value=db):
+        return route_check.check_routes()
+
+
+class TestRouteCheck(object):
+    def setup_method(self, method):
+        route_check.set_mode('ERR')
+
+    def test_get_routes(self):
+        prefixes = make_prefixes(50) + ["10.1.0.1", "fc00::1"]
+        db = make_route_dbs(prefixes)
+        with mock.patch.object(route_check, 'SonicV2Connector', return_value=db), \
+                mock.patch.object(route_check, 'SCAN_COUNT', 8):
+            routes, round_trips = count_round_trips(db, db.APPL_DB, route_check.get_routes)
+        assert sorted(routes) == get_routes_per_key(db)
+        # The next hops are read with a pipeline per batch of keys
+        assert round_trips <= 2 * len(prefixes) / 8 + 2
+        assert "10.1.0.1/32" in routes
+        assert "fc00::1" not in routes
+        assert "20c0:0:3::/64" in routes
+        assert len(routes) == 51
+
+    def test_check_routes(self, capsys):
+        prefixes = make_prefixes(20)
+        interfaces = ["PortChannel01:10.0.0.56/31", "lo:10.1.0.32/32", "eth0:10.3.147.10/23"]
+        db = make_route_dbs(prefixes, interfaces=interfaces)
+        assert check_routes(db) == 0
+        assert capsys.readouterr()[0] == "All good!\n"
+
+        # A route missing from the ASIC_DB, and an ASIC route entry which
+        # is not in the APPL_DB
+        asic_client = db.get_redis_client(db.ASIC_DB)
+        asic_client.delete(ASIC_ROUTE_ENTRY_KEY.format("20c0:0:3::/64"))
+        asic_client.hset(ASIC_ROUTE_ENTRY_KEY.format("192.193.120.255/25"), "SAI_ROUTE_ENTRY_ATTR_NEXT_HOP_ID", "")
+        db.get_redis_client(db.APPL_DB).hset("INTF_TABLE:PortChannel01:10.0.0.99/31", "scope", "global")
+        assert check_routes(db) == -1
+        out = capsys.readouterr()[0]
+        assert out.endswith("}\nFailed. Look at reported mismatches above\n")
+        results = json.loads(out[len("results: {\n"):out.rindex("}\n")])
+        assert results == {"missed_ROUTE_TABLE_routes": ["20c0:0:3::/64"],
+                           "missed_INTF_TABLE_entries": ["10.0.0.98/31", "10.0.0.99/32"],
+                           "Unaccounted_ROUTE_ENTRY_TABLE_entries": ["192.193.120.255/25"]}
+
+    def test_monitor(self):
+        prefixes = make_prefixes(20)
+        interfaces = ["PortChannel01:10.0.0.56/31", "lo:10.1.0.32/32"]
+        db = make_route_dbs(prefixes, interfaces=interfaces)
+        appl_client = db.get_redis_client(db.APPL_DB)
+        asic_client = db.get_redis_client(db.ASIC_DB)
+        monitor, (appl_pubsub, asic_pubsub) = new_monitor(db, 10)
+        assert appl_pubsub.patterns == ["__keyspace@0__:ROUTE_TABLE:*", "__keyspace@0__:INTF_TABLE:*"]
+        assert asic_pubsub.patterns == ["__keyspace@1__:ASIC_STATE:SAI_OBJECT_TYPE_ROUTE_ENTRY:*"]
+        monitor.check(0)
+        assert monitor.mismatches == {}
+        assert len(monitor.routes) == 19
+
+        # A route withdrawn from the ASIC, and a route added to APPL_DB
+        # then to the ASIC within the grace period
+        asic_client.delete(ASIC_ROUTE_ENTRY_KEY.format("20c0:0:3::/64"))
+        asic_pubsub.notify(ASIC_ROUTE_ENTRY_KEY.format("20c0:0:3::/64"), 'del')
+        appl_client.hset("ROUTE_TABLE:30.0.0.0/24", "nexthop", "10.0.0.57")
+        appl_pubsub.notify("ROUTE_TABLE:30.0.0.0/24")
+        with mock.patch.object(appl_client, 'hget', wraps=appl_client.hget) as hget:
+            assert monitor.process_events() == 2
+        assert hget.call_count == 1
+        assert monitor.changed == {route_check.pack_prefix(u"20c0:0:3::/64"), route_check.pack_prefix(u"30.0.0.0/24")}
+        monitor.check(100)
+        assert monitor.get_results(105) == {}
+        assert monitor.get_results(110) == {"missed_ROUTE_TABLE_routes": ["30.0.0.0/24", "20c0:0:3::/64"]}
+
+        asic_client.hset(ASIC_ROUTE_ENTRY_KEY.format("30.0.0.0/24"), "SAI_ROUTE_ENTRY_ATTR_NEXT_HOP_ID", "")
+        asic_pubsub.notify(ASIC_ROUTE_ENTRY_KEY.format("30.0.0.0/24"))
+        # An interface removed from APPL_DB, not from the ASIC
+        appl_client.delete("INTF_TABLE:PortChannel01:10.0.0.56/31")
+        appl_pubsub.notify("INTF_TABLE:PortChannel01:10.0.0.56/31", 'del')
+        assert monitor.process_events() == 2
+        monitor.check(110)
+        assert monitor.get_results(115) == {"missed_ROUTE_TABLE_routes": ["20c0:0:3::/64"]}
+        assert monitor.get_results(120) == {"missed_ROUTE_TABLE_routes": ["20c0:0:3::/64"],
+                                            "Unaccounted_ROUTE_ENTRY_TABLE_entries": ["10.0.0.56/31", "10.0.0.56/32"]}
+
+        # Added back to the ASIC
+        asic_client.hset(ASIC_ROUTE_ENTRY_KEY.format("20c0:0:3::/64"), "SAI_ROUTE_ENTRY_ATTR_NEXT_HOP_ID", "")
+        asic_pubsub.notify(ASIC_ROUTE_ENTRY_KEY.format("20c0:0:3::/64"))
+        appl_client.hset("INTF_TABLE:PortChannel01:10.0.0.56/31", "scope", "global")
+        appl_pubsub.notify("INTF_TABLE:PortChannel01:10.0.0.56/31")
+        monitor.process_events()
+        monitor.check(130)
+        assert monitor.mismatches == {}
+        assert monitor.get_results(200) == {}
+
+    def test_keyspace_events(self):
+        monitor = route_check.RouteMonitor.__new__(route_check.RouteMonitor)
+        client = mock.Mock()
+        for events, expected in (("", "Kgh"), ("Ex", "ExKgh"), ("KEA", None), ("Kgxh", None), ("AE", "AEK")):
+            client.reset_mock()
+            client.config_get.return_value = {'notify-keyspace-events': events}
+            monitor.enable_keyspace_events(client)
+            if expected is None:
+                assert not client.config_set.called
+            else:
+                client.config_set.assert_called_once_with('notify-keyspace-events', expected)
+
+    def test_daemon(self, capsys):
+        prefixes = make_prefixes(20)
+        db = make_route_dbs(prefixes, asic_prefixes=[route_check.add_prefix_ifnot(prefix) for prefix in prefixes[1:-1]])
+        metrics_dir = tempfile.mkdtemp()
+        metrics_file = os.path.join(metrics_dir, "route_check.json")
+        try:
+            with mock.patch.object(route_check, 'SonicV2Connector', return_value=db), \
+                    patch_pubsubs(db, [FakePubSub()], [FakePubSub()]), \
+                    mock.patch.object(route_check.time, 'sleep') as sleep:
+                monitor = route_check.run_daemon(interval=5, grace_period=0, metrics_file=metrics_file, count=2)
+            assert sleep.call_args_list == [mock.call(5)]
+            with open(metrics_file) as f:
+                metrics = json.load(f)
+        finally:
+            shutil.rmtree(metrics_dir)
+
+        # Reported once, when it is first found
+        out = capsys.readouterr()[0]
+        assert out.count("results: {") == 1
+        assert '"missed_ROUTE_TABLE_routes": [\n        "100.0.0.0/24"\n    ]' in out
+        assert metrics["mismatches"] == 1
+        assert metrics["pending_mismatches"] == 1
+        assert metrics["routes"] == 19
+        assert metrics["route_entries"] == 18
+        assert metrics["events"] == 0
+        assert metrics["check_latency_ms"] >= 0
+
+    def test_daemon_resync(self, capsys):
+        prefixes = make_prefixes(20)
+        db = make_route_dbs(prefixes)
+        appl_pubsubs = [FakePubSub(), FakePubSub()]
+        asic_pubsubs = [FakePubSub(), FakePubSub()]
+
+        # The connection is lost after a route entry was removed
+        def disconnect():
+            db.get_redis_client(db.ASIC_DB).delete(ASIC_ROUTE_ENTRY_KEY.format("20c0:0:3::/64"))
+            raise route_check.ConnectionError("Connection closed by server.")
+        appl_pubsubs[0].get_message = disconnect
+
+        with mock.patch.object(route_check, 'SonicV2Connector', return_value=db), \
+                patch_pubsubs(db, appl_pubsubs, asic_pubsubs), \
+                mock.patch.object(route_check.time, 'sleep'):
+            route_check.run_daemon(grace_period=0, metrics_file=None, count=3)
+
+        out = capsys.readouterr()[0]
+        assert out.startswith("Lost the connection to redis (Connection closed by server.), reloading the tables\n")
+        assert '"missed_ROUTE_TABLE_routes": [\n        "20c0:0:3::/64"\n    ]' in out
+        assert appl_pubsubs[0].closed and asic_pubsubs[0].closed
+        assert appl_pubsubs[1].patterns == ["__keyspace@0__:ROUTE_TABLE:*", "__keyspace@0__:INTF_TABLE:*"]
+        assert appl_pubsubs[1].closed
+
+    def test_daemon_reload(self):
+        db = make_route_dbs(make_prefixes(20))
+        for reload_interval, loads in ((15, 3), (0, 1)):
+            with mock.patch.object(route_check, 'SonicV2Connector', return_value=db), \
+                    patch_pubsubs(db, [FakePubSub()], [FakePubSub()]), \
+                    mock.patch.object(route_check.RouteMonitor, 'load', autospec=True,
+                                      side_effect=route_check.RouteMonitor.load) as load, \
+                    mock.patch.object(route_check.time, 'time', side_effect=itertools.count(0, 10)), \
+                    mock.patch.object(route_check.time, 'sleep'):
+                route_check.run_daemon(grace_period=0, metrics_file=None, count=2, reload_interval=reload_interval)
+            assert load.call_count == loads
+
+    def test_daemon_interrupted(self):
+        db = make_route_dbs(make_prefixes(20))
+        pubsubs = [FakePubSub(), FakePubSub()]
+        with mock.patch.object(route_check, 'SonicV2Connector', return_value=db), \
+                patch_pubsubs(db, pubsubs[:1], pubsubs[1:]), \
+                mock.patch.object(route_check.time, 'sleep', side_effect=KeyboardInterrupt):
+            monitor = route_check.run_daemon(grace_period=0, metrics_file=None)
+        assert len(monitor.routes) == 19
+        assert all(pubsub.closed for pubsub in pubsubs)
+
+    def test_pack_prefix(self):
+        prefixes = [u"0.0.0.0/0", u"10.0.0.0/8", u"10.0.0.0/24", u"10.0.0.1", u"192.168.0.0/16",
+                    u"::/0", u"20c0:0:3::/64", u"fc00::1", u"fc00::1:0/112"]
+        records = [route_check.pack_prefix(prefix) for prefix in prefixes]
+        assert [len(record) for record in records] == [5] * 5 + [17] * 4
+        assert [route_check.unpack_prefix(record) for record in records] == \
+            [route_check.add_prefix_ifnot(prefix) for prefix in prefixes]
+        # Records sort by family, network address then prefix length
+        assert sorted(records, key=route_check.record_key) == records
+        table = route_check.PrefixTable(reversed(records))
+        assert len(table) == len(prefixes)
+        assert list(table.records()) == records
+
+    def test_do_diff(self):
+        t1 = route_check.PrefixTable.from_prefixes([u"10.0.0.0/24", u"10.0.1.0/24", u"fc00::/64", u"fc01::/64"])
+        t2 = route_check.PrefixTable.from_prefixes([u"10.0.1.0/24", u"10.0.2.0/24", u"fc01::/64"])
+        t1_miss, t2_miss = route_check.do_diff(t1, t2)
+        assert list(t1_miss) == ["10.0.0.0/24", "fc00::/64"]
+        assert list(t2_miss) == ["10.0.2.0/24"]
+        t1_miss, t2_miss = route_check.do_diff(t1, t1)
+        assert len(t1_miss) == len(t2_miss) == 0
+
+    def test_diff_prefix_tables(self):
+        appl_db, asic_db = make_route_tables(DIFF_PREFIX_COUNT)
+        route_keys = [key[len("ROUTE_TABLE:"):] for key in appl_db]
+        entry_keys = [key[len("ASIC_STATE:SAI_OBJECT_TYPE_ROUTE_ENTRY:"):] for key in asic_db]
+
+        routes = sorted(route_check.add_prefix_ifnot(k) for k in route_keys)
+        entries = sorted(route_check.route_entry_prefix(k) for k in entry_keys)
+        assert diff_strings(routes, entries) == ([u"100.0.0.0/24"], [u"192.193.120.255/25"])
+
+        routes = route_check.PrefixTable(route_check.pack_prefix(k) for k in route_keys)
+        entries = route_check.PrefixTable(route_check.pack_prefix(route_check.route_entry_prefix(k))
+                                          for k in entry_keys)
+        packed_miss = route_check.do_diff(routes, entries)
+        assert [list(table) for table in packed_miss] == [["100.0.0.0/24"], ["192.193.120.255/25"]]
+        # One record of 5 or 17 bytes per IPv4 or IPv6 prefix
+        assert len(routes.buffers["IPv4"]) == 5 * (DIFF_PREFIX_COUNT - DIFF_PREFIX_COUNT // 4)
+        assert len(routes.buffers["IPv6"]) == 17 * (DIFF_PREFIX_COUNT // 4)
+
+    @benchmark
+    def test_benchmark_prefixes(self):
+        appl_db, asic_db = make_route_tables(BENCHMARK_PREFIX_COUNT)
+        route_keys = [key[len("ROUTE_TABLE:"):] for key in appl_db]
+        entry_keys = [key[len("ASIC_STATE:SAI_OBJECT_TYPE_ROUTE_ENTRY:"):] for key in asic_db]
+
+        def diff_string_tables():
+            routes = sorted(route_check.add_prefix_ifnot(k) for k in route_keys)
+            entries = sorted(route_check.route_entry_prefix(k) for k in entry_keys)
+            return (routes, entries), diff_strings(routes, entries)
+
+        def diff_packed_tables():
+            routes = route_check.PrefixTable(route_check.pack_prefix(k) for k in route_keys)
+            entries = route_check.PrefixTable(route_check.pack_prefix(route_check.route_entry_prefix(k))
+                                              for k in entry_keys)
+            return (routes, entries), route_check.do_diff(routes, entries)
+
+        (string_tables, string_miss), string_time = timed(diff_string_tables)
+        string_size = sum(sys.getsizeof(table) + sum(sys.getsizeof(prefix) for prefix in table)
+                          for table in string_tables)
+        (packed_tables, packed_miss), packed_time = timed(diff_packed_tables)
+        packed_size = sum(sys.getsizeof(buf) for table in packed_tables for buf in table.buffers.values())
+
+        print("route_check {} prefixes: strings {:.3f}s {:.1f}MB, packed {:.3f}s {:.1f}MB".format(
+              BENCHMARK_PREFIX_COUNT, string_time, string_size / 1e6, packed_time, packed_size / 1e6))
+
+        assert string_miss == ([u"100.0.0.0/24"], [u"192.193.120.255/25"])
+        assert [list(table) for table in packed_miss] == [["100.0.0.0/24"], ["192.193.120.255/25"]]
+
+    def test_unparseable_prefixes(self, capsys):
+        prefixes = make_prefixes(20)
+        db = make_route_dbs(prefixes, interfaces=["PortChannel01:10.0.0.56/31"])
+        appl_client = db.get_redis_client(db.APPL_DB)
+        asic_client = db.get_redis_client(db.ASIC_DB)
+        appl_client.hset("ROUTE_TABLE:Vrf-red:30.0.0.0/24", "nexthop", "10.0.0.57")
+        appl_client.hset("ROUTE_TABLE:30.0.1.0/300", "nexthop", "10.0.0.57")
+        asic_client.hset(ASIC_ROUTE_ENTRY_KEY.format("Vrf-red:30.0.0.0/24"), "SAI_ROUTE_ENTRY_ATTR_NEXT_HOP_ID", "")
+        assert check_routes(db) == 0
+        assert capsys.readouterr()[0] == "All good!\n"
+
+        route_check.set_mode('INFO')
+        route_check.get_routes(appl_client)
+        out = capsys.readouterr()[0]
+        assert "Skipped unparseable prefix Vrf-red:30.0.0.0/24\n" in out
+        assert "Skipped unparseable prefix 30.0.1.0/300\n" in out
+
+        monitor, _ = new_monitor(db, 0)
+        monitor.update_route("Vrf-red:30.0.0.0/24")
+        monitor.update_entry(ASIC_ROUTE_ENTRY_KEY.format("Vrf-red:30.0.0.0/24")[len(route_check.ASIC_ROUTE_ENTRY_PREFIX):])
+        monitor.check(0)
+        assert monitor.mismatches == {}
+
+    @benchmark
+    def test_benchmark_routes(self):
+        prefixes = make_prefixes(BENCHMARK_ROUTE_COUNT)
+        db = make_route_dbs(prefixes)
+
+        (expected, per_key_round_trips), per_key_time = timed(
+            lambda: count_round_trips(db, db.APPL_DB, lambda: get_routes_per_key(db)))
+        with mock.patch.object(route_check, 'SonicV2Connector', return_value=db):
+            (routes, batch_round_trips), batch_time = timed(
+                lambda: count_round_trips(db, db.APPL_DB, route_check.get_routes))
+
+        print("route_check {} routes: per-route {:.3f}s {} round trips, batched {:.3f}s {} round trips".format(
+              BENCHMARK_ROUTE_COUNT, per_key_time, per_key_round_trips, batch_time, batch_round_trips))
+
+        assert sorted(routes) == expected
+        assert batch_round_trips <= 2 * BENCHMARK_ROUTE_COUNT / route_check.SCAN_COUNT + 2
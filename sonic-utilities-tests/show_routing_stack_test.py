@@ -0,0 +1,37 @@
+import os
+import sys
+
+import mock
+from click.testing import CliRunner
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+import mock_tables.dbconnector
+
+import show.main as show
+
+
+class TestRoutingStackCommands(object):
+    def setup_method(self, method):
+        self.loaded = mock.patch.object(show, '_routing_stack_commands_loaded', False)
+        self.loaded.start()
+
+    def teardown_method(self, method):
+        self.loaded.stop()
+
+    def test_other_groups_do_not_detect(self):
+        with mock.patch.object(show, 'get_routing_stack', return_value='frr') as get_routing_stack:
+            result = CliRunner().invoke(show.cli, ['interfaces', '--help'])
+            assert result.exit_code == 0
+            assert show.interfaces.list_commands(None)
+            assert show.interfaces.load_commands() is False
+        assert not get_routing_stack.called
+
+    def test_hosting_groups_detect(self):
+        with mock.patch.object(show, 'get_routing_stack', return_value='quagga') as get_routing_stack:
+            assert 'bgp' in show.ipv6.list_commands(None)
+            assert 'lldp' in show.cli.list_commands(None)
+        assert get_routing_stack.call_count == 1
@@ -0,0 +1,166 @@
+import cPickle as pickle
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import namedtuple, OrderedDict
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+from helpers import benchmark
+from utilities_common.counters import COUNTER_NA, CounterSnapshot
+from utilities_common.snapshot_file import SnapshotFile, SnapshotFormatError, is_snapshot_file, load_cnstat, \
+    load_cnstat_snapshot, load_counts, load_counts_table, read_snapshot, save_cnstat, save_counts, save_counts_table, \
+    write_snapshot
+
+QueueStats = namedtuple("QueueStats", "queueindex, queuetype, totalpacket, totalbytes, droppacket, dropbytes")
+
+BENCHMARK_PORT_COUNT = 512
+BENCHMARK_QUEUE_COUNT = 8
+
+
+def make_cnstat(port_count, queue_count):
+    cnstat_dict = OrderedDict()
+    cnstat_dict['time'] = datetime.datetime(2020, 3, 4, 5, 6, 7, 891011)
+    for port in range(port_count):
+        for queue in range(queue_count):
+            i = port * queue_count + queue
+            cnstat_dict["Ethernet{}:{}".format(port * 4, queue)] = \
+                QueueStats(str(queue), 'UC', str(i), str(i * 1000), 'N/A', str(2 ** 63 - 1 - i))
+    return cnstat_dict
+
+
+class TestSnapshotFile(object):
+    def setup_method(self, method):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "snapshot")
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.dir)
+
+    def test_snapshot_round_trip(self):
+        snapshot = CounterSnapshot(["Ethernet0", "Ethernet4"], ["oid:0x1", "oid:0x2"],
+                                   ["SAI_PORT_STAT_IF_IN_ERRORS", "SAI_PORT_STAT_IF_IN_DISCARDS"],
+                                   datetime.datetime(2020, 1, 2, 3, 4, 5, 6))
+        snapshot.columns["SAI_PORT_STAT_IF_IN_ERRORS"][0] = 2 ** 63 - 1
+        snapshot.columns["SAI_PORT_STAT_IF_IN_DISCARDS"][1] = 7
+        write_snapshot(self.path, snapshot)
+
+        assert os.listdir(self.dir) == ["snapshot"]
+        assert is_snapshot_file(self.path)
+        loaded = read_snapshot(self.path)
+        assert loaded.time == snapshot.time
+        assert loaded.names == snapshot.names
+        assert loaded.oids == snapshot.oids
+        assert loaded.counter_names == snapshot.counter_names
+        assert list(loaded.column("SAI_PORT_STAT_IF_IN_ERRORS")) == [2 ** 63 - 1, COUNTER_NA]
+        assert loaded.get("Ethernet4", "SAI_PORT_STAT_IF_IN_DISCARDS") == 7
+        assert loaded.get("Ethernet0", "SAI_PORT_STAT_IF_IN_DISCARDS") is None
+
+    def test_snapshot_groups(self):
+        snapshot = CounterSnapshot(["Ethernet0:0", "Ethernet0:1", "Ethernet4:0"], ["oid:0x1", "oid:0x2", "oid:0x3"],
+                                   ["totalpacket", "droppacket"])
+        snapshot.columns["totalpacket"][1] = 5
+        snapshot.columns["droppacket"][2] = 9
+        write_snapshot(self.path, snapshot, OrderedDict([("Ethernet0", (0, 2)), ("Ethernet4", (2, 1))]))
+
+        with SnapshotFile(self.path) as snapshot_file:
+            assert list(snapshot_file.groups) == ["Ethernet0", "Ethernet4"]
+            assert snapshot_file.read_group("Ethernet8") is None
+            assert len(snapshot_file.read()) == 3
+        loaded = read_snapshot(self.path, "Ethernet4")
+        assert loaded.names == ["Ethernet4:0"]
+        assert loaded.oids == ["oid:0x3"]
+        assert list(loaded.column("totalpacket")) == [COUNTER_NA]
+        assert list(loaded.column("droppacket")) == [9]
+        loaded = read_snapshot(self.path, "Ethernet0")
+        assert loaded.get("Ethernet0:1", "totalpacket") == 5
+
+    def test_invalid_snapshot(self):
+        with open(self.path, 'w') as f:
+            f.write("CNSS")
+        try:
+            read_snapshot(self.path)
+        except SnapshotFormatError:
+            pass
+        else:
+            assert False
+
+    def test_cnstat_round_trip(self):
+        cnstat_dict = make_cnstat(2, 2)
+        save_cnstat(self.path, cnstat_dict, QueueStats, ['totalpacket', 'totalbytes', 'droppacket', 'dropbytes'])
+        loaded = load_cnstat(self.path, QueueStats)
+        assert list(loaded.keys()) == list(cnstat_dict.keys())
+        assert loaded['time'] == cnstat_dict['time']
+        assert loaded['Ethernet4:1'] == QueueStats(None, None, '3', '3000', 'N/A', str(2 ** 63 - 4))
+
+    def test_cnstat_snapshot(self):
+        cnstat_dict = make_cnstat(2, 2)
+        save_cnstat(self.path, cnstat_dict, QueueStats, ['totalpacket', 'droppacket', 'dropbytes'])
+        snapshot = load_cnstat_snapshot(self.path, QueueStats)
+        assert snapshot.time == cnstat_dict['time']
+        assert snapshot.names == list(cnstat_dict.keys())[1:]
+        assert list(snapshot.column('totalpacket')) == [0, 1, 2, 3]
+        assert list(snapshot.column('droppacket')) == [COUNTER_NA] * 4
+        assert snapshot.get('Ethernet4:1', 'dropbytes') == 2 ** 63 - 4
+
+    def test_legacy_pickle(self):
+        cnstat_dict = make_cnstat(1, 2)
+        pickle.dump(cnstat_dict, open(self.path, 'w'))
+        assert not is_snapshot_file(self.path)
+        assert load_cnstat(self.path, QueueStats) == cnstat_dict
+        snapshot = load_cnstat_snapshot(self.path, QueueStats)
+        assert snapshot.time == cnstat_dict['time']
+        assert snapshot.get('Ethernet0:1', 'totalbytes') == 1000
+
+        counts_table = OrderedDict([("Ethernet0", {"SAI_PORT_STAT_IF_IN_ERRORS": 3})])
+        pickle.dump(counts_table, open(self.path, 'w'))
+        assert load_counts_table(self.path) == counts_table
+
+    def test_counts(self):
+        counts_table = OrderedDict([("Ethernet0", {"SAI_PORT_STAT_IF_IN_ERRORS": 3}),
+                                    ("Ethernet4", {"SAI_PORT_STAT_IF_IN_ERRORS": 0,
+                                                   "SAI_PORT_STAT_IN_DROP_REASON_RANGE_BASE": 5})])
+        save_counts_table(self.path, counts_table)
+        assert load_counts_table(self.path) == counts_table
+
+        # Counters beyond int64 saturate
+        save_counts_table(self.path, OrderedDict([("Ethernet0", {"SAI_PORT_STAT_IF_IN_ERRORS": 2 ** 64 - 1})]))
+        assert load_counts_table(self.path) == {"Ethernet0": {"SAI_PORT_STAT_IF_IN_ERRORS": 2 ** 63 - 1}}
+
+        save_counts(self.path, "oid:0x21000000000000", {"SAI_SWITCH_STAT_IN_DROP_REASON_RANGE_BASE": 1})
+        assert load_counts(self.path) == {"SAI_SWITCH_STAT_IN_DROP_REASON_RANGE_BASE": 1}
+
+    @benchmark
+    def test_benchmark_512_ports_8_queues(self):
+        cnstat_dict = make_cnstat(BENCHMARK_PORT_COUNT, BENCHMARK_QUEUE_COUNT)
+        fields = ['totalpacket', 'totalbytes', 'droppacket', 'dropbytes']
+        pickle_path = self.path + ".pickle"
+
+        start = time.time()
+        pickle.dump(cnstat_dict, open(pickle_path, 'w'))
+        pickle_save_time = time.time() - start
+        start = time.time()
+        pickle.load(open(pickle_path, 'r'))
+        pickle_load_time = time.time() - start
+
+        start = time.time()
+        save_cnstat(self.path, cnstat_dict, QueueStats, fields)
+        snapshot_save_time = time.time() - start
+        start = time.time()
+        snapshot = read_snapshot(self.path)
+        snapshot_load_time = time.time() - start
+
+        print("{} queues: pickle save {:.4f}s load {:.4f}s ({} bytes), "
+              "snapshot save {:.4f}s load {:.4f}s ({} bytes)".format(
+                  len(snapshot), pickle_save_time, pickle_load_time, os.path.getsize(pickle_path),
+                  snapshot_save_time, snapshot_load_time, os.path.getsize(self.path)))
+
+        assert len(snapshot) == BENCHMARK_PORT_COUNT * BENCHMARK_QUEUE_COUNT
+        assert snapshot.get("Ethernet2044:7", "totalpacket") == len(snapshot) - 1
+        assert snapshot.get("Ethernet2044:7", "droppacket") is None
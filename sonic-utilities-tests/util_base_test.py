@@ -0,0 +1,141 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+from unittest import TestCase
+
+import mock
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+import mock_tables.dbconnector
+
+from utilities_common.util_base import MetadataCache, UtilHelper
+
+
+class TestMetadataCache(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.dir, 'metadata.json')
+        self.cache = MetadataCache(self.cache_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_cached_until_generation_changes(self):
+        compute = mock.Mock(return_value='frr')
+        with mock.patch.object(MetadataCache, 'get_generation', return_value='boot1-md1'):
+            self.assertEqual(self.cache.get('routing_stack', compute), 'frr')
+            self.assertEqual(MetadataCache(self.cache_file).get('routing_stack', compute), 'frr')
+            self.assertEqual(compute.call_count, 1)
+
+        with mock.patch.object(MetadataCache, 'get_generation', return_value='boot2-md1'):
+            self.assertEqual(self.cache.get('routing_stack', compute), 'frr')
+            self.assertEqual(compute.call_count, 2)
+
+    def test_empty_values_not_cached(self):
+        compute = mock.Mock(return_value=('x86_64-sonic-r0', ''))
+        with mock.patch.object(MetadataCache, 'get_generation', return_value='boot1-md1'):
+            self.cache.get('platform_and_hwsku', compute)
+            self.cache.get('platform_and_hwsku', compute)
+            self.assertEqual(compute.call_count, 2)
+            self.assertFalse(os.path.exists(self.cache_file))
+
+    def test_no_generation_disables_cache(self):
+        compute = mock.Mock(return_value='quagga')
+        with mock.patch.object(MetadataCache, 'get_generation', return_value=None):
+            self.cache.get('routing_stack', compute)
+            self.cache.get('routing_stack', compute)
+            self.assertEqual(compute.call_count, 2)
+
+    def test_util_helper_platform_and_hwsku(self):
+        helper = UtilHelper(self.cache)
+        with mock.patch.object(MetadataCache, 'get_generation', return_value='boot1-md1'), \
+                mock.patch.object(UtilHelper, 'read_platform_and_hwsku',
+                                  return_value=('x86_64-sonic-r0', 'Force10-S6000')) as read:
+            self.assertEqual(helper.get_platform_and_hwsku(), ('x86_64-sonic-r0', 'Force10-S6000'))
+            self.assertEqual(UtilHelper(self.cache).get_platform_and_hwsku(), ('x86_64-sonic-r0', 'Force10-S6000'))
+            self.assertEqual(read.call_count, 1)
+
+    def test_untrusted_cache_ignored(self):
+        compute = mock.Mock(return_value='frr')
+        with open(self.cache_file, 'w') as f:
+            json.dump({'generation': 'boot1-md1', 'entries': {'routing_stack': 'quagga'}}, f)
+
+        with mock.patch.object(MetadataCache, 'get_generation', return_value='boot1-md1'):
+            # Writable by others
+            os.chmod(self.cache_file, 0o666)
+            self.assertEqual(self.cache.get('routing_stack', compute), 'frr')
+            self.assertEqual(compute.call_count, 1)
+
+            # Owned by somebody else
+            os.chmod(self.cache_file, 0o644)
+            with mock.patch('os.getuid', return_value=os.getuid() + 1), \
+                    mock.patch('os.fstat', return_value=mock.Mock(st_uid=os.getuid() + 2, st_mode=0o100644)):
+                self.assertEqual(self.cache.load('boot1-md1'), {})
+
+            # A link is never followed
+            os.rename(self.cache_file, self.cache_file + '.target')
+            os.symlink(self.cache_file + '.target', self.cache_file)
+            self.assertEqual(self.cache.load('boot1-md1'), {})
+
+    def test_cache_readable_by_all(self):
+        with mock.patch.object(MetadataCache, 'get_generation', return_value='boot1-md1'):
+            self.cache.get('routing_stack', mock.Mock(return_value='frr'))
+            self.assertEqual(os.stat(self.cache_file).st_mode & 0o777, 0o644)
+
+            # Another user reads the cache written by root, but does not
+            # write to the cache directory of root
+            compute = mock.Mock(return_value='quagga')
+            with mock.patch('os.fstat', return_value=mock.Mock(st_uid=0, st_mode=0o100644)), \
+                    mock.patch('os.getuid', return_value=os.getuid() + 1):
+                self.assertEqual(self.cache.get('routing_stack', compute), 'frr')
+                self.assertEqual(self.cache.get('platform_and_hwsku', mock.Mock(return_value=('x86', 'S6000'))),
+                                 ('x86', 'S6000'))
+            self.assertFalse(compute.called)
+            self.assertEqual(self.cache.load('boot1-md1'), {'routing_stack': 'frr'})
+
+    def test_generation(self):
+        boot_id = os.path.join(self.dir, 'boot_id')
+        config_db = os.path.join(self.dir, 'config_db.json')
+        with open(boot_id, 'w') as f:
+            f.write('f5b4a0e2-boot1\n')
+        with mock.patch('utilities_common.util_base.BOOT_ID_PATH', boot_id), \
+                mock.patch('utilities_common.util_base.CONFIG_DB_FILE_PATH', config_db):
+            self.assertIsNone(self.cache.get_generation())
+
+            open(config_db, 'w').close()
+            os.utime(config_db, (1000, 1000))
+            generation = self.cache.get_generation()
+            self.assertTrue(generation.startswith('f5b4a0e2-boot1-'))
+
+            os.utime(config_db, (2000, 2000))
+            self.assertNotEqual(self.cache.get_generation(), generation)
+
+    def test_shared_cache_dir_not_written(self):
+        os.chmod(self.dir, 0o777)
+        with mock.patch.object(MetadataCache, 'get_generation', return_value='boot1-md1'):
+            self.cache.get('routing_stack', mock.Mock(return_value='frr'))
+        self.assertEqual(os.listdir(self.dir), [])
+
+
+class TestUtilHelper(TestCase):
+    def mock_docker_ps(self, returncode, stdout, stderr=''):
+        proc = mock.Mock(returncode=returncode)
+        proc.communicate.return_value = (stdout, stderr)
+        return mock.patch('subprocess.Popen', return_value=proc)
+
+    def test_read_routing_stack(self):
+        stdout = ("CONTAINER ID   IMAGE                    COMMAND\n"
+                  "0a1b2c3d4e5f   docker-fpm-frr:latest    \"/usr/bin/docker_init.sh\"   bgp\n"
+                  "1a1b2c3d4e5f   docker-lldp-sv2:latest   \"/usr/bin/docker-lldp-i\"   lldp\n")
+        with self.mock_docker_ps(0, stdout):
+            self.assertEqual(UtilHelper(mock.Mock()).read_routing_stack(), 'frr')
+
+    def test_read_routing_stack_failure(self):
+        with self.mock_docker_ps(1, '', 'Cannot connect to the Docker daemon at unix:///var/run/docker.sock\n'):
+            self.assertEqual(UtilHelper(mock.Mock()).read_routing_stack(), '')
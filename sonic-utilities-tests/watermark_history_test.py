@@ -0,0 +1,120 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+from helpers import benchmark
+from utilities_common.watermark_history import HISTORY_NA, HistoryFormatError, WatermarkHistory, \
+    create_history, open_history, percentile, summarize
+
+BENCHMARK_ROW_COUNT = 512 * 8
+BENCHMARK_SAMPLE_COUNT = 720
+
+
+class TestWatermarkHistory(object):
+    def setup_method(self, method):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "q_shared_uni")
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.dir)
+
+    def test_ring_buffer(self):
+        history = open_history(self.path, ["Ethernet0", "Ethernet0"], ["UC0", "UC1"], 3)
+        for i in range(5):
+            history.append(1000 + i, [i * 10, None if i == 3 else i])
+        history.close()
+        assert os.listdir(self.dir) == ["q_shared_uni"]
+
+        with WatermarkHistory(self.path) as history:
+            assert history.written == 5
+            sample_times, rows = history.read()
+            assert list(sample_times) == [1002, 1003, 1004]
+            assert list(rows[0]) == [20, 30, 40]
+            assert list(rows[1]) == [2, HISTORY_NA, 4]
+
+            sample_times, rows = history.read(since=1004)
+            assert list(sample_times) == [1004]
+            assert list(rows[0]) == [40]
+            sample_times, rows = history.read(since=2000)
+            assert list(sample_times) == [] and list(rows[1]) == []
+
+    def test_reopen(self):
+        history = open_history(self.path, ["pool0"], [""], 4)
+        history.append(1000, [2 ** 40])
+        history.close()
+
+        # Recording resumes in the same history
+        history = open_history(self.path, ["pool0"], [""], 4)
+        history.append(1001, [-1])
+        history.close()
+        with WatermarkHistory(self.path) as history:
+            sample_times, rows = history.read()
+            assert list(rows[0]) == [HISTORY_NA - 1, HISTORY_NA]
+
+        # Other rows start a new history
+        history = open_history(self.path, ["pool0", "pool1"], ["", ""], 4)
+        assert history.written == 0
+        history.close()
+
+    def test_invalid_history(self):
+        with open(self.path, 'w') as f:
+            f.write("WMRB")
+        try:
+            WatermarkHistory(self.path)
+        except HistoryFormatError:
+            pass
+        else:
+            assert False
+
+    def test_link_not_followed(self):
+        target = os.path.join(self.dir, "target")
+        with open(target, 'w') as f:
+            f.write("target")
+        os.symlink(target, self.path)
+
+        # The link is replaced by a new history, the target is left as is
+        history = open_history(self.path, ["pool0"], [""], 4)
+        history.close()
+        assert not os.path.islink(self.path)
+        with open(target) as f:
+            assert f.read() == "target"
+
+    def test_summarize(self):
+        assert percentile(range(1, 101), 99) == 99
+        assert percentile(range(1, 11), 99) == 10
+        assert percentile([], 99) is None
+        assert summarize([10, 20, 30, 40], [5, 9, HISTORY_NA, 9]) == (9, 9, 20)
+        assert summarize([10], [HISTORY_NA]) == (None, None, None)
+
+    @benchmark
+    def test_benchmark_4096_rows_720_samples(self):
+        names = ["Ethernet{}".format(i // 8 * 4) for i in range(BENCHMARK_ROW_COUNT)]
+        labels = ["UC{}".format(i % 8) for i in range(BENCHMARK_ROW_COUNT)]
+        create_history(self.path, names, labels, BENCHMARK_SAMPLE_COUNT)
+
+        values = range(BENCHMARK_ROW_COUNT)
+        with WatermarkHistory(self.path, writable=True) as history:
+            start = time.time()
+            for i in range(BENCHMARK_SAMPLE_COUNT + 10):
+                history.append(1000 + i, values)
+            append_time = (time.time() - start) / (BENCHMARK_SAMPLE_COUNT + 10)
+
+        start = time.time()
+        with WatermarkHistory(self.path) as history:
+            sample_times, rows = history.read()
+            summaries = [summarize(sample_times, series) for series in rows]
+        report_time = time.time() - start
+
+        print("{} rows x {} samples: append {:.4f}s, report {:.3f}s ({} bytes)".format(
+              BENCHMARK_ROW_COUNT, BENCHMARK_SAMPLE_COUNT, append_time, report_time,
+              os.path.getsize(self.path)))
+
+        assert summaries[7] == (7, 7, 1010)
+        assert len(sample_times) == BENCHMARK_SAMPLE_COUNT
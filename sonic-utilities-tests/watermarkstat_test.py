@@ -0,0 +1,238 @@
+import imp
+import os
+import shutil
+import sys
+import tempfile
+
+import mock
+import swsssdk
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+scripts_path = os.path.join(modules_path, "scripts")
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+import mock_tables.dbconnector
+from helpers import benchmark, count_round_trips, timed
+
+watermarkstat = imp.load_source('watermarkstat', os.path.join(scripts_path, 'watermarkstat'))
+
+BENCHMARK_PORT_COUNT = 512
+
+PG_WATERMARK = "SAI_INGRESS_PRIORITY_GROUP_STAT_SHARED_WATERMARK_BYTES"
+QUEUE_WATERMARK = "SAI_QUEUE_STAT_SHARED_WATERMARK_BYTES"
+BUFFER_POOL_WATERMARK = "SAI_BUFFER_POOL_STAT_WATERMARK_BYTES"
+
+
+def make_counters_db(port_count):
+    """
+        Build a COUNTERS_DB with port_count ports of 8 unicast queues,
+        8 multicast queues and 8 PGs each, and their user watermarks.
+    """
+    db = swsssdk.SonicV2Connector(host='127.0.0.1')
+    db.connect(db.COUNTERS_DB)
+    client = db.get_redis_client(db.COUNTERS_DB)
+    client.delete(watermarkstat.COUNTERS_PORT_NAME_MAP)
+
+    pipe = client.pipeline(transaction=False)
+    for port_index in range(port_count):
+        port = "Ethernet{}".format(port_index * 4)
+        port_oid = "oid:0x1{:015x}".format(port_index)
+        pipe.hset(watermarkstat.COUNTERS_PORT_NAME_MAP, port, port_oid)
+        for index in range(16):
+            oid = "oid:0x15{:014x}".format(port_index * 16 + index)
+            pipe.hset(watermarkstat.COUNTERS_QUEUE_NAME_MAP, "{}:{}".format(port, index), oid)
+            pipe.hset(watermarkstat.COUNTERS_QUEUE_PORT_MAP, oid, port_oid)
+            pipe.hset(watermarkstat.COUNTERS_QUEUE_INDEX_MAP, oid, str(index))
+            pipe.hset(watermarkstat.COUNTERS_QUEUE_TYPE_MAP, oid,
+                      watermarkstat.SAI_QUEUE_TYPE_UNICAST if index < 8 else
+                      watermarkstat.SAI_QUEUE_TYPE_MULTICAST)
+            # The last multicast queue has no watermark yet
+            if index != 15:
+                pipe.hset(watermarkstat.USER_TABLE_PREFIX + oid, QUEUE_WATERMARK, str(port_index * 100 + index))
+        for index in range(8):
+            oid = "oid:0x1a{:014x}".format(port_index * 8 + index)
+            pipe.hset(watermarkstat.COUNTERS_PG_NAME_MAP, "{}:{}".format(port, index), oid)
+            pipe.hset(watermarkstat.COUNTERS_PG_PORT_MAP, oid, port_oid)
+            pipe.hset(watermarkstat.COUNTERS_PG_INDEX_MAP, oid, str(index))
+            pipe.hset(watermarkstat.USER_TABLE_PREFIX + oid, PG_WATERMARK, str(port_index * 10 + index))
+    for index in range(2):
+        oid = "oid:0x18{:014x}".format(index)
+        pipe.hset(watermarkstat.COUNTERS_BUFFER_POOL_NAME_MAP, "pool{}".format(index), oid)
+        pipe.hset(watermarkstat.USER_TABLE_PREFIX + oid, BUFFER_POOL_WATERMARK, str(1000 + index))
+    pipe.execute()
+
+    # Keep using the populated connection
+    db.connect = lambda *args, **kwargs: None
+    return db
+
+
+def get_rows_per_object(db, table_prefix, key):
+    """
+        Reference implementation issuing one GET per map entry and per
+        watermark of every object.
+    """
+    wm_name = {"pg_shared": PG_WATERMARK, "q_shared_uni": QUEUE_WATERMARK,
+               "q_shared_multi": QUEUE_WATERMARK}[key]
+    port_name_map = db.get_all(db.COUNTERS_DB, watermarkstat.COUNTERS_PORT_NAME_MAP)
+    port_oids = {oid: port for port, oid in port_name_map.items()}
+    port_objs = {port: {} for port in port_name_map}
+    if key == "pg_shared":
+        for pg, oid in db.get_all(db.COUNTERS_DB, watermarkstat.COUNTERS_PG_NAME_MAP).items():
+            port_objs[port_oids[db.get(db.COUNTERS_DB, watermarkstat.COUNTERS_PG_PORT_MAP, oid)]][pg] = oid
+        index_map = watermarkstat.COUNTERS_PG_INDEX_MAP
+    else:
+        queue_type = watermarkstat.SAI_QUEUE_TYPE_UNICAST if key == "q_shared_uni" else \
+            watermarkstat.SAI_QUEUE_TYPE_MULTICAST
+        for queue, oid in db.get_all(db.COUNTERS_DB, watermarkstat.COUNTERS_QUEUE_NAME_MAP).items():
+            port = port_oids[db.get(db.COUNTERS_DB, watermarkstat.COUNTERS_QUEUE_PORT_MAP, oid)]
+            if db.get(db.COUNTERS_DB, watermarkstat.COUNTERS_QUEUE_TYPE_MAP, oid) == queue_type:
+                port_objs[port][queue] = oid
+        index_map = watermarkstat.COUNTERS_QUEUE_INDEX_MAP
+
+    rows = []
+    for port in watermarkstat.natsorted(port_objs):
+        fields = ["0"] * 8
+        for oid in port_objs[port].values():
+            pos = int(db.get(db.COUNTERS_DB, index_map, oid)) % 8
+            data = db.get(db.COUNTERS_DB, table_prefix + oid, wm_name)
+            fields[pos] = watermarkstat.STATUS_NA if data is None else str(int(data))
+        rows.append((port,) + tuple(fields))
+    return rows
+
+
+def new_watermarkstat(db):
+    with mock.patch.object(watermarkstat.swsssdk, 'SonicV2Connector', return_value=db):
+        return watermarkstat.Watermarkstat()
+
+
+def get_rows(stat, table_prefix, key):
+    type = stat.watermark_types[key]
+    snapshot = stat.get_snapshot(table_prefix, key)
+    return [(port,) + stat.get_counters(snapshot, type["obj_map"][port], type["wm_name"])
+            for port in watermarkstat.natsorted(stat.counter_port_name_map)]
+
+
+class TestWatermarkstat(object):
+    def test_port_maps(self):
+        stat = new_watermarkstat(make_counters_db(2))
+        assert stat.port_uc_queues_map['Ethernet4'] == \
+            ["oid:0x15{:014x}".format(16 + index) for index in range(8)]
+        assert stat.port_mc_queues_map['Ethernet4'] == \
+            ["oid:0x15{:014x}".format(16 + index) for index in range(8, 16)]
+        assert stat.port_pg_map['Ethernet0'] == ["oid:0x1a{:014x}".format(index) for index in range(8)]
+
+    def test_rows(self):
+        db = make_counters_db(3)
+        stat = new_watermarkstat(db)
+        for key in ("pg_shared", "q_shared_uni", "q_shared_multi"):
+            assert get_rows(stat, watermarkstat.USER_TABLE_PREFIX, key) == \
+                get_rows_per_object(db, watermarkstat.USER_TABLE_PREFIX, key)
+        assert get_rows(stat, watermarkstat.USER_TABLE_PREFIX, "q_shared_multi")[2] == \
+            ('Ethernet8', '208', '209', '210', '211', '212', '213', '214', 'N/A')
+        assert get_rows(stat, watermarkstat.PERSISTENT_TABLE_PREFIX, "pg_shared")[0] == \
+            ('Ethernet0',) + ('N/A',) * 8
+
+    def test_print_buffer_pool(self, capsys):
+        stat = new_watermarkstat(make_counters_db(1))
+        stat.print_all_stat(watermarkstat.USER_TABLE_PREFIX, 'buffer_pool')
+        out, err = capsys.readouterr()
+        lines = out.splitlines()
+        assert lines[0] == "Shared pool maximum occupancy:"
+        assert lines[3].split() == ['pool0', '1000']
+        assert lines[4].split() == ['pool1', '1001']
+
+    def test_record_and_report(self, capsys):
+        db = make_counters_db(2)
+        client = db.get_redis_client(db.COUNTERS_DB)
+        stat = new_watermarkstat(db)
+        names, labels, oids = stat.get_objects('pg_shared')
+        assert names[:2] == ['Ethernet0', 'Ethernet0'] and labels[:2] == ['PG0', 'PG1']
+
+        history_dir = tempfile.mkdtemp()
+        path = os.path.join(history_dir, 'pg_shared')
+        try:
+            # Only Ethernet4 PG3 has a periodic watermark
+            for i, value in enumerate((7, 500, 20)):
+                client.hset(watermarkstat.PERIODIC_TABLE_PREFIX + oids[11], PG_WATERMARK, str(value))
+                with mock.patch.object(watermarkstat.time, 'time', return_value=1500000000 + i * 100):
+                    stat.record('pg_shared', path, 0, 4, count=1)
+
+            with mock.patch.object(watermarkstat.time, 'time', return_value=1500000600):
+                watermarkstat.print_history_report('pg_shared', path)
+                out, err = capsys.readouterr()
+                lines = out.splitlines()
+                assert lines[0] == "Watermark history of pg_shared: 3 sample(s)"
+                assert lines[1].split() == ['Port', 'PG', 'Max/bytes', 'P99/bytes', 'Peak', 'time']
+                assert lines[3].split() == ['Ethernet0', 'PG0', 'N/A', 'N/A', 'N/A']
+                assert lines[14].split()[:4] == ['Ethernet4', 'PG3', '500', '500']
+
+                # The peak is older than the window
+                watermarkstat.print_history_report('pg_shared', path, window=450)
+                out, err = capsys.readouterr()
+                assert out.splitlines()[14].split()[:4] == ['Ethernet4', 'PG3', '20', '20']
+        finally:
+            shutil.rmtree(history_dir)
+
+    def test_record_interrupted(self, capsys):
+        db = make_counters_db(2)
+        stat = new_watermarkstat(db)
+        history_dir = tempfile.mkdtemp()
+        path = os.path.join(history_dir, 'pg_shared')
+        try:
+            # Ctrl-C while waiting for the next sample stops the recording
+            with mock.patch.object(watermarkstat.time, 'sleep', side_effect=KeyboardInterrupt):
+                stat.record('pg_shared', path, 10, 4)
+            watermarkstat.print_history_report('pg_shared', path)
+            assert capsys.readouterr()[0].splitlines()[0] == "Watermark history of pg_shared: 1 sample(s)"
+        finally:
+            shutil.rmtree(history_dir)
+
+    def test_untrusted_history_dir(self, capsys):
+        history_dir = tempfile.mkdtemp()
+        writable_dir = os.path.join(history_dir, 'writable')
+        os.mkdir(writable_dir)
+        os.chmod(writable_dir, 0o777)
+        link = os.path.join(history_dir, 'link')
+        os.symlink(writable_dir, link)
+        try:
+            for path in (writable_dir, link):
+                for option in ('--report', '--record'):
+                    with mock.patch.object(watermarkstat, 'HISTORY_DIR', path):
+                        try:
+                            watermarkstat.main(['-t', 'pg_shared', option])
+                        except SystemExit as e:
+                            assert e.code == 1
+                        else:
+                            assert False
+                    assert "Untrusted watermark history directory" in capsys.readouterr()[1]
+            assert os.listdir(writable_dir) == []
+        finally:
+            shutil.rmtree(history_dir)
+
+    def test_rows_batched(self):
+        db = make_counters_db(64)
+        table_prefix = watermarkstat.USER_TABLE_PREFIX
+        expected = get_rows_per_object(db, table_prefix, "q_shared_uni")
+        rows, round_trips = count_round_trips(
+            db, db.COUNTERS_DB, lambda: get_rows(new_watermarkstat(db), table_prefix, "q_shared_uni"))
+        assert rows == expected
+        assert round_trips < 20
+
+    @benchmark
+    def test_benchmark_512_ports(self):
+        db = make_counters_db(BENCHMARK_PORT_COUNT)
+        table_prefix = watermarkstat.USER_TABLE_PREFIX
+        (expected, per_object_round_trips), per_object_time = timed(lambda: count_round_trips(
+            db, db.COUNTERS_DB, lambda: get_rows_per_object(db, table_prefix, "q_shared_uni")))
+        (rows, batch_round_trips), batch_time = timed(lambda: count_round_trips(
+            db, db.COUNTERS_DB, lambda: get_rows(new_watermarkstat(db), table_prefix, "q_shared_uni")))
+
+        print("watermarkstat {} ports: per-object {:.3f}s {} round trips, "
+              "batched {:.3f}s {} round trips".format(
+                  BENCHMARK_PORT_COUNT, per_object_time, per_object_round_trips,
+                  batch_time, batch_round_trips))
+
+        assert batch_round_trips < 20
+        assert rows == expected
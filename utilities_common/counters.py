@@ -0,0 +1,187 @@
+# COUNTERS_DB snapshot utility functions #
+
+import datetime
+from array import array
+from collections import OrderedDict
+
+import swsssdk
+from natsort import natsorted
+
+COUNTER_TABLE_PREFIX = "COUNTERS:"
+
+# Name maps of the object classes exported to COUNTERS_DB
+COUNTERS_PORT_NAME_MAP = "COUNTERS_PORT_NAME_MAP"
+COUNTERS_RIF_NAME_MAP = "COUNTERS_RIF_NAME_MAP"
+COUNTERS_QUEUE_NAME_MAP = "COUNTERS_QUEUE_NAME_MAP"
+COUNTERS_PG_NAME_MAP = "COUNTERS_PG_NAME_MAP"
+COUNTERS_BUFFER_POOL_NAME_MAP = "COUNTERS_BUFFER_POOL_NAME_MAP"
+COUNTERS_DEBUG_NAME_PORT_STAT_MAP = "COUNTERS_DEBUG_NAME_PORT_STAT_MAP"
+COUNTERS_DEBUG_NAME_SWITCH_STAT_MAP = "COUNTERS_DEBUG_NAME_SWITCH_STAT_MAP"
+
+# Value stored in a snapshot for a counter that is not available
+COUNTER_NA = -1
+
+# Largest value stored in a snapshot. Counters are stored as int64, not
+# uint64, as the diffs and rates computed from them are signed; a counter
+# beyond this value saturates at it
+COUNTER_MAX = 2 ** 63 - 1
+
+# Maximum number of commands sent in a single pipeline
+BULK_CHUNK_SIZE = 1024
+
+# Python 2 has no 'q' typecode; 'l' is 64 bits wide on LP64 platforms
+if array('l').itemsize >= 8:
+    COUNTER_TYPECODE = 'l'
+elif 'q' in getattr(array, 'typecodes', ''):
+    COUNTER_TYPECODE = 'q'
+else:
+    COUNTER_TYPECODE = None
+
+
+def new_column(size, value=COUNTER_NA):
+    """
+        Allocate a counter column of the given size.
+    """
+    if COUNTER_TYPECODE is None:
+        return [value] * size
+    return array(COUNTER_TYPECODE, [value]) * size
+
+
+def counter_value(data):
+    """
+        Convert a raw COUNTERS_DB value to an int, COUNTER_NA if unavailable,
+        saturated to the int64 range of the snapshot columns.
+    """
+    if data is None:
+        return COUNTER_NA
+    try:
+        value = int(data)
+    except ValueError:
+        return COUNTER_NA
+    return max(min(value, COUNTER_MAX), -COUNTER_MAX - 1)
+
+
+def _bulk_execute(db, db_name, keys, queue_command):
+    """
+        Queue one command per key on a pipeline and execute it, in chunks
+        of BULK_CHUNK_SIZE commands. Returns the replies in the order of keys.
+    """
+    client = db.get_redis_client(db_name)
+    replies = []
+    for start in range(0, len(keys), BULK_CHUNK_SIZE):
+        pipe = client.pipeline(transaction=False)
+        for key in keys[start:start + BULK_CHUNK_SIZE]:
+            queue_command(pipe, key)
+        replies.extend(pipe.execute())
+    return replies
+
+
+def bulk_hgetall(db, db_name, keys):
+    """
+        Fetch every hash in keys with pipelined HGETALL.
+        Missing hashes are returned as empty dicts.
+    """
+    return [entry or {} for entry in
+            _bulk_execute(db, db_name, keys, lambda pipe, key: pipe.hgetall(key))]
+
+
+def bulk_hmget(db, db_name, keys, fields):
+    """
+        Fetch the given fields of every hash in keys with pipelined HMGET.
+        Each reply is a list of values in the order of fields, None if missing.
+    """
+    fields = list(fields)
+    if not fields:
+        return [[] for key in keys]
+    return _bulk_execute(db, db_name, keys, lambda pipe, key: pipe.hmget(key, fields))
+
+
+class CounterSnapshot(object):
+    """
+        Columnar snapshot of the counters of one class of objects.
+
+        Rows are indexed by object name (and OID); every counter is a
+        column holding one int64 per object, COUNTER_NA when absent.
+    """
+
+    def __init__(self, names, oids, counter_names, time=None):
+        self.time = time if time is not None else datetime.datetime.now()
+        self.names = list(names)
+        self.oids = list(oids)
+        self.index = {name: row for row, name in enumerate(self.names)}
+        self.counter_names = list(counter_names)
+        self.columns = OrderedDict((counter_name, new_column(len(self.names)))
+                                   for counter_name in self.counter_names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def column(self, counter_name):
+        return self.columns[counter_name]
+
+    def get(self, name, counter_name):
+        """
+            Get a single counter of an object, None if it is not available.
+        """
+        value = self.columns[counter_name][self.index[name]]
+        return None if value == COUNTER_NA else value
+
+    def row(self, name):
+        """
+            Get all the counters of an object as a dictionary.
+        """
+        return OrderedDict((counter_name, self.get(name, counter_name))
+                           for counter_name in self.counter_names)
+
+
+class CountersDB(object):
+    """
+        Reader for COUNTERS_DB which loads the name maps once and fetches
+        the counters of a whole class of objects in pipelined batches.
+    """
+
+    def __init__(self, db=None):
+        if db is None:
+            db = swsssdk.SonicV2Connector(host='127.0.0.1')
+            db.connect(db.COUNTERS_DB)
+        self.db = db
+        self.name_maps = {}
+
+    def get_name_map(self, map_name):
+        """
+            Get a COUNTERS_*_NAME_MAP (or any other COUNTERS_DB map) hash,
+            reading it from the database only once.
+        """
+        if map_name not in self.name_maps:
+            self.name_maps[map_name] = self.db.get_all(self.db.COUNTERS_DB, map_name) or {}
+        return self.name_maps[map_name]
+
+    def snapshot_objects(self, names, oids, counter_names, table_prefix=COUNTER_TABLE_PREFIX):
+        """
+            Fetch the given counters of the given objects into a snapshot.
+        """
+        counter_names = list(counter_names)
+        snapshot = CounterSnapshot(names, oids, counter_names)
+        keys = [table_prefix + oid for oid in snapshot.oids]
+        replies = bulk_hmget(self.db, self.db.COUNTERS_DB, keys, counter_names)
+        columns = [snapshot.columns[counter_name] for counter_name in counter_names]
+        for row, values in enumerate(replies):
+            for column, data in zip(columns, values):
+                column[row] = counter_value(data)
+        return snapshot
+
+    def snapshot(self, map_name, counter_names, names=None, table_prefix=COUNTER_TABLE_PREFIX):
+        """
+            Fetch the given counters of all the objects in a name map, or of
+            the subset given by names, into a snapshot sorted by name.
+        """
+        name_map = self.get_name_map(map_name)
+        if names is None:
+            names = natsorted(name_map)
+        else:
+            names = [name for name in names if name in name_map]
+        return self.snapshot_objects(names, [name_map[name] for name in names],
+                                     counter_names, table_prefix)
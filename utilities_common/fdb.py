@@ -0,0 +1,225 @@
+# FDB index utility functions #
+#
+# The FDB entries of the ASIC_DB, with the interface and the type of each of
+# them, indexed by (VLAN id, MAC address). Building the index takes a walk of
+# all the FDB entries, so it is cached on disk for a few seconds. The cache is
+# written by root and read by all the users. The cached index is used as long
+# as the ASIC_DB has the same number of keys, which a single DBSIZE checks:
+# any FDB entry learnt or removed changes it.
+#
+# The generation does not change when an entry moves to another port or
+# changes type, or when an entry is replaced by another one, so a cached
+# index may be out of date for up to FDB_CACHE_MAX_AGE seconds. So only the
+# neighbor tables use the cache, to find the port of the neighbors on VLAN
+# interfaces; the FDB table itself is always read from the ASIC_DB.
+
+import json
+import os
+import time
+
+from swsssdk import port_util
+
+from utilities_common.counters import bulk_hmget
+from utilities_common.util_base import CACHE_DIR, load_cache_file, save_cache_file
+
+BRIDGE_PORT_PREFIX = "ASIC_STATE:SAI_OBJECT_TYPE_BRIDGE_PORT:"
+VLAN_PREFIX = "ASIC_STATE:SAI_OBJECT_TYPE_VLAN:"
+FDB_ENTRY_PREFIX = "ASIC_STATE:SAI_OBJECT_TYPE_FDB_ENTRY:"
+
+FDB_CACHE_FILE = os.path.join(CACHE_DIR, 'fdb-cache.json')
+FDB_CACHE_MAX_AGE = 5   # seconds
+
+
+class FdbIndex(object):
+    """
+        FDB entries indexed by (VLAN id, MAC address). An index read for a
+        VLAN or a port only holds the entries of this VLAN or port, and is
+        not complete.
+    """
+
+    def __init__(self, entries=(), vlans=(), generation=None, timestamp=None, complete=True, unknown_bvids=()):
+        self.entries = {(vlan_id, mac.upper()): (if_name, fdb_type) for vlan_id, mac, if_name, fdb_type in entries}
+        # VLANs which have FDB entries, whatever their port
+        self.vlans = set(vlans)
+        # VLAN oids of FDB entries which have no VLAN id, in the order of the
+        # entries
+        self.unknown_bvids = list(unknown_bvids)
+        self.generation = generation
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.complete = complete
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, vlan_id, mac):
+        """
+            Get the (interface, type) of the entry of a MAC address in a
+            VLAN, None if there is none.
+        """
+        return self.entries.get((int(vlan_id), mac.upper()))
+
+    def get_entries(self, vlan=None, port=None):
+        """
+            Get the (VLAN id, MAC address, interface, type) of the entries,
+            only those of the given vlan and port if any, sorted on VLAN id
+            and MAC address.
+        """
+        if vlan is not None:
+            vlan = int(vlan)
+        return sorted((vlan_id, mac, if_name, fdb_type)
+                      for (vlan_id, mac), (if_name, fdb_type) in self.entries.iteritems()
+                      if (vlan is None or vlan_id == vlan) and (port is None or if_name == port))
+
+    def to_json(self):
+        return {'generation': self.generation, 'timestamp': self.timestamp, 'vlans': sorted(self.vlans),
+                'unknown_bvids': self.unknown_bvids,
+                'entries': [(vlan_id, mac, if_name, fdb_type)
+                            for (vlan_id, mac), (if_name, fdb_type) in self.entries.iteritems()]}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['entries'], data['vlans'], data['generation'], data['timestamp'],
+                   unknown_bvids=data.get('unknown_bvids', ()))
+
+
+def get_fdb_keys(db):
+    keys = db.keys('ASIC_DB', FDB_ENTRY_PREFIX + "*")
+    return [] if keys is None else keys
+
+
+def get_fdb_generation(db):
+    """
+        Generation of the FDB entries of the ASIC_DB: its number of keys.
+    """
+    return db.get_redis_client(db.ASIC_DB).dbsize()
+
+
+def get_bridge_port_name_map(db, if_oid_map):
+    """
+        Map the bridge port oids to the names of their interfaces, or to the
+        oids of their ports (without "oid:0x") if they have no name.
+    """
+    keys = db.keys('ASIC_DB', BRIDGE_PORT_PREFIX + "*")
+    keys = [] if keys is None else keys
+    oid_pfx = len("oid:0x")
+    if_br_name_map = {}
+    for key, (port_oid,) in zip(keys, bulk_hmget(db, 'ASIC_DB', keys, ["SAI_BRIDGE_PORT_ATTR_PORT_ID"])):
+        if port_oid is None:
+            continue
+        port_id = port_oid[oid_pfx:]
+        if_br_name_map[key[len(BRIDGE_PORT_PREFIX):]] = if_oid_map.get(port_id, port_id)
+    return if_br_name_map
+
+
+def get_bvid_vlan_map(db):
+    """
+        Map the VLAN oids to their VLAN ids.
+    """
+    keys = db.keys('ASIC_DB', VLAN_PREFIX + "*")
+    keys = [] if keys is None else keys
+    return {key[len(VLAN_PREFIX):]: int(vlan_id)
+            for key, (vlan_id,) in zip(keys, bulk_hmget(db, 'ASIC_DB', keys, ["SAI_VLAN_ATTR_VLAN_ID"]))
+            if vlan_id is not None}
+
+
+def read_fdb_index(db, keys, vlan=None, port=None, generation=None):
+    """
+        Read the FDB entries with the given keys from the ASIC_DB, only
+        those of the given vlan and port if any. The VLAN is selected from
+        the keys, then the port from the bridge port of the entries of the
+        VLAN, and only the type of the selected entries is read.
+    """
+    complete = vlan is None and port is None
+    if not keys:
+        return FdbIndex(generation=generation, complete=complete)
+
+    if_name_map, if_oid_map = port_util.get_interface_oid_map(db)
+    if_br_name_map = get_bridge_port_name_map(db, if_oid_map)
+    if not if_br_name_map:
+        return FdbIndex(generation=generation, complete=complete)
+    bvid_vlan_map = get_bvid_vlan_map(db)
+
+    # Select the entries of the vlan from their keys
+    if vlan is not None:
+        vlan = int(vlan)
+    selected = []
+    vlans = set()
+    unknown_bvids = []
+    for s in keys:
+        fdb = json.loads(s[len(FDB_ENTRY_PREFIX):])
+        if not fdb:
+            continue
+        if 'vlan' in fdb:
+            vlan_id = int(fdb["vlan"])
+        elif 'bvid' in fdb:
+            vlan_id = bvid_vlan_map.get(fdb["bvid"])
+            if vlan_id is None:
+                unknown_bvids.append(fdb["bvid"])
+                continue
+        else:
+            continue
+        if vlan is not None and vlan_id != vlan:
+            continue
+        selected.append((s, vlan_id, fdb["mac"]))
+        vlans.add(vlan_id)
+
+    # Select the entries learnt on the port from their bridge port, then
+    # read the type of the selected entries only
+    fields = ["SAI_FDB_ENTRY_ATTR_BRIDGE_PORT_ID"]
+    if port is None:
+        fields.append("SAI_FDB_ENTRY_ATTR_TYPE")
+    entries = []
+    ent_types = []
+    for (s, vlan_id, mac), values in zip(selected, bulk_hmget(db, 'ASIC_DB', [s for s, _, _ in selected], fields)):
+        if values[0] not in if_br_name_map:
+            continue
+        if_name = if_br_name_map[values[0]]
+        if port is not None and if_name != port:
+            continue
+        entries.append((s, vlan_id, mac, if_name))
+        ent_types.append(values[-1])
+    if port is not None:
+        ent_types = [ent_type for ent_type, in bulk_hmget(db, 'ASIC_DB', [s for s, _, _, _ in entries],
+                                                           ["SAI_FDB_ENTRY_ATTR_TYPE"])]
+
+    return FdbIndex([(vlan_id, mac, if_name, ['Dynamic', 'Static'][ent_type == "SAI_FDB_ENTRY_TYPE_STATIC"])
+                     for (s, vlan_id, mac, if_name), ent_type in zip(entries, ent_types)],
+                    vlans, generation, complete=complete, unknown_bvids=unknown_bvids)
+
+
+def load_fdb_index(cache_file, generation, max_age=FDB_CACHE_MAX_AGE):
+    """
+        Load the index cached in cache_file if it is of the given generation
+        and not older than max_age seconds, None otherwise.
+    """
+    data = load_cache_file(cache_file)
+    if not isinstance(data, dict) or data.get('generation') != generation or \
+            not 0 <= time.time() - data.get('timestamp', 0) <= max_age:
+        return None
+    return FdbIndex.from_json(data)
+
+
+def save_fdb_index(cache_file, index):
+    save_cache_file(cache_file, index.to_json())
+
+
+def get_fdb_index(db, vlan=None, port=None, cache_file=None, max_age=FDB_CACHE_MAX_AGE, use_cache=True):
+    """
+        Get the FDB index of the ASIC_DB, from the cache if it is still
+        valid and use_cache is set. Otherwise it is read and cached, unless
+        it is read for a vlan or a port only.
+    """
+    if cache_file is None:
+        cache_file = FDB_CACHE_FILE
+
+    db.connect(db.ASIC_DB)
+    generation = get_fdb_generation(db)
+    if use_cache:
+        index = load_fdb_index(cache_file, generation, max_age)
+        if index is not None:
+            return index
+
+    index = read_fdb_index(db, get_fdb_keys(db), vlan, port, generation)
+    if index.complete:
+        save_fdb_index(cache_file, index)
+    return index
@@ -1,10 +1,63 @@
 # network statistics utility functions #
 
 import json
+from array import array
+from collections import namedtuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from utilities_common.counters import COUNTER_NA, CounterSnapshot, counter_value, new_column
 
 STATUS_NA = 'N/A'
 PORT_RATE = 40
 
+# Columns computed by ns_batch, one value per interface
+NetstatColumns = namedtuple("NetstatColumns", "diff, bps, pps, util")
+
+def format_diff(diff):
+    """
+        Format a counter diff, N/A for COUNTER_NA.
+    """
+    if diff == COUNTER_NA:
+        return STATUS_NA
+    return '{:,}'.format(int(diff))
+
+def format_brate(rate):
+    """
+        Format a byte rate, N/A for COUNTER_NA.
+    """
+    if rate == COUNTER_NA:
+        return STATUS_NA
+    if rate > 1024*1024*10:
+        rate = "{:.2f}".format(rate/1024/1024)+' MB'
+    elif rate > 1024*10:
+        rate = "{:.2f}".format(rate/1024)+' KB'
+    else:
+        rate = "{:.2f}".format(rate)+' B'
+    return rate+'/s'
+
+def format_prate(rate):
+    """
+        Format a packet rate, N/A for COUNTER_NA.
+    """
+    if rate == COUNTER_NA:
+        return STATUS_NA
+    return "{:.2f}".format(rate)+'/s'
+
+def format_util(util):
+    """
+        Format a utilization percentage, N/A for COUNTER_NA.
+    """
+    if util == COUNTER_NA:
+        return STATUS_NA
+    return "{:.2f}%".format(util)
+
+def _diff(newstr, oldstr):
+    return max(0, int(newstr) - int(oldstr))
+
 def ns_diff(newstr, oldstr):
     """
         Calculate the diff.
@@ -12,8 +65,7 @@ def ns_diff(newstr, oldstr):
     if newstr == STATUS_NA or oldstr == STATUS_NA:
         return STATUS_NA
     else:
-        new, old = int(newstr), int(oldstr)
-        return '{:,}'.format(max(0, new - old))
+        return format_diff(_diff(newstr, oldstr))
 
 def ns_brate(newstr, oldstr, delta):
     """
@@ -22,14 +74,7 @@ def ns_brate(newstr, oldstr, delta):
     if newstr == STATUS_NA or oldstr == STATUS_NA:
         return STATUS_NA
     else:
-        rate = int(ns_diff(newstr, oldstr).replace(',',''))/delta
-        if rate > 1024*1024*10:
-            rate = "{:.2f}".format(rate/1024/1024)+' MB'
-        elif rate > 1024*10:
-            rate = "{:.2f}".format(rate/1024)+' KB'
-        else:
-            rate = "{:.2f}".format(rate)+' B'
-        return rate+'/s'
+        return format_brate(_diff(newstr, oldstr)/delta)
 
 def ns_prate(newstr, oldstr, delta):
     """
@@ -38,8 +83,7 @@ def ns_prate(newstr, oldstr, delta):
     if newstr == STATUS_NA or oldstr == STATUS_NA:
         return STATUS_NA
     else:
-        rate = int(ns_diff(newstr, oldstr).replace(',',''))/delta
-        return "{:.2f}".format(rate)+'/s'
+        return format_prate(_diff(newstr, oldstr)/delta)
 
 def ns_util(newstr, oldstr, delta, port_rate=PORT_RATE):
     """
@@ -48,9 +92,147 @@ def ns_util(newstr, oldstr, delta, port_rate=PORT_RATE):
     if newstr == STATUS_NA or oldstr == STATUS_NA:
         return STATUS_NA
     else:
-        rate = int(ns_diff(newstr, oldstr).replace(',',''))/delta
+        rate = _diff(newstr, oldstr)/delta
         util = rate/(port_rate*1024*1024*1024/8.0)*100
-        return "{:.2f}%".format(util)
+        return format_util(util)
+
+def cnstat_columns(cnstat_dict, names, fields):
+    """
+        Get the given fields of a dictionary of counter namedtuples as
+        counter columns, one value per name. Counters which are 'N/A', and
+        names missing from the dictionary, are COUNTER_NA.
+    """
+    columns = {}
+    rows = [cnstat_dict.get(name) for name in names]
+    for field in fields:
+        column = new_column(len(names))
+        for row, cntr in enumerate(rows):
+            if cntr is not None:
+                column[row] = counter_value(getattr(cntr, field))
+        columns[field] = column
+    return columns
+
+def snapshot_columns(snapshot, names, fields):
+    """
+        Get the given counter columns of a CounterSnapshot, one value per
+        name. The columns of the snapshot are returned as they are if its
+        rows are the given names; otherwise names and fields missing from
+        the snapshot are COUNTER_NA.
+    """
+    names = list(names)
+    aligned = snapshot.names == names
+    rows = None if aligned else [snapshot.index.get(name) for name in names]
+    columns = {}
+    for field in fields:
+        source = snapshot.columns.get(field)
+        if source is not None and aligned:
+            columns[field] = source
+            continue
+        column = new_column(len(names))
+        if source is not None:
+            for i, row in enumerate(rows):
+                if row is not None:
+                    column[i] = source[row]
+        columns[field] = column
+    return columns
+
+def counter_columns(stats, names, fields):
+    """
+        Get the given counter columns, one value per name, of a
+        CounterSnapshot or of a dictionary of counter namedtuples.
+    """
+    if isinstance(stats, CounterSnapshot):
+        return snapshot_columns(stats, names, fields)
+    return cnstat_columns(stats, names, fields)
+
+def _ndarray(column):
+    if isinstance(column, array):
+        return numpy.frombuffer(column, dtype=numpy.int64) if column.itemsize == 8 else \
+            numpy.array(column, dtype=numpy.int64)
+    return numpy.asarray(column, dtype=numpy.int64)
+
+def _ns_batch_numpy(new_packets, old_packets, new_bytes, old_bytes, delta, port_rates):
+    new_packets, old_packets = _ndarray(new_packets), _ndarray(old_packets)
+    new_bytes, old_bytes = _ndarray(new_bytes), _ndarray(old_bytes)
+    packets_na = (new_packets == COUNTER_NA) | (old_packets == COUNTER_NA)
+    bytes_na = (new_bytes == COUNTER_NA) | (old_bytes == COUNTER_NA)
+
+    diff = numpy.maximum(new_packets - old_packets, 0)
+    byte_diff = numpy.maximum(new_bytes - old_bytes, 0)
+    pps = diff / float(delta)
+    bps = byte_diff / float(delta)
+    util = bps / (numpy.asarray(port_rates, dtype=numpy.int64) * 1024*1024*1024 / 8.0) * 100
+
+    diff[packets_na] = COUNTER_NA
+    pps[packets_na] = COUNTER_NA
+    bps[bytes_na] = COUNTER_NA
+    util[bytes_na] = COUNTER_NA
+    return NetstatColumns(diff, bps, pps, util)
+
+def _ns_batch_array(new_packets, old_packets, new_bytes, old_bytes, delta, port_rates):
+    size = len(new_packets)
+    diff = new_column(size)
+    bps = array('d', [COUNTER_NA]) * size
+    pps = array('d', [COUNTER_NA]) * size
+    util = array('d', [COUNTER_NA]) * size
+    if not isinstance(port_rates, (list, tuple, array)):
+        port_rates = [port_rates] * size
+    delta = float(delta)
+
+    for row in xrange(size):
+        new, old = new_packets[row], old_packets[row]
+        if new != COUNTER_NA and old != COUNTER_NA:
+            diff[row] = max(0, new - old)
+            pps[row] = diff[row] / delta
+        new, old = new_bytes[row], old_bytes[row]
+        if new != COUNTER_NA and old != COUNTER_NA:
+            bps[row] = max(0, new - old) / delta
+            util[row] = bps[row] / (port_rates[row]*1024*1024*1024/8.0) * 100
+    return NetstatColumns(diff, bps, pps, util)
+
+def ns_batch(new_packets, old_packets, new_bytes, old_bytes, delta, port_rates=PORT_RATE):
+    """
+        Calculate the packet diff, byte rate, packet rate and utilization of
+        a batch of interfaces from their packet and byte counter columns, in
+        one pass. port_rates is a single speed in Gbps or one per interface.
+        Values which are not available are COUNTER_NA; use the format_*
+        functions to render them.
+    """
+    if numpy is not None:
+        return _ns_batch_numpy(new_packets, old_packets, new_bytes, old_bytes, delta, port_rates)
+    return _ns_batch_array(new_packets, old_packets, new_bytes, old_bytes, delta, port_rates)
+
+def ns_diff_batch(new, old):
+    """
+        Calculate the diff of a batch of counters, COUNTER_NA if not available.
+    """
+    if numpy is not None:
+        new, old = _ndarray(new), _ndarray(old)
+        diff = numpy.maximum(new - old, 0)
+        diff[(new == COUNTER_NA) | (old == COUNTER_NA)] = COUNTER_NA
+        return diff
+    diff = new_column(len(new))
+    for row in xrange(len(new)):
+        if new[row] != COUNTER_NA and old[row] != COUNTER_NA:
+            diff[row] = max(0, new[row] - old[row])
+    return diff
+
+def format_table(table, header):
+    """
+        Format a table of strings with the layout of tabulate's 'simple'
+        format with right aligned columns, without inspecting the type and
+        the display width of every cell.
+    """
+    widths = [len(title) + 2 for title in header]
+    for line in table:
+        for i, cell in enumerate(line):
+            if len(cell) > widths[i]:
+                widths[i] = len(cell)
+    lines = ['  '.join(title.rjust(width) for title, width in zip(header, widths)),
+             '  '.join('-' * width for width in widths)]
+    for line in table:
+        lines.append('  '.join(cell.rjust(width) for cell, width in zip(line, widths)))
+    return '\n'.join(lines)
 
 def table_as_json(table, header):
     """
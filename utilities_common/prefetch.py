@@ -0,0 +1,43 @@
+# Batched database read utility functions #
+
+from utilities_common.counters import bulk_hgetall, bulk_hmget
+
+
+class PrefetchedDB(object):
+    """
+        Wrapper of a database connector which serves get() and get_all()
+        on prefetched hashes from memory. Hashes are fetched with pipelined
+        HGETALL or HMGET; reads of other keys, and all other methods, go to
+        the wrapped connector.
+    """
+
+    def __init__(self, db, db_name):
+        self.db = db
+        self.db_name = db_name
+        self.hashes = {}
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+    def prefetch(self, keys, fields=None):
+        """
+            Fetch the given hashes, or only the given fields of them, in
+            pipelined batches. Missing hashes are cached as empty.
+        """
+        keys = [key for key in keys if key not in self.hashes]
+        if fields is None:
+            replies = bulk_hgetall(self.db, self.db_name, keys)
+        else:
+            replies = [{field: value for field, value in zip(fields, values) if value is not None}
+                       for values in bulk_hmget(self.db, self.db_name, keys, fields)]
+        self.hashes.update(zip(keys, replies))
+
+    def get(self, db_name, _hash, key, *args, **kwargs):
+        if db_name == self.db_name and _hash in self.hashes:
+            return self.hashes[_hash].get(key)
+        return self.db.get(db_name, _hash, key, *args, **kwargs)
+
+    def get_all(self, db_name, _hash, *args, **kwargs):
+        if db_name == self.db_name and _hash in self.hashes:
+            return dict(self.hashes[_hash])
+        return self.db.get_all(db_name, _hash, *args, **kwargs)
@@ -0,0 +1,337 @@
+# Counter snapshot file utility functions #
+#
+# A snapshot file holds a CounterSnapshot in a compact binary format which is
+# read back by memory-mapping the file:
+#
+#   header   32 bytes, little-endian:
+#              magic (4s), version (H), header size (H),
+#              timestamp seconds (q) and microseconds (I),
+#              row count (I), column count (I), index size (I)
+#   index    JSON document with the row names, the row OIDs, the counter
+#            (column) names and optionally the row range of each group of
+#            rows (e.g. the queues of a port)
+#   padding  up to the next 8 byte boundary
+#   columns  one array of row count int64 values per counter, in the order
+#            of the counter names; COUNTER_NA (-1) marks a counter that is
+#            not available, and larger counters are saturated at COUNTER_MAX
+#
+# Files are written to a temporary file in the same directory and renamed
+# over the destination, so readers never see a partially written snapshot.
+
+import cPickle as pickle
+import datetime
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from collections import OrderedDict
+
+from utilities_common.counters import COUNTER_NA, COUNTER_TYPECODE, CounterSnapshot, counter_value
+
+SNAPSHOT_MAGIC = 'CNSS'
+SNAPSHOT_VERSION = 1
+
+SNAPSHOT_HEADER = struct.Struct('<4sHHqIIII')
+SNAPSHOT_ALIGNMENT = 8
+SNAPSHOT_VALUE_SIZE = 8
+
+STATUS_NA = 'N/A'
+
+
+class SnapshotFormatError(ValueError):
+    pass
+
+
+def _align(offset):
+    return (offset + SNAPSHOT_ALIGNMENT - 1) // SNAPSHOT_ALIGNMENT * SNAPSHOT_ALIGNMENT
+
+
+def _datetime_to_timestamp(dt):
+    # Snapshot times are naive local datetimes
+    return int(time.mktime(dt.timetuple())), dt.microsecond
+
+
+def _timestamp_to_datetime(seconds, microseconds):
+    return datetime.datetime.fromtimestamp(seconds).replace(microsecond=microseconds)
+
+
+def _pack_column(column):
+    """
+        Serialize a counter column as little-endian 64-bit values.
+    """
+    if COUNTER_TYPECODE is None:
+        return struct.pack('<{}q'.format(len(column)), *column)
+    if not isinstance(column, array) or column.typecode != COUNTER_TYPECODE:
+        column = array(COUNTER_TYPECODE, column)
+    if sys.byteorder != 'little':
+        column = array(COUNTER_TYPECODE, column)
+        column.byteswap()
+    return column.tostring()
+
+
+def _unpack_column(buf, offset, count):
+    """
+        Deserialize count little-endian 64-bit values starting at offset.
+    """
+    if COUNTER_TYPECODE is None:
+        return list(struct.unpack_from('<{}q'.format(count), buf, offset))
+    column = array(COUNTER_TYPECODE)
+    column.fromstring(buf[offset:offset + count * SNAPSHOT_VALUE_SIZE])
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column
+
+
+def write_snapshot(path, snapshot, groups=None):
+    """
+        Atomically write a CounterSnapshot to path. groups optionally maps
+        group names (e.g. ports) to the (start, count) range of their rows,
+        so that a group can be read without the rest of the snapshot.
+    """
+    index = {'names': snapshot.names,
+             'oids': snapshot.oids,
+             'counters': snapshot.counter_names}
+    if groups is not None:
+        index['groups'] = [[group, start, count] for group, (start, count) in groups.iteritems()]
+    index = json.dumps(index, separators=(',', ':'))
+    seconds, microseconds = _datetime_to_timestamp(snapshot.time)
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, SNAPSHOT_HEADER.size,
+                                  seconds, microseconds, len(snapshot.names),
+                                  len(snapshot.counter_names), len(index))
+    padding = '\0' * (_align(len(header) + len(index)) - len(header) - len(index))
+
+    dirname, basename = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + basename + '.', dir=dirname)
+    try:
+        umask = os.umask(0)
+        os.umask(umask)
+        os.fchmod(fd, 0o666 & ~umask)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            f.write(index)
+            f.write(padding)
+            for counter_name in snapshot.counter_names:
+                f.write(_pack_column(snapshot.columns[counter_name]))
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp_path, path)
+    except:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def is_snapshot_file(path):
+    """
+        Check whether path holds a snapshot file, as opposed to a legacy pickle.
+    """
+    with open(path, 'rb') as f:
+        return f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+
+class SnapshotFile(object):
+    """
+        Memory-mapped snapshot file, from which the whole snapshot or only
+        the rows of a group can be read.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < SNAPSHOT_HEADER.size:
+                raise SnapshotFormatError("{} is not a counter snapshot".format(path))
+            self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, version, header_size, seconds, microseconds, self.row_count, column_count, index_size = \
+                SNAPSHOT_HEADER.unpack_from(self.buf, 0)
+            if magic != SNAPSHOT_MAGIC:
+                raise SnapshotFormatError("{} is not a counter snapshot".format(path))
+            if version != SNAPSHOT_VERSION:
+                raise SnapshotFormatError("{} has unsupported snapshot version {}".format(path, version))
+
+            self.data_offset = _align(header_size + index_size)
+            if size < self.data_offset + self.row_count * column_count * SNAPSHOT_VALUE_SIZE:
+                raise SnapshotFormatError("{} is truncated".format(path))
+
+            index = json.loads(self.buf[header_size:header_size + index_size])
+        except:
+            self.close()
+            raise
+
+        self.time = _timestamp_to_datetime(seconds, microseconds)
+        self.names = [str(name) for name in index['names']]
+        self.oids = [str(oid) for oid in index['oids']]
+        self.counter_names = [str(counter_name) for counter_name in index['counters']]
+        self.groups = OrderedDict((str(group), (start, count))
+                                  for group, start, count in index.get('groups', []))
+
+    def close(self):
+        self.buf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def read(self, start=0, count=None):
+        """
+            Read count rows starting at start, all the rows by default,
+            into a CounterSnapshot.
+        """
+        if count is None:
+            count = self.row_count - start
+        snapshot = CounterSnapshot(self.names[start:start + count], self.oids[start:start + count],
+                                   self.counter_names, self.time)
+        column_size = self.row_count * SNAPSHOT_VALUE_SIZE
+        for i, counter_name in enumerate(self.counter_names):
+            offset = self.data_offset + i * column_size + start * SNAPSHOT_VALUE_SIZE
+            snapshot.columns[counter_name] = _unpack_column(self.buf, offset, count)
+        return snapshot
+
+    def read_group(self, group):
+        """
+            Read the rows of a group into a CounterSnapshot, None if the
+            group is not in the snapshot.
+        """
+        if group not in self.groups:
+            return None
+        return self.read(*self.groups[group])
+
+
+def read_snapshot(path, group=None):
+    """
+        Read a CounterSnapshot from path by memory-mapping the file, or only
+        the rows of a group (None if the group is not in the snapshot).
+    """
+    with SnapshotFile(path) as snapshot_file:
+        if group is not None:
+            return snapshot_file.read_group(group)
+        return snapshot_file.read()
+
+
+def snapshot_from_cnstat(cnstat_dict, fields):
+    """
+        Build a CounterSnapshot from a dictionary of counter namedtuples, as
+        built by the stat scripts. Only the given fields are stored; values
+        which are not numbers (e.g. 'N/A') are stored as not available.
+    """
+    names = [name for name in cnstat_dict if name != 'time']
+    snapshot = CounterSnapshot(names, [''] * len(names), fields, cnstat_dict.get('time'))
+    for field in fields:
+        column = snapshot.columns[field]
+        for row, name in enumerate(names):
+            column[row] = counter_value(getattr(cnstat_dict[name], field))
+    return snapshot
+
+
+def cnstat_from_snapshot(snapshot, tuple_type):
+    """
+        Build a dictionary of counter namedtuples from a CounterSnapshot.
+        Counters which are not available are set to 'N/A', fields which are
+        not in the snapshot to None.
+    """
+    columns = [snapshot.columns.get(field) for field in tuple_type._fields]
+    cnstat_dict = OrderedDict()
+    cnstat_dict['time'] = snapshot.time
+    for row, name in enumerate(snapshot.names):
+        fields = []
+        for column in columns:
+            if column is None:
+                fields.append(None)
+            elif column[row] == COUNTER_NA:
+                fields.append(STATUS_NA)
+            else:
+                fields.append(str(column[row]))
+        cnstat_dict[name] = tuple_type._make(fields)
+    return cnstat_dict
+
+
+def save_cnstat(path, cnstat_dict, tuple_type, fields=None):
+    """
+        Save a dictionary of counter namedtuples as a snapshot file, storing
+        the given fields or, by default, all the fields of tuple_type.
+    """
+    if fields is None:
+        fields = tuple_type._fields
+    write_snapshot(path, snapshot_from_cnstat(cnstat_dict, fields))
+
+
+def load_cnstat(path, tuple_type):
+    """
+        Load a dictionary of counter namedtuples saved by save_cnstat.
+        Counters saved as a pickle by older versions are still read.
+    """
+    if not is_snapshot_file(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    return cnstat_from_snapshot(read_snapshot(path), tuple_type)
+
+
+def load_cnstat_snapshot(path, tuple_type):
+    """
+        Load the counters saved by save_cnstat as a CounterSnapshot, whose
+        columns can be used as they are read. Counters saved as a pickle by
+        older versions are converted.
+    """
+    if not is_snapshot_file(path):
+        with open(path, 'rb') as f:
+            return snapshot_from_cnstat(pickle.load(f), tuple_type._fields)
+    return read_snapshot(path)
+
+
+def save_counts_table(path, counts_table):
+    """
+        Save a table mapping object names to dictionaries of counter values
+        as a snapshot file.
+    """
+    names = list(counts_table)
+    counter_names = []
+    for counts in counts_table.itervalues():
+        counter_names.extend(counter for counter in counts if counter not in counter_names)
+    snapshot = CounterSnapshot(names, [''] * len(names), counter_names)
+    for counter_name in counter_names:
+        column = snapshot.columns[counter_name]
+        for row, name in enumerate(names):
+            column[row] = counter_value(counts_table[name].get(counter_name))
+    write_snapshot(path, snapshot)
+
+
+def load_counts_table(path):
+    """
+        Load a table of counter values saved by save_counts_table. Counters
+        which are not available are left out. Tables saved as a pickle by
+        older versions are still read.
+    """
+    if not is_snapshot_file(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    snapshot = read_snapshot(path)
+    counts_table = OrderedDict()
+    for row, name in enumerate(snapshot.names):
+        counts_table[name] = {counter_name: column[row]
+                              for counter_name, column in snapshot.columns.iteritems()
+                              if column[row] != COUNTER_NA}
+    return counts_table
+
+
+def save_counts(path, name, counts):
+    """
+        Save the dictionary of counter values of a single object.
+    """
+    save_counts_table(path, OrderedDict([(name, counts)]))
+
+
+def load_counts(path):
+    """
+        Load the dictionary of counter values saved by save_counts.
+    """
+    if not is_snapshot_file(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    return next(iter(load_counts_table(path).values()), {})
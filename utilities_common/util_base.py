@@ -2,11 +2,14 @@
 
 try:
     import imp
+    import json
     import signal
+    import stat
     import subprocess
     import os
     import sys
     import syslog
+    import tempfile
 except ImportError, e:
     raise ImportError (str(e) + " - required module not found")
 
@@ -28,6 +31,18 @@ PORTMAP = 'portmap.ini'
 EEPROM_MODULE_NAME = 'eeprom'
 EEPROM_CLASS_NAME = 'board'
 
+# Cache files. The cache directory is only writable by root: the cache files
+# are written by root and read by all the users
+CACHE_DIR = '/run/sonic-utilities'
+
+# Metadata cache
+BOOT_ID_PATH = '/proc/sys/kernel/random/boot_id'
+CONFIG_DB_FILE_PATH = '/etc/sonic/config_db.json'
+METADATA_CACHE_FILE = os.path.join(CACHE_DIR, 'metadata-cache.json')
+METADATA_CACHE_KEY_PLATFORM_AND_HWSKU = 'platform_and_hwsku'
+METADATA_CACHE_KEY_ROUTING_STACK = 'routing_stack'
+ROUTING_STACK_COMMAND = ['sudo', 'docker', 'ps']
+
 class UtilLogger(object):
     def __init__(self, syslog_identifier):
         self.syslog = syslog
@@ -67,12 +82,142 @@ class UtilLogger(object):
             print msg
 
 
+def is_private(st):
+    """Check that a file is owned by the current user and is not writable by
+       anybody else.
+    """
+    return st.st_uid == os.getuid() and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def is_trusted(st):
+    """Check that a file is owned by root or by the current user and is not
+       writable by anybody else.
+    """
+    return st.st_uid in (0, os.getuid()) and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def load_cache_file(cache_file):
+    """Load the JSON data of a cache file, None if there is none or if the
+       file is not trusted (it may have been planted by somebody else).
+    """
+    try:
+        fd = os.open(cache_file, os.O_RDONLY | os.O_NOFOLLOW)
+    except OSError:
+        return None
+
+    with os.fdopen(fd) as f:
+        st = os.fstat(fd)
+        if not stat.S_ISREG(st.st_mode) or not is_trusted(st):
+            return None
+        try:
+            return json.loads(f.read())
+        except (IOError, ValueError):
+            return None
+
+
+def save_cache_file(cache_file, data):
+    """Save JSON data to a cache file readable by all the users. The data is
+       written to a new file created in the cache directory, which is then
+       renamed, so that no existing file (or the target of a link) is ever
+       written to. Nothing is saved unless the cache directory is private to
+       the current user, so only root saves to CACHE_DIR.
+    """
+    cache_dir = os.path.dirname(cache_file)
+    tmp_file = None
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0o755)
+        st = os.lstat(cache_dir)
+        if not stat.S_ISDIR(st.st_mode) or not is_private(st):
+            return
+
+        fd, tmp_file = tempfile.mkstemp(prefix=os.path.basename(cache_file) + '.', dir=cache_dir)
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, 'w') as f:
+            # json.dumps() uses the C encoder, json.dump() does not
+            f.write(json.dumps(data, separators=(',', ':')))
+        os.rename(tmp_file, cache_file)
+    except (IOError, OSError):
+        if tmp_file is not None and os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+class MetadataCache(object):
+    """On-disk cache of system metadata which is expensive to derive (it
+       requires forking sonic-cfggen or docker). The cache is written by
+       root and shared by all the users. All the entries are dropped when the
+       system reboots or the saved configuration changes.
+    """
+
+    def __init__(self, cache_file=METADATA_CACHE_FILE):
+        self.cache_file = cache_file
+
+    # Returns the generation the cached entries are valid for, None if it
+    # can't be determined (in which case nothing is cached). It is made of
+    # the boot id and of the modification time of config_db.json, which
+    # costs no connection to ConfigDB
+    def get_generation(self):
+        try:
+            with open(BOOT_ID_PATH) as f:
+                boot_id = f.read().strip()
+            config_mtime = os.stat(CONFIG_DB_FILE_PATH).st_mtime
+        except (IOError, OSError):
+            return None
+
+        return "{}-{!r}".format(boot_id, config_mtime)
+
+    def load(self, generation):
+        cache = load_cache_file(self.cache_file)
+        if not isinstance(cache, dict) or cache.get('generation') != generation:
+            return {}
+        return cache.get('entries', {})
+
+    def save(self, generation, entries):
+        save_cache_file(self.cache_file, {'generation': generation, 'entries': entries})
+
+    # Returns the cached value of key, calling compute() and caching its
+    # result if there is none. Empty results (or tuples with an empty
+    # element) are not cached
+    def get(self, key, compute):
+        generation = self.get_generation()
+        if generation is None:
+            return compute()
+
+        entries = self.load(generation)
+        if key in entries:
+            return entries[key]
+
+        value = compute()
+        if value and (not isinstance(value, tuple) or all(value)):
+            entries[key] = value
+            self.save(generation, entries)
+        return value
+
+    def invalidate(self):
+        try:
+            os.remove(self.cache_file)
+        except OSError:
+            pass
+
+
 class UtilHelper(object):
-    def __init__(self):
-        pass
+    def __init__(self, metadata_cache=None):
+        self.metadata_cache = metadata_cache if metadata_cache is not None else MetadataCache()
 
-    # Returns platform and hwsku
+    # Returns platform and hwsku, from the metadata cache if possible
     def get_platform_and_hwsku(self):
+        platform, hwsku = self.metadata_cache.get(METADATA_CACHE_KEY_PLATFORM_AND_HWSKU,
+                                                  self.read_platform_and_hwsku)
+        return (platform, hwsku)
+
+    # Returns the routing stack (e.g. 'quagga' or 'frr'), from the metadata
+    # cache if possible
+    def get_routing_stack(self):
+        return self.metadata_cache.get(METADATA_CACHE_KEY_ROUTING_STACK,
+                                       self.read_routing_stack)
+
+    # Returns platform and hwsku as reported by sonic-cfggen
+    def read_platform_and_hwsku(self):
         try:
             proc = subprocess.Popen([SONIC_CFGGEN_PATH, '-H', '-v', PLATFORM_KEY],
                                     stdout=subprocess.PIPE,
@@ -94,6 +239,31 @@ class UtilHelper(object):
 
         return (platform, hwsku)
 
+    # Returns the routing stack of the running bgp container, taken from its
+    # image name (e.g. 'docker-fpm-frr:latest'). An empty string is returned
+    # if 'docker ps' fails, so that its error message is never cached
+    def read_routing_stack(self):
+        try:
+            proc = subprocess.Popen(ROUTING_STACK_COMMAND,
+                                    stdout=subprocess.PIPE,
+                                    shell=False,
+                                    stderr=subprocess.PIPE)
+            stdout = proc.communicate()[0]
+        except OSError, e:
+            raise OSError("Cannot detect routing-stack")
+
+        if proc.returncode != 0:
+            return ''
+
+        routing_stacks = []
+        for line in stdout.splitlines():
+            if 'bgp' not in line:
+                continue
+            fields = line.split()
+            image = fields[1].split('-') if len(fields) > 1 else []
+            routing_stacks.append(image[2].split(':')[0] if len(image) > 2 else '')
+        return '\n'.join(routing_stacks)
+
     # Returns path to platform and hwsku
     def get_path_to_platform_and_hwsku(self):
         # Get platform and hwsku
@@ -0,0 +1,257 @@
+# Watermark history ring buffer utility functions #
+#
+# A history file holds the last samples of the watermarks of a set of objects
+# (e.g. the unicast queues of every port) in a fixed-size ring buffer which is
+# updated in place through a memory map:
+#
+#   header   32 bytes, little-endian:
+#              magic (4s), version (H), header size (H),
+#              capacity in samples (I), row count (I), index size (I),
+#              total number of samples written (Q), reserved (I)
+#   index    JSON document with the name and the label of every row
+#   padding  up to the next 8 byte boundary
+#   times    capacity uint32 sample timestamps (seconds since the epoch)
+#   samples  capacity arrays of row count uint32 watermarks, one per sample;
+#            UINT32_MAX marks a watermark that is not available
+#
+# Sample n is stored in slot n % capacity, so the file never grows.
+
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+HISTORY_MAGIC = 'WMRB'
+HISTORY_VERSION = 1
+
+HISTORY_HEADER = struct.Struct('<4sHHIIIQI')
+HISTORY_ALIGNMENT = 8
+HISTORY_VALUE_SIZE = 4
+HISTORY_TYPECODE = 'I'
+
+# Value stored for a watermark that is not available
+HISTORY_NA = 0xFFFFFFFF
+
+# Offset of the number of samples written in the header
+_WRITTEN_OFFSET = 20
+_WRITTEN = struct.Struct('<Q')
+
+
+class HistoryFormatError(ValueError):
+    pass
+
+
+def _align(offset):
+    return (offset + HISTORY_ALIGNMENT - 1) // HISTORY_ALIGNMENT * HISTORY_ALIGNMENT
+
+
+def _pack(values):
+    column = array(HISTORY_TYPECODE, values)
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column.tostring()
+
+
+def _unpack(data):
+    column = array(HISTORY_TYPECODE)
+    column.fromstring(data)
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column
+
+
+def history_value(value):
+    """
+        Convert a watermark to its stored value: HISTORY_NA if it is not
+        available (None or negative), saturated to fit in 32 bits.
+    """
+    if value is None or value < 0:
+        return HISTORY_NA
+    return min(value, HISTORY_NA - 1)
+
+
+def create_history(path, names, labels, capacity):
+    """
+        Atomically create an empty history file for the given rows, able
+        to hold capacity samples.
+    """
+    index = json.dumps({'names': list(names), 'labels': list(labels)}, separators=(',', ':'))
+    header = HISTORY_HEADER.pack(HISTORY_MAGIC, HISTORY_VERSION, HISTORY_HEADER.size,
+                                 capacity, len(names), len(index), 0, 0)
+    padding = '\0' * (_align(len(header) + len(index)) - len(header) - len(index))
+
+    dirname, basename = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + basename + '.', dir=dirname)
+    try:
+        umask = os.umask(0)
+        os.umask(umask)
+        os.fchmod(fd, 0o666 & ~umask)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            f.write(index)
+            f.write(padding)
+            f.truncate(len(header) + len(index) + len(padding) +
+                       capacity * (len(names) + 1) * HISTORY_VALUE_SIZE)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp_path, path)
+    except:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class WatermarkHistory(object):
+    """
+        Memory-mapped watermark history file.
+    """
+
+    def __init__(self, path, writable=False):
+        # A link is never followed
+        fd = os.open(path, (os.O_RDWR if writable else os.O_RDONLY) | os.O_NOFOLLOW)
+        with os.fdopen(fd, 'r+b' if writable else 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HISTORY_HEADER.size:
+                raise HistoryFormatError("{} is not a watermark history".format(path))
+            self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+
+        try:
+            magic, version, header_size, self.capacity, self.row_count, index_size, written, reserved = \
+                HISTORY_HEADER.unpack_from(self.buf, 0)
+            if magic != HISTORY_MAGIC:
+                raise HistoryFormatError("{} is not a watermark history".format(path))
+            if version != HISTORY_VERSION:
+                raise HistoryFormatError("{} has unsupported history version {}".format(path, version))
+
+            self.times_offset = _align(header_size + index_size)
+            self.samples_offset = self.times_offset + self.capacity * HISTORY_VALUE_SIZE
+            if size < self.samples_offset + self.capacity * self.row_count * HISTORY_VALUE_SIZE:
+                raise HistoryFormatError("{} is truncated".format(path))
+
+            index = json.loads(self.buf[header_size:header_size + index_size])
+        except:
+            self.close()
+            raise
+
+        self.names = [str(name) for name in index['names']]
+        self.labels = [str(label) for label in index['labels']]
+
+    def close(self):
+        self.buf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def written(self):
+        return _WRITTEN.unpack_from(self.buf, _WRITTEN_OFFSET)[0]
+
+    def append(self, timestamp, values):
+        """
+            Store a sample of the watermarks of every row, overwriting the
+            oldest sample once the ring buffer is full.
+        """
+        if len(values) != self.row_count:
+            raise ValueError("Expected {} values, got {}".format(self.row_count, len(values)))
+        written = self.written
+        slot = written % self.capacity
+        offset = self.samples_offset + slot * self.row_count * HISTORY_VALUE_SIZE
+        self.buf[offset:offset + self.row_count * HISTORY_VALUE_SIZE] = \
+            _pack([history_value(value) for value in values])
+        offset = self.times_offset + slot * HISTORY_VALUE_SIZE
+        self.buf[offset:offset + HISTORY_VALUE_SIZE] = _pack([int(timestamp)])
+        # Count the sample once it is complete
+        _WRITTEN.pack_into(self.buf, _WRITTEN_OFFSET, written + 1)
+
+    def read(self, since=None):
+        """
+            Read the samples taken at or after since, all of them by default.
+            Returns the timestamps of the samples, oldest first, and one
+            array of watermarks per row, in the same order.
+        """
+        written = self.written
+        count = min(written, self.capacity)
+        times = _unpack(self.buf[self.times_offset:self.times_offset + self.capacity * HISTORY_VALUE_SIZE])
+        samples = _unpack(self.buf[self.samples_offset:
+                                   self.samples_offset + self.capacity * self.row_count * HISTORY_VALUE_SIZE])
+
+        # The samples are in at most two runs of contiguous slots
+        first = (written - count) % self.capacity if count else 0
+        runs = [(first, min(first + count, self.capacity))]
+        if first + count > self.capacity:
+            runs.append((0, first + count - self.capacity))
+
+        # Drop the samples older than since; sample times only increase
+        if since is not None:
+            kept_runs = []
+            for start, end in runs:
+                while start < end and times[start] < since:
+                    start += 1
+                if start < end:
+                    kept_runs.append((start, end))
+            runs = kept_runs
+
+        sample_times = array(HISTORY_TYPECODE)
+        for start, end in runs:
+            sample_times.extend(times[start:end])
+        rows = []
+        for row in range(self.row_count):
+            series = array(HISTORY_TYPECODE)
+            for start, end in runs:
+                series.extend(samples[start * self.row_count + row:end * self.row_count:self.row_count])
+            rows.append(series)
+        return sample_times, rows
+
+
+def open_history(path, names, labels, capacity):
+    """
+        Open the history file at path for recording, creating it again if it
+        does not exist, is a link or was recorded for other rows or another
+        capacity.
+    """
+    if os.path.isfile(path):
+        try:
+            history = WatermarkHistory(path, writable=True)
+        except (HistoryFormatError, OSError):
+            pass
+        else:
+            if history.names == list(names) and history.labels == list(labels) and \
+                    history.capacity == capacity:
+                return history
+            history.close()
+    create_history(path, names, labels, capacity)
+    return WatermarkHistory(path, writable=True)
+
+
+def _nearest_rank(sorted_values, percent):
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def percentile(values, percent):
+    """
+        Nearest-rank percentile of a sequence of values, None if it is empty.
+    """
+    if not values:
+        return None
+    return _nearest_rank(sorted(values), percent)
+
+
+def summarize(sample_times, series):
+    """
+        Summarize the samples of a row as (max, p99, time of max), skipping
+        the watermarks which are not available. All None if there are none.
+    """
+    values = sorted(series)
+    if values and values[-1] == HISTORY_NA:
+        values = values[:values.index(HISTORY_NA)]
+    if not values:
+        return None, None, None
+    peak = values[-1]
+    return peak, _nearest_rank(values, 99), sample_times[series.index(peak)]